@@ -0,0 +1,190 @@
+"""
+Created on Oct 18, 2026
+
+@author: "Alexey Mavrin"
+@email alexeymavrin@gmail.com
+
+Library interface: the duplicates are yielded as DuplicateGroup objects, nothing is printed (the progress is reported
+to an optional callback). The command line tool (duplicates.duplicates) is built on it.
+"""
+
+import os
+from functools import partial
+
+from duplicates.asyncwalk import get_files_async, CONCURRENCY
+from duplicates.duplicatefilefinder import get_files, get_files_of_roots, filter_duplicate_files, \
+    filter_duplicate_buckets, get_progress, get_stage, BLOCK_SIZE
+from duplicates.fileindex import FileIndex
+
+
+class DuplicateGroup(object):
+    """ Files (FileRecord's) of the same content, in the order they were found """
+    __slots__ = ("files",)
+
+    def __init__(self, files):
+        self.files = files
+
+    def __repr__(self):
+        return "DuplicateGroup(%d files, size=%d)" % (len(self.files), self.size)
+
+    def __len__(self):
+        return len(self.files)
+
+    def __iter__(self):
+        return iter(self.files)
+
+    @property
+    def size(self):
+        """ Size of every file of the group """
+        return self.files[0].size
+
+    @property
+    def digest(self):
+        """ Hash of the content, None if the files were compared directly (or the group was taken from a snapshot of
+        a run that compared them) """
+        return next((record.digest for record in self.files if record.digest), None)
+
+    @property
+    def reclaimable(self):
+        """ Bytes freed if one file is kept, the hard links of a file are counted once """
+        return self.size * (len(set(record.file_id for record in self.files)) - 1)
+
+
+def is_under(path, root):
+    """ Checks if the path is the root or is inside of it """
+    return (path + os.sep).startswith(root + os.sep)
+
+
+def get_walk_roots(roots):
+    """ Returns the roots to walk: the ones nested in (or the same as) another root are dropped, the order is kept """
+    return [root for i, root in enumerate(roots)
+            if not any(is_under(root, other) and (root != other or j < i) for j, other in enumerate(roots))]
+
+
+def walk_roots(roots, walk=None, walker="scandir", walk_concurrency=CONCURRENCY, snapshot=None):
+    """ Returns the iterator of all the files (FileRecord's) under the roots, every root walked once (nested ones are
+    walked with their parents), hidden and empty files included.
+    @param walk: WalkStats the time spent walking is added to (optional)
+    @param walker: scandir or async (many calls in flight, for network file systems)
+    @param walk_concurrency: number of calls the async walker keeps in flight
+    @param snapshot: Snapshot of the previous run, the directories not modified since are not listed (optional)
+    """
+    walk_function = get_files
+    if snapshot is not None:
+        if walker != "scandir":
+            raise ValueError("incremental mode works with the scandir walker only")
+        walk_function = snapshot.get_files
+    elif walker == "async":
+        walk_function = partial(get_files_async, concurrency=walk_concurrency)
+    elif walker != "scandir":
+        raise ValueError("unknown walker '%s'" % walker)
+    return get_files_of_roots(get_walk_roots(roots), include_hidden=True, include_empty=True, walk=walk,
+                              walker=walk_function, parallel=snapshot is None)
+
+
+def build_index(files, stages=None, by_size=True, progress=None, catalog=None):
+    """ Builds FileIndex of the files; the files of unique size are dropped right after the walk.
+    The entries of the `catalog` (Catalog) of the sizes found are added before, they are counted as the files found.
+    The files dropped are added to the "By Size" stage if the `stages` list is given, the files left too unless they
+    are grouped by size by filter_duplicate_files later (`by_size`). See get_progress for `progress`. """
+    progress = get_progress(progress)
+    index = FileIndex()
+    i = 0
+    for i, record in enumerate(files, start=1):
+        index.add(record)
+        if progress is not None:
+            progress("Index", i, 0, 0)
+    if catalog is not None:
+        for i, record in enumerate(catalog.records(set(index.size)), start=i + 1):
+            index.add(record)
+    if progress is not None:
+        progress("Index", i, 0, 0, done=True)
+    removed, removed_bytes = index.drop_unique_sizes()
+    if stages is not None:
+        stage = get_stage(stages, "By Size")
+        stage.files_in += removed
+        stage.bytes_in += removed_bytes
+        if not by_size:
+            left_bytes = sum(index.size)
+            stage.files_in += len(index)
+            stage.bytes_in += left_bytes
+            stage.files_out += len(index)
+            stage.bytes_out += left_bytes
+    return index
+
+
+def find_duplicates(roots, cache=None, jobs=None, compare=2, algorithm="sha256", block_size=BLOCK_SIZE, samples=4,
+                    stream=False, snapshot=None, walker="scandir", walk_concurrency=CONCURRENCY, rotational_jobs=1,
+                    device_jobs=None, progress=None, stages=None, walk=None, catalog=None, checkpoint=None):
+    """ Finds the duplicates under the roots, yields DuplicateGroup's.
+    @param roots: path or list of paths searched
+    @param cache: HashCache the keys of the unchanged files are taken from (optional)
+    @param jobs: number of files read in parallel (default: number of CPUs)
+    @param compare: groups of up to `compare` files are compared directly instead of hashing (0 - always hash)
+    @param algorithm: hash algorithm, one of HASH_ALGORITHMS
+    @param block_size: size of the blocks the files are read by
+    @param samples: number of blocks compared between the head and the tail before hashing (0 - no sampling)
+    @param stream: bounded memory mode - the groups are yielded size by size (largest first) as soon as they are
+    found, otherwise all of them at the end of the search
+    @param snapshot: Snapshot of the previous run (incremental mode, not with `stream`); it is updated with the groups
+    found
+    @param walker: directory walker, scandir or async
+    @param walk_concurrency: number of calls the async walker keeps in flight
+    @param rotational_jobs: number of files read in parallel from a rotational disk
+    @param device_jobs: st_dev -> number of files read in parallel from the device (overrides the detection)
+    @param progress: callback the progress of the stages is reported to (see duplicatefilefinder.get_progress),
+    only the indexing of the files is reported in the `stream` mode
+    @param stages: list the statistics of the search stages (StageStats) are added to (optional)
+    @param walk: WalkStats the time spent walking is added to (optional)
+    @param catalog: Catalog of the golden files searched too (not with `snapshot`): its entries of the sizes found
+    under the roots are added to the search, their keys are taken from the catalog (they are never read). The catalog
+    `algorithm` and `samples` are used.
+    @param checkpoint: Checkpoint the walk and the keys are saved to (not with `snapshot`); when it is resumed, the
+    saved walk is used and, in the `stream` mode, the sizes marked processed (Checkpoint.processed) are skipped
+    """
+    roots = [os.path.abspath(path) for path in ([roots] if isinstance(roots, str) else roots)]
+    if stream and snapshot is not None:
+        raise ValueError("incremental mode works without stream mode only")
+    if checkpoint is not None:
+        if snapshot is not None:
+            raise ValueError("checkpoints can not be used in incremental mode")
+        cache = checkpoint.get_cache(cache)
+    if catalog is not None:
+        if snapshot is not None:
+            raise ValueError("golden catalog can not be used in incremental mode")
+        if algorithm != catalog.algorithm:
+            raise ValueError("catalog '%s' keeps %s hashes" % (catalog.path, catalog.algorithm))
+        samples = catalog.samples
+        cache = catalog.get_cache(cache)
+    jobs = jobs or os.cpu_count() or 1
+    if stages is None:
+        stages = []
+    progress = get_progress(progress)
+    all_files = walk_roots(roots, walk, walker, walk_concurrency, snapshot)
+    if checkpoint is not None:
+        all_files = checkpoint.walk(all_files, walk)
+    if stream:
+        index = build_index(all_files, stages, by_size=False, progress=progress, catalog=catalog)
+        buckets = index.buckets()
+        if checkpoint is not None:
+            buckets = (bucket for bucket in buckets if not checkpoint.is_processed(bucket[0].size))
+        for duplicate_lists in filter_duplicate_buckets(buckets, cache, jobs, compare, algorithm, block_size,
+                                                        samples, stages, rotational_jobs, device_jobs):
+            for records in duplicate_lists:
+                yield DuplicateGroup(records)
+        return
+
+    reused = []
+    if snapshot is not None:
+        all_files = list(all_files)
+        snapshot.removed()
+        reused, all_files = snapshot.reuse_groups(all_files)
+    else:
+        # only the files which size is not unique become FileRecord's
+        all_files = build_index(all_files, stages, progress=progress, catalog=catalog).records()
+    duplicate_lists = filter_duplicate_files(all_files, None, cache, jobs, compare, algorithm, block_size, samples,
+                                             stages, rotational_jobs, device_jobs, progress) + reused
+    if snapshot is not None:
+        snapshot.store_groups(duplicate_lists)
+    for records in duplicate_lists:
+        yield DuplicateGroup(records)
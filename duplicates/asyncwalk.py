@@ -0,0 +1,139 @@
+"""
+Created on Oct 18, 2026
+
+@author: "Alexey Mavrin"
+@email alexeymavrin@gmail.com
+
+Directory walker for high latency (network) file systems: many directory listings and stat calls are kept in flight
+by asyncio tasks running them in a thread pool.
+"""
+
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from duplicates.duplicatefilefinder import FileRecord
+
+CONCURRENCY = 64
+
+
+class _AsyncWalk(object):
+    """ Walk of a directory tree: the directories requested by the consumer are listed and their files stat'ed by the
+    tasks of an event loop running in a thread of its own (see request) """
+
+    def __init__(self, include_hidden, include_empty, walk, concurrency, latency):
+        self.include_hidden = include_hidden
+        self.include_empty = include_empty
+        self.walk = walk
+        self.concurrency = concurrency
+        self.latency = latency  # seconds added to every call (tests)
+        self.loop = None
+        self.__pool = None
+        self.__semaphore = None
+        self.__thread = None
+
+    def list_directory(self, path):
+        """ Returns (file paths, sub directories) of the directory, None if it can not be listed """
+        if self.latency:
+            time.sleep(self.latency)
+        files = []
+        sub_dirs = []
+        try:
+            with os.scandir(path) as entries:
+                for entry in entries:
+                    if not self.include_hidden and entry.name.startswith("."):
+                        continue
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            sub_dirs.append(entry.path)
+                        elif entry.is_file(follow_symlinks=False):
+                            files.append(entry.path)
+                    except OSError:
+                        continue
+        except OSError:
+            return None
+        return files, sub_dirs
+
+    def stat(self, path):
+        """ Returns FileRecord of the file, None if it can not be stat'ed """
+        if self.latency:
+            time.sleep(self.latency)
+        try:
+            return FileRecord.from_stat(path, os.stat(path, follow_symlinks=False))
+        except OSError:
+            return None
+
+    def start(self):
+        import asyncio  # slow to import, only this walker needs it
+        self.loop = asyncio.new_event_loop()
+        self.__pool = ThreadPoolExecutor(max_workers=self.concurrency)
+        self.__thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.__thread.start()
+
+    def request(self, path):
+        """ Starts the listing of the directory, returns Future of (records, sub directories) """
+        import asyncio
+        return asyncio.run_coroutine_threadsafe(self.__walk_directory(path), self.loop)
+
+    def stop(self):
+        """ Cancels the listings in flight and stops the event loop """
+        import asyncio
+        asyncio.run_coroutine_threadsafe(self.__cancel(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.__thread.join()
+        self.loop.close()
+        self.__pool.shutdown(wait=False)
+
+    async def __call(self, function, *args):
+        import asyncio
+        if self.__semaphore is None:
+            self.__semaphore = asyncio.Semaphore(self.concurrency)
+        async with self.__semaphore:
+            return await self.loop.run_in_executor(self.__pool, function, *args)
+
+    async def __walk_directory(self, path):
+        import asyncio
+        started = time.perf_counter()
+        files, sub_dirs = await self.__call(self.list_directory, path) or ([], [])
+        records = [record for record in await asyncio.gather(*(self.__call(self.stat, file) for file in files))
+                   if record is not None and (self.include_empty or record.size > 0)]
+        if self.walk is not None:
+            self.walk.walked(path, len(records), time.perf_counter() - started)
+        return records, sub_dirs
+
+    @staticmethod
+    async def __cancel():
+        import asyncio
+        tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def get_files_async(directory, include_hidden, include_empty, walk=None, concurrency=CONCURRENCY, latency=0.0):
+    """Returns all FILES (FileRecord's) in the directory as duplicatefilefinder.get_files does (in the same order),
+    up to `concurrency` directory listings and stat calls are in flight at a time.
+    The next directories of the walk are listed ahead of the consumer, at most `concurrency` of them (the memory
+    is bounded, whatever the size of the tree).
+    `latency` seconds are added to every call to simulate a network file system."""
+    if not include_hidden and any(d.startswith(".") for d in os.path.abspath(directory).split(os.sep)):
+        return
+    walker = _AsyncWalk(include_hidden, include_empty, walk, concurrency, latency)
+    walker.start()
+    listings = {}  # path -> Future of (records, sub directories) of the directories requested
+    stack = [directory]
+    try:
+        while stack:
+            # the top of the stack is the order the directories are walked in, the next one is always requested
+            for path in reversed(stack[-concurrency:]):
+                if len(listings) >= concurrency and path != stack[-1]:
+                    break
+                if path not in listings:
+                    listings[path] = walker.request(path)
+            path = stack.pop()
+            records, sub_dirs = listings.pop(path).result()
+            yield from records
+            stack.extend(reversed(sub_dirs))  # depth first, in the listing order (as os.walk)
+    finally:
+        walker.stop()
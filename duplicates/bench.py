@@ -0,0 +1,277 @@
+"""
+Created on Oct 18, 2026
+
+@author: "Alexey Mavrin"
+@email alexeymavrin@gmail.com
+
+Benchmark of the duplicates search pipeline on a synthetic directory tree.
+
+    python -m duplicates.bench --files 20000 --output bench.json
+
+The tree is generated with the given file count, size distribution, ratio of duplicates, files sharing a prefix
+(same size and head, different tail) and hard links. Then the walk, every stage of filter_duplicate_files and the
+reporting/purge phase are timed and the results (throughput, syscalls per file, peak RSS) written as JSON, so runs of
+different versions can be compared. The file system cache is warm for the timed run.
+"""
+
+import argparse
+import io
+import json
+import math
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout
+
+from duplicates import duplicatefilefinder
+from duplicates.duplicatefilefinder import get_files, filter_duplicate_files, HASH_ALGORITHMS, BLOCK_SIZE
+from duplicates.duplicates import print_and_process_duplicates
+from duplicates.output import TextWriter
+
+try:
+    import resource
+except ImportError:  # windows
+    resource = None
+
+
+def generate_tree(root, files=2000, min_size=1, max_size=1024 * 1024, duplicates=0.3, shared_prefix=0.1,
+                  hard_links=0.05, directories=50, seed=0):
+    """ Generates the tree of `files` files under the root. Sizes are log-uniform between min_size and max_size.
+    `duplicates`, `shared_prefix` and `hard_links` are the ratios of the files that are copies of another file,
+    have the same size and head as another file but a different tail, or are hard links to another file.
+    Returns the summary of the tree generated. """
+    rng = random.Random(seed)
+    dirs = [root]
+    for i in range(1, directories):
+        dirs.append(os.path.join(rng.choice(dirs), "d%d" % i))
+        os.makedirs(dirs[-1], exist_ok=True)
+
+    summary = {"files": files, "bytes": 0, "duplicates": 0, "shared_prefix": 0, "hard_links": 0,
+               "directories": len(dirs)}
+    paths = []
+    for i in range(files):
+        path = os.path.join(rng.choice(dirs), "f%d.bin" % i)
+        choice = rng.random()
+        if paths and choice < hard_links:
+            os.link(rng.choice(paths), path)
+            summary["hard_links"] += 1
+        elif paths and choice < hard_links + duplicates:
+            shutil.copyfile(rng.choice(paths), path)
+            summary["duplicates"] += 1
+        elif paths and choice < hard_links + duplicates + shared_prefix:
+            with open(rng.choice(paths), "rb") as original:
+                data = bytearray(original.read())
+            if data:
+                data[-1] = (data[-1] + 1) % 256
+            with open(path, "wb") as f:
+                f.write(data)
+            summary["shared_prefix"] += 1
+        else:
+            size = int(math.exp(rng.uniform(math.log(min_size), math.log(max_size))))
+            with open(path, "wb") as f:
+                f.write(rng.randbytes(size))
+        summary["bytes"] += os.path.getsize(path)
+        paths.append(path)
+    return summary
+
+
+class _CountingEntry(object):
+    """ os.DirEntry proxy counting the stat calls """
+
+    def __init__(self, entry, counts):
+        self.__entry = entry
+        self.__counts = counts
+        self.name = entry.name
+        self.path = entry.path
+
+    def is_dir(self, **kwargs):
+        return self.__entry.is_dir(**kwargs)
+
+    def is_file(self, **kwargs):
+        return self.__entry.is_file(**kwargs)
+
+    def is_symlink(self):
+        return self.__entry.is_symlink()
+
+    def stat(self, **kwargs):
+        self.__counts["stat"] += 1
+        return self.__entry.stat(**kwargs)
+
+
+class SyscallCounter(object):
+    """ Counts the file system calls made by the pipeline (scandir, stat, open and, on Linux, read) """
+
+    def __init__(self):
+        self.counts = {"scandir": 0, "stat": 0, "open": 0, "read": None}
+        self.__saved = None
+        self.__reads = None
+
+    def __enter__(self):
+        counts = self.counts
+        scandir, stat, open_ = os.scandir, os.stat, open
+
+        class Scandir(object):
+            def __init__(self, path):
+                counts["scandir"] += 1
+                self.__iterator = scandir(path)
+
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *args):
+                self.__iterator.close()
+
+            def __iter__(self):
+                return (_CountingEntry(entry, counts) for entry in self.__iterator)
+
+        def counting_stat(*args, **kwargs):
+            counts["stat"] += 1
+            return stat(*args, **kwargs)
+
+        def counting_open(*args, **kwargs):
+            counts["open"] += 1
+            return open_(*args, **kwargs)
+
+        self.__saved = (scandir, stat, open_)
+        os.scandir, os.stat = Scandir, counting_stat
+        duplicatefilefinder.open = counting_open  # module global shadows the builtin
+        self.__reads = read_syscalls()
+        return self
+
+    def __exit__(self, *args):
+        if self.__reads is not None:
+            self.counts["read"] = read_syscalls() - self.__reads
+        os.scandir, os.stat = self.__saved[:2]
+        del duplicatefilefinder.open
+
+
+def read_syscalls():
+    """ Returns the number of read syscalls made by the process so far (Linux only, None elsewhere) """
+    try:
+        with open("/proc/self/io") as f:
+            return int(dict(line.split(": ") for line in f.read().splitlines())["syscr"])
+    except (OSError, KeyError, ValueError):
+        return None
+
+
+def peak_rss():
+    """ Returns the peak resident set size of the process in KiB (None if unknown) """
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss // 1024 if sys.platform == "darwin" else rss  # bytes on mac os
+
+
+def run(root, jobs=1, compare=2, algorithm="sha256", block_size=BLOCK_SIZE, samples=4, purge=True):
+    """ Runs the pipeline over the tree and returns the measurements """
+    null = io.StringIO()
+    result = {}
+
+    # syscalls are counted in a separate run, the proxies would distort the timings
+    with redirect_stdout(null), SyscallCounter() as counter:
+        files = list(get_files(root, include_hidden=True, include_empty=True))
+        filter_duplicate_files(files, None, None, jobs, compare, algorithm, block_size, samples)
+    result["syscalls"] = dict(counter.counts)
+    total = sum(count for count in counter.counts.values() if count is not None)
+    result["syscalls"]["per_file"] = total / len(files) if files else 0
+
+    with redirect_stdout(null):
+        started = time.perf_counter()
+        files = list(get_files(root, include_hidden=True, include_empty=True))
+        result["walk"] = stage_result("Walk", len(files), time.perf_counter() - started)
+
+        stages = []
+        started = time.perf_counter()
+        duplicate_lists = filter_duplicate_files(files, None, None, jobs, compare, algorithm, block_size, samples,
+                                                 stages)
+        result["filter"] = stage_result("Filter", len(files), time.perf_counter() - started,
+                                        sum(stage.bytes_read for stage in stages))
+        result["stages"] = [stage_result(stage.name, stage.files_in, stage.seconds, stage.bytes_read,
+                                         files_out=stage.files_out, bytes_eliminated=stage.bytes_eliminated,
+                                         io_seconds=stage.io_seconds, hash_seconds=stage.hash_seconds)
+                            for stage in stages]
+
+        started = time.perf_counter()
+        stats = print_and_process_duplicates(duplicate_lists, [], purge, writer=TextWriter(null))
+        result["report"] = stage_result("Report and purge" if purge else "Report",
+                                        stats.keep_files + stats.skipped_files + stats.to_delete_files,
+                                        time.perf_counter() - started, deleted=stats.deleted_files)
+    result["groups"] = len(duplicate_lists)
+    result["peak_rss_kib"] = peak_rss()
+    return result
+
+
+def stage_result(name, files, seconds, bytes_read=None, **kwargs):
+    """ Returns the dictionary of the measurements of a stage """
+    result = dict(name=name, files=files, seconds=seconds, files_per_second=files / seconds if seconds else None)
+    if bytes_read is not None:
+        result.update(bytes_read=bytes_read, mb_per_second=bytes_read / seconds / 1e6 if seconds else None)
+    result.update(kwargs)
+    return result
+
+
+def get_version():
+    """ Returns the version of the installed package (None if it is run from the source tree) """
+    try:
+        from importlib.metadata import version, PackageNotFoundError
+        return version("duplicates")
+    except (ImportError, PackageNotFoundError):
+        return None
+
+
+def parse_arguments(argv=None):
+    """ Parses the arguments """
+    parser = argparse.ArgumentParser(description="Benchmark of the duplicates search on a synthetic tree.")
+    parser.add_argument('--files', help='number of files (default: 2000)', type=int, default=2000)
+    parser.add_argument('--min-size', help='minimal file size (default: 1)', type=int, default=1)
+    parser.add_argument('--max-size', help='maximal file size (default: 1 MiB)', type=int, default=1024 * 1024)
+    parser.add_argument('--duplicates', help='ratio of duplicates (default: 0.3)', type=float, default=0.3)
+    parser.add_argument('--shared-prefix', help='ratio of files sharing size and head with another file, '
+                                                'differing at the end (default: 0.1)', type=float, default=0.1)
+    parser.add_argument('--hard-links', help='ratio of hard links (default: 0.05)', type=float, default=0.05)
+    parser.add_argument('--directories', help='number of directories (default: 50)', type=int, default=50)
+    parser.add_argument('--seed', help='random seed (default: 0)', type=int, default=0)
+    parser.add_argument('--dir', help='(optional) directory the tree is generated in (default: temporary)')
+    parser.add_argument('--keep', help='do not delete the tree, skip purge', action='store_true')
+    parser.add_argument('-j', '--jobs', help='number of jobs (default: 1)', type=int, default=1)
+    parser.add_argument('--compare', help='compare groups of up to COMPARE files (default: 2)', type=int, default=2)
+    parser.add_argument('--samples', help='number of sampled blocks (default: 4)', type=int, default=4)
+    parser.add_argument('--hash', help='hash algorithm (default: sha256)', choices=sorted(HASH_ALGORITHMS),
+                        default="sha256")
+    parser.add_argument('--block-size', help='read block size (default: %d)' % BLOCK_SIZE, type=int,
+                        default=BLOCK_SIZE)
+    parser.add_argument('-o', '--output', help='(optional) JSON file the results are written to (default: stdout)')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """ The main function """
+    args = parse_arguments(argv)
+    root = tempfile.mkdtemp(prefix="duplicates-bench-", dir=args.dir)
+    try:
+        tree = generate_tree(root, args.files, args.min_size, args.max_size, args.duplicates, args.shared_prefix,
+                             args.hard_links, args.directories, args.seed)
+        result = run(root, args.jobs, args.compare, args.hash, args.block_size, args.samples, purge=not args.keep)
+    finally:
+        if not args.keep:
+            shutil.rmtree(root, ignore_errors=True)
+
+    parameters = vars(args).copy()
+    del parameters["output"]
+    result = dict(version=get_version(), python=platform.python_version(), platform=platform.platform(),
+                  started=time.strftime("%Y-%m-%dT%H:%M:%S"), parameters=parameters, tree=tree, **result)
+    text = json.dumps(result, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
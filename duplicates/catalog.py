@@ -0,0 +1,166 @@
+"""
+Created on Oct 18, 2026
+
+@author: "Alexey Mavrin"
+@email alexeymavrin@gmail.com
+
+Catalog of the golden files: their sizes, prefix (crc), sample and content keys kept in a file, so the golden folders
+need not be walked, read or even mounted when the work folders are searched.
+"""
+
+import json
+import os
+import sqlite3
+import time
+from functools import partial
+
+from duplicates.duplicatefilefinder import CatalogRecord, BLOCK_SIZE, collapse_hard_links, get_crc_key, get_hash_key, \
+    get_progress, get_sample_key, get_sample_kind, get_stage, iter_keys
+from duplicates.scheduler import DeviceScheduler
+
+CATALOG_VERSION = 3
+
+
+class Catalog(object):
+    """ Catalog file (SQLite): the files sorted by size with the keys of every stage of the search.
+
+    The entries are turned into CatalogRecord's with the inode and device they had when the catalog was built (the
+    hard links are collapsed), the duplicate file finder gets their keys from CatalogCache and never reads them.
+    """
+
+    def __init__(self, path):
+        if not os.path.isfile(path):
+            raise IOError("catalog '%s' not found" % path)
+        self.path = path
+        self.__connection = sqlite3.connect(path)
+        meta = dict(self.__connection.execute("SELECT key, value FROM meta"))
+        if meta.get("version") != CATALOG_VERSION:
+            raise ValueError("unsupported catalog '%s'" % path)
+        self.roots = json.loads(meta["roots"])
+        self.algorithm = meta["algorithm"]
+        self.samples = meta["samples"]
+        self.keys = {}  # path -> {kind: key} of the entries loaded
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __len__(self):
+        return self.__connection.execute("SELECT COUNT(*) FROM files").fetchone()[0]
+
+    def __repr__(self):
+        return "Catalog '%s' of '%s' (%s, %i samples): %i entries loaded" % (
+            self.path, "', '".join(self.roots), self.algorithm, self.samples, len(self.keys))
+
+    def records(self, sizes):
+        """ Yields CatalogRecord's of the entries of the given sizes, their keys are remembered for CatalogCache """
+        sample_kind = get_sample_kind(self.samples)
+        for size in sorted(set(sizes)):
+            for path, mtime_ns, inode, device, crc, sample, digest in self.__connection.execute(
+                    "SELECT path, mtime_ns, inode, device, crc, sample, digest FROM files WHERE size=?", (size,)):
+                self.keys[path] = {"crc": crc, sample_kind: sample, self.algorithm: digest}
+                yield CatalogRecord(path, size, mtime_ns, inode, device)
+
+    def get_cache(self, cache=None):
+        """ Returns CatalogCache of the catalog and the hash cache (optional) """
+        return CatalogCache(self, cache)
+
+    def close(self):
+        if self.__connection is not None:
+            self.__connection.close()
+            self.__connection = None
+
+
+class CatalogCache(object):
+    """ Hash cache of the duplicate file finder: the keys of the catalog entries are taken from the catalog, the other
+    files are looked up in the hash cache if it is given (see HashCache) """
+
+    def __init__(self, catalog, cache=None):
+        self.catalog = catalog
+        self.cache = cache
+
+    def __repr__(self):
+        return "%r, %r" % (self.catalog, self.cache)
+
+    def __entry(self, record):
+        return self.catalog.keys.get(record.path) if record.catalog else None
+
+    def lookup(self, record, kind):
+        entry = self.__entry(record)
+        if entry is not None:
+            return entry[kind]
+        return self.cache.lookup(record, kind) if self.cache is not None else None
+
+    def contains(self, record, kind):
+        entry = self.__entry(record)
+        if entry is not None:
+            return entry.get(kind) is not None
+        return self.cache is not None and self.cache.contains(record, kind)
+
+    def store(self, record, kind, value):
+        if self.cache is not None and self.__entry(record) is None:
+            self.cache.store(record, kind, value)
+
+
+def build_catalog(path, files, algorithm="sha256", samples=4, cache=None, jobs=1, block_size=BLOCK_SIZE,
+                  roots=(), stages=None, progress=None):
+    """ Writes the catalog of the files (FileRecord's): the crc, the sample (`samples` blocks) and the `algorithm` hash
+    of every file, calculated by `jobs` threads per device and taken from the hash cache if it is given. Hard links are
+    read once. The catalog is written to a temporary file first, the previous one is replaced when it is complete.
+    Returns the number of the files in the catalog. """
+    progress = get_progress(progress)
+    files = list(files)
+    unique, links = collapse_hard_links(files)
+    executor = DeviceScheduler(jobs, 1) if jobs > 1 else None
+    keys = {}
+    kinds = [("crc", lambda record, stage: get_crc_key(record.path, stage)),
+             (algorithm, lambda record, stage: get_hash_key(record.path, algorithm, block_size, stage))]
+    if samples:
+        kinds.insert(1, (get_sample_kind(samples),
+                         lambda record, stage: get_sample_key(record.path, record.size, samples, stage=stage)))
+    try:
+        if executor is not None:
+            unique = executor.order(unique)
+        for kind, stage_key_function in kinds:
+            stage = get_stage(stages if stages is not None else [], "Catalog %s" % kind.split(":")[0])
+            started = time.perf_counter()
+            i = 0
+            keys_found = iter_keys(partial(stage_key_function, stage=stage), kind, unique, cache, executor)
+            for i, (record, key) in enumerate(keys_found, start=1):
+                stage.checked(record)
+                keys.setdefault(record.file_id, {})[kind] = key
+                if progress is not None:
+                    progress(stage.name, i, 0, 0)
+            if progress is not None:
+                progress(stage.name, i, 0, 0, done=True)
+            stage.passed(unique)
+            stage.seconds += time.perf_counter() - started
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    temp_path = path + ".tmp"
+    if os.path.exists(temp_path):
+        os.unlink(temp_path)
+    connection = sqlite3.connect(temp_path)
+    try:
+        connection.executescript("""
+            CREATE TABLE meta (key TEXT PRIMARY KEY, value);
+            CREATE TABLE files (size INTEGER, path TEXT, mtime_ns INTEGER, inode INTEGER, device INTEGER,
+                                crc INTEGER, sample, digest BLOB, PRIMARY KEY (size, path)) WITHOUT ROWID;
+            """)
+        connection.executemany("INSERT INTO meta VALUES (?, ?)", (
+            ("version", CATALOG_VERSION), ("roots", json.dumps(list(roots))), ("algorithm", algorithm),
+            ("samples", samples), ("created", time.time())))
+        sample_kind = get_sample_kind(samples)
+        connection.executemany("INSERT INTO files VALUES (?, ?, ?, ?, ?, ?, ?, ?)", sorted(
+            (record.size, record.path, record.mtime_ns, record.inode, record.device, keys[record.file_id]["crc"],
+             keys[record.file_id].get(sample_kind), keys[record.file_id][algorithm])
+            for records in links.values() for record in records))
+        connection.commit()
+    finally:
+        connection.close()
+    os.replace(temp_path, path)
+    return len(files)
@@ -0,0 +1,148 @@
+"""
+Created on Oct 18, 2026
+
+@author: "Alexey Mavrin"
+@email alexeymavrin@gmail.com
+
+Checkpoints of the long runs: the state directory keeps the walk (the files found), the keys of the stages (HashCache
+committed every CHECKPOINT_SECONDS) and the sizes processed in the stream mode, so an interrupted run is resumed
+with the work done so far. The files are stat'ed again and the keys are trusted only while the size and modification
+time of the file are unchanged.
+"""
+
+import json
+import os
+import stat
+import time
+
+from duplicates.duplicatefilefinder import FileRecord
+
+CHECKPOINT_VERSION = 1
+CHECKPOINT_SECONDS = 30  # the state is saved (and the keys committed) at most that often, and when the run stops
+STATE = "state.json"
+WALK = "walk.jsonl"
+KEYS = "keys.db"
+
+
+class Checkpoint(object):
+    """ State directory of a run. `run` (JSON serializable) describes the run (roots and options), a checkpoint is
+    resumed by the same run only. Without `resume` the state of the previous run in the directory is dropped.
+    The state is removed when the run is complete (the context is left without an exception). """
+
+    def __init__(self, directory, run, resume=False):
+        self.directory = directory
+        self.run = json.loads(json.dumps(run))  # as it is read back
+        self.cache = None  # HashCache of the state directory (see get_cache)
+        self.resumed = resume
+        self.state = {"version": CHECKPOINT_VERSION, "run": self.run, "walk": False, "processed_size": None}
+        if resume:
+            try:
+                with open(os.path.join(directory, STATE), encoding="utf-8") as f:
+                    state = json.load(f)
+            except (OSError, ValueError):
+                raise ValueError("no checkpoint to resume in '%s'" % directory)
+            if state.get("version") != CHECKPOINT_VERSION or state.get("run") != self.run:
+                raise ValueError("checkpoint in '%s' is of another run (%s)" % (directory, state.get("run")))
+            self.state = state
+        else:
+            os.makedirs(directory, exist_ok=True)
+            self.remove()
+        self.__saved = None
+        self.save()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *args):
+        self.close(complete=exc_type is None)
+
+    def __repr__(self):
+        return "Checkpoint '%s': walk %s, processed down to size %s" % (
+            self.directory, "saved" if self.state["walk"] else "not saved", self.state["processed_size"])
+
+    def __path(self, name):
+        return os.path.join(self.directory, name)
+
+    def save(self, force=True):
+        """ Writes the state (replacing the previous one when it is written), at most every CHECKPOINT_SECONDS
+        unless `force` """
+        now = time.monotonic()
+        if not force and self.__saved is not None and now - self.__saved < CHECKPOINT_SECONDS:
+            return
+        with open(self.__path(STATE + ".tmp"), "w", encoding="utf-8") as f:
+            json.dump(self.state, f)
+        os.replace(self.__path(STATE + ".tmp"), self.__path(STATE))
+        self.__saved = now
+
+    def walk(self, files, walk=None):
+        """ Yields the files (FileRecord's): the ones of the saved walk if it is complete (stat'ed again, the ones
+        removed since are dropped), otherwise the `files` given, saved as they are yielded. The files of the saved
+        walk are added to `walk` (WalkStats) if it is given. """
+        if self.state["walk"]:
+            count = 0
+            seconds = 0.0
+            with open(self.__path(WALK), encoding="utf-8") as f:
+                for line in f:
+                    started = time.perf_counter()
+                    path = json.loads(line)
+                    try:
+                        st = os.lstat(path)
+                    except OSError:
+                        continue
+                    finally:
+                        seconds += time.perf_counter() - started
+                    if stat.S_ISREG(st.st_mode):
+                        count += 1
+                        yield FileRecord.from_stat(path, st)
+            if walk is not None:
+                walk.files += count
+                walk.seconds += seconds
+            return
+        with open(self.__path(WALK + ".tmp"), "w", encoding="utf-8") as f:
+            for record in files:
+                f.write(json.dumps(record.path, ensure_ascii=False) + "\n")
+                yield record
+        os.replace(self.__path(WALK + ".tmp"), self.__path(WALK))
+        self.state["walk"] = True
+        self.save()
+
+    def get_cache(self, cache=None):
+        """ Returns the hash cache the keys of the stages are saved to: `cache` (HashCache) if it is given, the one
+        of the state directory otherwise; it is committed every CHECKPOINT_SECONDS """
+        if cache is None:
+            if self.cache is None:
+                from duplicates.hashcache import HashCache
+                self.cache = HashCache(self.__path(KEYS))
+            cache = self.cache
+        cache.commit_seconds = CHECKPOINT_SECONDS
+        return cache
+
+    def is_processed(self, size):
+        """ Checks if the duplicates of the size were processed (the sizes are processed largest first) """
+        return self.state["processed_size"] is not None and size >= self.state["processed_size"]
+
+    def processed(self, size):
+        """ Marks the duplicates of the size (and of the larger ones) processed """
+        self.state["processed_size"] = size
+        self.save(force=False)
+
+    def remove(self):
+        """ Removes the state files """
+        for name in (STATE, WALK, KEYS):
+            for path in (self.__path(name), self.__path(name + ".tmp")):
+                if os.path.exists(path):
+                    os.unlink(path)
+
+    def close(self, complete=False):
+        """ Saves the state, removes it (and the directory if it is left empty) if the run is `complete` """
+        if self.cache is not None:
+            self.cache.close()
+            self.cache = None
+        if complete:
+            self.remove()
+            try:
+                os.rmdir(self.directory)
+            except OSError:
+                pass
+        else:
+            self.save()
@@ -0,0 +1,167 @@
+"""
+Created on Oct 18, 2026
+
+@author: "Alexey Mavrin"
+@email alexeymavrin@gmail.com
+
+Near duplicates: the files are split into content-defined chunks (Gear rolling hash), the chunk digests are indexed
+and the pairs of the files sharing a large part of their data (truncated or appended copies, re-tagged media files)
+are reported.
+"""
+
+import random
+import struct
+import time
+
+from duplicates.duplicatefilefinder import HASH_ALGORITHMS, BLOCK_SIZE, get_stage, iter_keys, open_input
+from duplicates.scheduler import DeviceScheduler
+
+CHUNK_SIZE = 8 * 1024  # average chunk size, a power of two
+DIGEST_SIZE = 16  # bytes of the chunk digest kept
+CHUNK = struct.Struct("<I%ds" % DIGEST_SIZE)  # chunk length, digest
+MAX_CHUNK_FILES = 64  # chunks found in more files (blank blocks, common headers) are not counted
+_random = random.Random(0x47656172)  # fixed seed: the chunks are cached, must not change between the runs
+GEAR = tuple(_random.getrandbits(64) for _ in range(256))
+GEAR_MASK = (1 << 64) - 1
+
+
+def get_cut_mask(chunk_size):
+    """ Returns the mask of the rolling hash bits that are all zero at a cut point, the highest bits are used as
+    they depend on the last 64 bytes (the lowest ones on a few last bytes only) """
+    bits = chunk_size.bit_length() - 1
+    return ((1 << bits) - 1) << (64 - bits)
+
+
+def find_cut(data, mask, min_size, max_size):
+    """ Returns the length of the first chunk of the data, None if the data ends before the cut point """
+    rolling = 0
+    # the hash depends on the last 64 bytes only, no need to roll it over the bytes before
+    position = max(0, min_size - 64)
+    for byte in memoryview(data)[position:max_size]:
+        rolling = ((rolling << 1) + GEAR[byte]) & GEAR_MASK
+        position += 1
+        if not rolling & mask and position >= min_size:
+            return position
+    return max_size if len(data) >= max_size else None
+
+
+def get_chunks(filename, algorithm="sha256", chunk_size=CHUNK_SIZE, block_size=BLOCK_SIZE, stage=None):
+    """ Yields (length, digest) of the content-defined chunks of the file, `chunk_size` bytes long on average
+    (a quarter to 8 times that). The file is read block by block, at most a block and a chunk are kept in memory.
+    The time spent reading and chunking is added to the stage (StageStats) if it is given. """
+    mask = get_cut_mask(chunk_size)
+    min_size, max_size = chunk_size // 4, chunk_size * 8
+    hash_function = HASH_ALGORITHMS[algorithm]
+    pending = bytearray()
+    io_seconds = hash_seconds = 0.0
+    with open_input(filename) as input_file:
+        while True:
+            started = time.perf_counter()
+            block = input_file.read(block_size)
+            read = time.perf_counter()
+            io_seconds += read - started
+            pending += block
+            chunks = []
+            while pending:
+                cut = find_cut(pending, mask, min_size, max_size)
+                if cut is None:
+                    if block:
+                        break
+                    cut = len(pending)  # the end of the file
+                chunks.append((cut, hash_function(pending[:cut]).digest()[:DIGEST_SIZE]))
+                del pending[:cut]
+            hash_seconds += time.perf_counter() - read
+            yield from chunks
+            if not block:
+                break
+    if stage is not None:
+        stage.timed(io_seconds, hash_seconds)
+
+
+def get_chunk_key(filename, algorithm="sha256", chunk_size=CHUNK_SIZE, block_size=BLOCK_SIZE, stage=None):
+    """ Returns the chunks of the file packed into bytes (CHUNK per chunk) - the key kept in the hash cache """
+    return b"".join(CHUNK.pack(length, digest)
+                    for length, digest in get_chunks(filename, algorithm, chunk_size, block_size, stage))
+
+
+class ChunkIndex(object):
+    """ Index of the chunk digests: digest -> (length, ids of the files having the chunk).
+    A chunk found more than once in a file is counted once. """
+
+    def __init__(self, max_chunk_files=MAX_CHUNK_FILES):
+        self.files = []  # file id -> FileRecord
+        self.chunks = {}
+        self.max_chunk_files = max_chunk_files
+
+    def __len__(self):
+        return len(self.files)
+
+    def add(self, record, key):
+        """ Adds the chunks of the file (FileRecord, the key returned by get_chunk_key) """
+        file_id = len(self.files)
+        self.files.append(record)
+        for length, digest in set(CHUNK.iter_unpack(key)):
+            entry = self.chunks.get(digest)
+            if entry is None:
+                self.chunks[digest] = (length, [file_id])
+            elif len(entry[1]) <= self.max_chunk_files:
+                entry[1].append(file_id)
+
+    def shared(self):
+        """ Returns the dictionary (first file id, second file id) -> bytes the files share """
+        pairs = {}
+        for length, file_ids in self.chunks.values():
+            if len(file_ids) < 2 or len(file_ids) > self.max_chunk_files:
+                continue
+            for i, first in enumerate(file_ids):
+                for second in file_ids[i + 1:]:
+                    pairs[first, second] = pairs.get((first, second), 0) + length
+        return pairs
+
+    def reclaimable(self):
+        """ Returns the bytes the chunks found in more than one file take beyond their first copy """
+        return sum(length * (len(file_ids) - 1) for length, file_ids in self.chunks.values()
+                   if len(file_ids) <= self.max_chunk_files)
+
+    def pairs(self, threshold):
+        """ Returns the list of (first, second, shared bytes) of the files (FileRecord's) sharing at least
+        `threshold` fraction of the smaller one, sharing the most first. Hard links are not reported. """
+        result = []
+        for (first, second), shared in self.shared().items():
+            first, second = self.files[first], self.files[second]
+            if first.file_id != second.file_id and shared >= threshold * min(first.size, second.size):
+                result.append((first, second, shared))
+        result.sort(key=lambda pair: (-pair[2], pair[0].path, pair[1].path))
+        return result
+
+
+def find_near_duplicates(files, threshold, chunk_size=CHUNK_SIZE, cache=None, jobs=1, algorithm="sha256",
+                         block_size=BLOCK_SIZE, stages=None, rotational_jobs=1, device_jobs=None):
+    """ Finds the pairs of the files (FileRecord's) sharing at least `threshold` fraction of the smaller file.
+    The chunks are calculated by `jobs` threads (DeviceScheduler) and kept in the hash cache if it is given.
+    Returns the list of (first, second, shared bytes), see ChunkIndex.pairs, and the bytes reclaimable by keeping
+    every chunk once (ChunkIndex.reclaimable). Empty files are skipped.
+    The statistics are added to the "Chunks" stage of the `stages` list if it is given. """
+    stage = get_stage(stages if stages is not None else [], "Chunks", read_size=lambda record: record.size)
+    files = [record for record in files if record.size > 0]
+    index = ChunkIndex()
+    executor = DeviceScheduler(jobs, rotational_jobs, device_jobs) if jobs > 1 else None
+    started = time.perf_counter()
+    try:
+        if executor is not None:
+            files = executor.order(files)
+
+        def key_function(record):
+            return get_chunk_key(record.path, algorithm, chunk_size, block_size, stage)
+
+        for record, key in iter_keys(key_function, "chunks-%s-%d" % (algorithm, chunk_size), files, cache, executor,
+                                     on_read=stage.read):
+            stage.checked(record)
+            index.add(record, key)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    pairs = index.pairs(threshold)
+    stage.passed({record.file_id: record for pair in pairs for record in pair[:2]}.values())
+    stage.seconds += time.perf_counter() - started
+    return pairs, index.reclaimable()
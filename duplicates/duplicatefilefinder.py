@@ -4,11 +4,42 @@
 but does NOT delete them."""
 
 import hashlib
+import heapq
 import os
+import queue
+import threading
+import time
 import zlib
-from functools import reduce, partial
+from collections import deque
+from concurrent.futures import Future
+from functools import partial
+from operator import attrgetter
 
 from duplicates import UpdatePrinter
+from duplicates.scheduler import DeviceScheduler, get_device
+from duplicates.throttle import get_throttle
+
+BLOCK_SIZE = 1024 * 1024
+SAMPLE_BLOCK_SIZE = 64 * 1024
+SAMPLE_RATIO = 16  # files are sampled only if they are that many times larger than the samples
+CRC_SIZE = 1024
+
+# name -> hash object constructor, the name is stored along with the digests (e.g. in the hash cache)
+HASH_ALGORITHMS = {"sha256": hashlib.sha256, "blake2b": hashlib.blake2b}
+try:
+    import xxhash
+
+    HASH_ALGORITHMS["xxhash"] = xxhash.xxh3_128
+except ImportError:
+    pass
+try:
+    import blake3
+
+    HASH_ALGORITHMS["blake3"] = blake3.blake3
+except ImportError:
+    pass
+
+_buffers = threading.local()  # read buffer preallocated per thread
 
 __author__ = "Michael Krisper"
 __copyright__ = "Copyright 2012, Michael Krisper"
@@ -21,64 +52,646 @@ __status__ = "Production"
 __python_version__ = "2.7.3"
 
 
-def get_hash_key(filename):
-    """Calculates the hash value for a file."""
-    hash_object = hashlib.sha256()
-    with open(filename, 'rb') as input_file:
-        for chunk in iter(partial(input_file.read, 1024 * 8), b""):
-            hash_object.update(chunk)
+class StageStats(object):
+    """Statistics of a stage of the duplicates search."""
+
+    def __init__(self, name, read_size=None):
+        self.name = name.strip()
+        self.files_in = 0
+        self.files_out = 0
+        self.bytes_in = 0  # total size of the files checked by the stage
+        self.bytes_out = 0  # total size of the files left for the next stage
+        self.bytes_read = 0
+        self.seconds = 0.0  # wall time
+        self.io_seconds = 0.0  # time blocked on reading the files, summed over the threads
+        self.hash_seconds = 0.0  # time spent hashing (comparing) the data read, summed over the threads
+        self.__read_size = read_size  # record -> bytes the stage reads to calculate the key
+        self.__lock = threading.Lock()
+
+    def __repr__(self):
+        return "(%s) files: %d -> %d, eliminated: %d bytes, read: %d bytes in %.2f sec. (io: %.2f, hash: %.2f)" % (
+            self.name, self.files_in, self.files_out, self.bytes_eliminated, self.bytes_read, self.seconds,
+            self.io_seconds, self.hash_seconds)
+
+    @property
+    def bytes_eliminated(self):
+        """Total size of the files the stage proved unique (no need to read them further)"""
+        return self.bytes_in - self.bytes_out
+
+    def checked(self, record):
+        self.files_in += 1
+        self.bytes_in += record.size
+
+    def passed(self, records):
+        self.files_out += len(records)
+        self.bytes_out += sum(record.size for record in records)
+
+    def read(self, record):
+        if self.__read_size is not None:
+            self.bytes_read += self.__read_size(record)
+
+    def timed(self, io_seconds, hash_seconds):
+        """Adds the time a key function spent reading and hashing a file (called by the worker threads)"""
+        with self.__lock:
+            self.io_seconds += io_seconds
+            self.hash_seconds += hash_seconds
+
+    def as_dict(self):
+        return {"name": self.name, "files_in": self.files_in, "files_out": self.files_out, "bytes_in": self.bytes_in,
+                "bytes_out": self.bytes_out, "bytes_eliminated": self.bytes_eliminated,
+                "bytes_read": self.bytes_read, "seconds": self.seconds, "io_seconds": self.io_seconds,
+                "hash_seconds": self.hash_seconds}
+
+
+class WalkStats(object):
+    """Statistics of the directory walk: time spent listing and stat'ing, the slowest directories."""
+
+    def __init__(self, slowest=10):
+        self.directories = 0
+        self.files = 0
+        self.seconds = 0.0  # time spent in the walk, the time the caller spends on the files yielded not counted
+        self.slowest = []  # heap of (seconds, files, path) of the `slowest` directories taking the most time
+        self.__slowest_count = slowest
+        self.__lock = threading.Lock()  # the roots on different devices are walked in parallel
+
+    def __repr__(self):
+        return "(Walk) directories: %d, files: %d in %.2f sec." % (self.directories, self.files, self.seconds)
+
+    def walked(self, path, files, seconds):
+        with self.__lock:
+            self.directories += 1
+            self.files += files
+            self.seconds += seconds
+            if len(self.slowest) < self.__slowest_count:
+                heapq.heappush(self.slowest, (seconds, files, path))
+            elif self.slowest and seconds > self.slowest[0][0]:
+                heapq.heapreplace(self.slowest, (seconds, files, path))
+
+    def as_dict(self):
+        return {"directories": self.directories, "files": self.files, "seconds": self.seconds,
+                "slowest": [{"path": path, "files": files, "seconds": seconds}
+                            for seconds, files, path in sorted(self.slowest, reverse=True)]}
+
+
+def get_stage(stages, name, read_size=None):
+    """Returns the statistics of the stage from the list, a new one is added if it is not there yet."""
+    for stage in stages:
+        if stage.name == name.strip():
+            return stage
+    stage = StageStats(name, read_size)
+    stages.append(stage)
+    return stage
+
+
+class ConsoleProgress(object):
+    """Progress callback printing the progress of the stages on the console (see UpdatePrinter).
+    A progress callback is called as progress(stage name, files (groups) checked, duplicates found, files in them,
+    done) for every file checked and once more with done=True when the stage is over."""
+
+    def __init__(self):
+        self.__update = UpdatePrinter.UpdatePrinter().update
+
+    def __call__(self, name, checked, duplicates, files, done=False):
+        if name == "Index":
+            self.__update("\r(%s) %d Files found" % (name, checked), force=done)
+        else:
+            self.__update("\r(%s) %d %s checked, %d duplicates found (%d files)" % (
+                name, checked, "Groups" if name == "Compare" else "Files", duplicates, files), force=done)
+        if done:
+            print("")
+
+
+def get_progress(progress):
+    """Returns the progress callback: ConsoleProgress if `progress` is True, None (no progress) if it is false,
+    the callback itself otherwise."""
+    if progress is True:
+        return ConsoleProgress()
+    return progress or None
+
+
+class FileRecord(object):
+    """Lightweight record of a file, filled from a single stat call and carried through all the stages."""
+    __slots__ = ("path", "size", "mtime_ns", "inode", "device", "nlink", "digest")
+    catalog = False  # entry of the golden catalog (see CatalogRecord)
+
+    def __init__(self, path, size, mtime_ns, inode, device, nlink=1, digest=None):
+        self.path = path
+        self.size = size
+        self.mtime_ns = mtime_ns
+        self.inode = inode
+        self.device = device
+        self.nlink = nlink
+        self.digest = digest  # set by the hash stage
+
+    def __repr__(self):
+        return "FileRecord(%r, size=%d)" % (self.path, self.size)
+
+    @property
+    def mtime(self):
+        """Modification time in seconds (as os.path.getmtime)"""
+        return self.mtime_ns / 1e9
+
+    @property
+    def file_id(self):
+        """(device, inode) identifying the file data; the path if the inode is unknown (some windows or network
+        file systems)"""
+        return (self.device, self.inode) if self.inode else self.path
+
+    @classmethod
+    def from_stat(cls, path, st=None):
+        """Creates the record from os.stat result (the file is stat'ed if it is not given)"""
+        if st is None:
+            st = os.stat(path)
+        return cls(path, st.st_size, st.st_mtime_ns, st.st_ino, st.st_dev, st.st_nlink)
+
+
+class CatalogRecord(FileRecord):
+    """Record of an entry of the golden catalog: the file was stat'ed when the catalog was built, it is never read and
+    may be not even mounted. Its (device, inode) identify the hard links within the catalog only, the inode may be
+    reused by another file since."""
+    __slots__ = ()
+    catalog = True
+
+    @property
+    def file_id(self):
+        return ("catalog", self.device, self.inode) if self.inode else self.path
+
+
+class KeyStore(object):
+    """Hash cache of the duplicate file finder keeping the keys of the files (FileRecord objects) in memory: the keys
+    calculated are recorded, the keys known (e.g. read from a shard file) are served. The other files are passed to the
+    hash cache if it is given (see HashCache)."""
+
+    def __init__(self, cache=None):
+        self.cache = cache
+        self.keys = {}  # FileRecord -> {kind: key}
+
+    def lookup(self, record, kind):
+        key = self.keys.get(record, {}).get(kind)
+        if key is None and self.cache is not None:
+            key = self.cache.lookup(record, kind)
+            if key is not None:
+                self.keys.setdefault(record, {})[kind] = key
+        return key
+
+    def contains(self, record, kind):
+        return kind in self.keys.get(record, {}) or (self.cache is not None and self.cache.contains(record, kind))
+
+    def store(self, record, kind, value):
+        self.keys.setdefault(record, {})[kind] = value
+        if self.cache is not None:
+            self.cache.store(record, kind, value)
+
+    def forget(self, record):
+        """Drops the keys of the file (it was changed or removed)"""
+        self.keys.pop(record, None)
+
+
+def get_buffer(block_size):
+    """Returns the read buffer of the thread (reused between the files)."""
+    buffer = getattr(_buffers, "buffer", None)
+    if buffer is None or len(buffer) != block_size:
+        buffer = _buffers.buffer = bytearray(block_size)
+    return buffer
+
+
+def open_input(filename, buffering=-1):
+    """Opens the file for reading (binary), through the I/O throttle if it is set (see throttle.set_throttle)."""
+    input_file = open(filename, 'rb', buffering=buffering)
+    throttle = get_throttle()
+    return input_file if throttle is None else throttle.open(input_file)
+
+
+def get_hash_key(filename, algorithm="sha256", block_size=BLOCK_SIZE, stage=None):
+    """Calculates the hash value for a file.
+    The time spent reading and hashing is added to the stage (StageStats) if it is given."""
+    hash_object = HASH_ALGORITHMS[algorithm]()
+    buffer = get_buffer(block_size)
+    view = memoryview(buffer)
+    io_seconds = hash_seconds = 0.0
+    started = time.perf_counter()
+    with open_input(filename, buffering=0) as input_file:
+        while True:
+            size = input_file.readinto(buffer)
+            read = time.perf_counter()
+            io_seconds += read - started
+            if not size:
+                break
+            hash_object.update(view[:size])
+            started = time.perf_counter()
+            hash_seconds += started - read
+    if stage is not None:
+        stage.timed(io_seconds, hash_seconds)
     return hash_object.digest()
 
 
-def get_crc_key(filename):
+def get_crc_key(filename, stage=None):
     """Calculates the crc value for a file."""
-    with open(filename, 'rb') as input_file:
-        chunk = input_file.read(1024)
-    return zlib.adler32(chunk)
+    started = time.perf_counter()
+    with open_input(filename) as input_file:
+        chunk = input_file.read(CRC_SIZE)
+    read = time.perf_counter()
+    key = zlib.adler32(chunk)
+    if stage is not None:
+        stage.timed(read - started, time.perf_counter() - read)
+    return key
+
+
+def get_sample_size(size, samples, block_size=SAMPLE_BLOCK_SIZE):
+    """Returns the number of bytes get_sample_key reads from a file of the given size: the samples are read only if
+    they are a small part of the file (SAMPLE_RATIO), the smaller files are hashed right away."""
+    sampled = (samples + 2) * block_size
+    return sampled if size >= SAMPLE_RATIO * sampled else 0
+
+
+def get_sample_kind(samples):
+    """Returns the kind (cache key) of the sample keys, None if there is no sampling."""
+    return "sample:%dx%d/%d" % (samples, SAMPLE_BLOCK_SIZE, SAMPLE_RATIO) if samples else None
+
+
+def get_sample_key(filename, size, samples, block_size=SAMPLE_BLOCK_SIZE, stage=None):
+    """Calculates the hash of the blocks at the head, the tail and `samples` evenly spaced offsets of a file.
+    Files not sampled (see get_sample_size) are not read (they are hashed completely anyway), the size is their key."""
+    if not get_sample_size(size, samples, block_size):
+        return size
+    hash_object = hashlib.blake2b(digest_size=16)
+    io_seconds = hash_seconds = 0.0
+    started = time.perf_counter()
+    with open_input(filename) as input_file:
+        for i in range(samples + 2):
+            input_file.seek((size - block_size) * i // (samples + 1))
+            chunk = input_file.read(block_size)
+            read = time.perf_counter()
+            io_seconds += read - started
+            hash_object.update(chunk)
+            started = time.perf_counter()
+            hash_seconds += started - read
+    if stage is not None:
+        stage.timed(io_seconds, hash_seconds)
+    return hash_object.digest()
+
+
+def _compare_files(first, second, block_size, stage=None):
+    """Compares the content of two files, stops at the first difference. Returns (equal, bytes read)."""
+    read = 0
+    io_seconds = compare_seconds = 0.0
+    started = time.perf_counter()
+    try:
+        with open_input(first) as first_file, open_input(second) as second_file:
+            while True:
+                chunk = first_file.read(block_size)
+                other = second_file.read(block_size)
+                compared = time.perf_counter()
+                io_seconds += compared - started
+                read += len(chunk) + len(other)
+                equal = chunk == other
+                started = time.perf_counter()
+                compare_seconds += started - compared
+                if not equal:
+                    return False, read
+                if not chunk:
+                    return True, read
+    finally:
+        if stage is not None:
+            stage.timed(io_seconds, compare_seconds)
+
+
+def partition_by_content(files, block_size=BLOCK_SIZE, stage=None):
+    """Splits the files into the lists of identical ones by comparing their content directly.
+    Returns the lists and the number of bytes read."""
+    partitions = []
+    read = 0
+    for record in files:
+        for same in partitions:
+            equal, compared = _compare_files(same[0].path, record.path, block_size, stage)
+            read += compared
+            if equal:
+                same.append(record)
+                break
+        else:
+            partitions.append([record])
+    return partitions, read
+
+
+def iter_keys(key_function, kind, files, cache=None, executor=None, window=256, on_read=None):
+    """Yields (file record, key) pairs, in the order of the files without the executor.
+    Keys are taken from the cache (if given and the file is unchanged), otherwise they are calculated - by the
+    executor in parallel if given, yielded as they complete - and stored to the cache. At most `window` files of
+    every device (see get_device) are in flight, the files of a device are submitted in their order; a slow device
+    does not hold back the others.
+    on_read(record) is called (in the calling thread) for every calculated key."""
+    use_cache = cache is not None and kind is not None
+    waiting = {}  # device -> files not submitted yet
+    running = {}  # device -> number of the files in flight
+    completed = queue.SimpleQueue()  # (file, Future) of the keys calculated
+
+    def submit(device):
+        while waiting[device] and running[device] < window:
+            record = waiting[device].popleft()
+            future = executor.submit(key_function, record)
+            future.add_done_callback(lambda future, record=record: completed.put((record, future)))
+            running[device] += 1
+
+    def resolve(item):
+        device = get_device(item[0])
+        running[device] -= 1
+        submit(device)
+        return _resolve_key(item, kind, cache if use_cache else None, on_read)
+
+    for record in files:
+        key = cache.lookup(record, kind) if use_cache else None
+        if key is None and executor is not None:
+            device = get_device(record)
+            waiting.setdefault(device, deque()).append(record)
+            running.setdefault(device, 0)
+            submit(device)
+        else:
+            if key is None:
+                key = key_function(record)
+                if use_cache:
+                    cache.store(record, kind, key)
+                if on_read is not None:
+                    on_read(record)
+            yield record, key
+        while not completed.empty():
+            yield resolve(completed.get())
+    while any(running.values()):
+        yield resolve(completed.get())
+
+
+def _resolve_key(item, kind, cache, on_read=None):
+    """Waits for the key calculated by the executor and caches it"""
+    record, key = item
+    if isinstance(key, Future):
+        key = key.result()
+        if cache is not None:
+            cache.store(record, kind, key)
+        if on_read is not None:
+            on_read(record)
+    return record, key
+
+
+def collapse_hard_links(files):
+    """Collapses the files sharing (device, inode) - hard links or the same file found twice - into one.
+    Returns the list of the unique files and the dictionary file_id -> all the files of the inode."""
+    unique = []
+    links = {}
+    for record in files:
+        same = links.setdefault(record.file_id, [])
+        if not same:
+            unique.append(record)
+        same.append(record)
+    return unique, links
+
+
+def compare_small_groups(groups, compare, cache, executor, algorithm="sha256", block_size=BLOCK_SIZE, stage=None,
+                         progress=True):
+    """Verifies the groups of up to `compare` files (hard links counted once) by comparing their content directly.
+    Groups with a hash cached for any of the files are left for hashing. See get_progress for `progress`.
+    Returns the files left for hashing and the list of the confirmed duplicates."""
+    progress = get_progress(progress)
+    stage = stage or StageStats("Compare")
+    files = []
+    small = []
+    for records in groups:
+        unique, links = collapse_hard_links(records)
+        if len(unique) > compare or (cache is not None and any(cache.contains(r, algorithm) for r in unique)):
+            files.extend(records)
+        else:
+            small.append((unique, links))
+
+    duplicates = []  # (position of the group, duplicates)
+    count = 0
+    i = 0
+    positions = {id(item): position for position, item in enumerate(small)}
+    partitions = iter_keys(lambda item: partition_by_content(item[0], block_size, stage), None, small, None,
+                           executor)
+    for i, (item, (partition, read)) in enumerate(partitions, start=1):
+        stage.bytes_read += read
+        for same in partition:
+            same = [link for record in same for link in item[1][record.file_id]]
+            for record in same:
+                stage.checked(record)
+            if len(same) > 1:
+                duplicates.append((positions[id(item)], same))
+                stage.passed(same)
+                count += len(same)
+        if progress is not None:
+            progress("Compare", i, len(duplicates), count)
+    if progress is not None:
+        progress("Compare", i, len(duplicates), count, done=True)
+    duplicates.sort(key=lambda position_same: position_same[0])  # back to the order of the groups
+    return files, [same for _, same in duplicates]
+
+
+def filter_duplicate_files(files, top=None, cache=None, jobs=1, compare=2, algorithm="sha256", block_size=BLOCK_SIZE,
+                           samples=4, stages=None, rotational_jobs=1, device_jobs=None, progress=True):
+    """Finds all duplicate files (FileRecord's) in the directory.
+    The crc and hash keys are taken from the cache (HashCache) when it is given and calculated by `jobs` threads per
+    device (`rotational_jobs` for rotational disks, `device_jobs` maps st_dev to the threads to override it), each
+    device read in the order of the data on the disk (see DeviceScheduler).
+    Before hashing, the files are compared by `samples` blocks evenly spaced between the head and the tail (0 - no
+    sampling) and groups of up to `compare` files are verified by comparing the files instead (0 - always hash).
+    The files are hashed with the `algorithm` (see HASH_ALGORITHMS) and read by `block_size` bytes.
+    StageStats of every stage are appended to the `stages` list if it is given.
+    The progress is printed on the console or reported to the `progress` callback (see get_progress).
+    The result does not depend on the number of jobs."""
+    if stages is None:
+        stages = []
+    if jobs > 1:
+        with DeviceScheduler(jobs, rotational_jobs, device_jobs) as executor:
+            return _filter_duplicate_files(files, top, cache, executor, compare, algorithm, block_size, samples,
+                                           stages, progress)
+    return _filter_duplicate_files(files, top, cache, None, compare, algorithm, block_size, samples, stages,
+                                   progress)
+
 
+def filter_duplicate_buckets(buckets, cache=None, jobs=1, compare=2, algorithm="sha256", block_size=BLOCK_SIZE,
+                             samples=4, stages=None, rotational_jobs=1, device_jobs=None, progress=None):
+    """Finds duplicate files bucket by bucket, a bucket is a list of the files (FileRecord's) of the same size.
+    Yields the list of the duplicates found in each bucket as soon as the bucket is checked, so only one bucket is
+    kept in memory at a time. See filter_duplicate_files for the parameters; no progress is printed by default."""
+    if stages is None:
+        stages = []
+    executor = DeviceScheduler(jobs, rotational_jobs, device_jobs) if jobs > 1 else None
+    try:
+        for bucket in buckets:
+            yield _filter_duplicate_files(bucket, None, cache, executor, compare, algorithm, block_size, samples,
+                                          stages, progress=progress, by_size=False)
+    finally:
+        if executor is not None:
+            executor.shutdown()
 
-def filter_duplicate_files(files, top=None):
-    """Finds all duplicate files in the directory."""
+
+def _filter_duplicate_files(files, top, cache, executor, compare, algorithm, block_size, samples, stages,
+                            progress=True, by_size=True):
+    """Finds all duplicate files, the reading stages are run by the executor (if given).
+    If the executor has an `order` method, the files are read in the order it returns; the result is the same.
+    Hard links are read once, all the links get the key of the first one.
+    The statistics are added to the stages of the same name if they are in the list already."""
     duplicates = {}
-    update = UpdatePrinter.UpdatePrinter().update
-    iterations = ((os.path.getsize, "By Size", top ** 2 if top else None),
+    compared = []
+    groups = []
+    progress = get_progress(progress)
+    # key function (record, stage), name, top count, kind (cache key), bytes read to calculate the key
+    iterations = [(lambda record, stage: record.size, "By Size", top ** 2 if top else None, None, None),
                   # top * top <-- this could be performance optimized further by top*3 or top*4
-                  (get_crc_key, "By CRC ", top * 2 if top else None),  # top * 2
-                  (get_hash_key, "By Hash", None))
+                  (lambda record, stage: get_crc_key(record.path, stage), "By CRC ", top * 2 if top else None, "crc",
+                   lambda record: min(record.size, CRC_SIZE)),  # top * 2
+                  (lambda record, stage: get_hash_key(record.path, algorithm, block_size, stage), "By Hash", None,
+                   algorithm, attrgetter("size"))]
+    if not by_size:  # the files are of the same size
+        del iterations[0]
+    if samples:
+        iterations.insert(-1, (lambda record, stage: get_sample_key(record.path, record.size, samples, stage=stage),
+                               "By Sample", top * 2 if top else None, get_sample_kind(samples),
+                               lambda record: get_sample_size(record.size, samples)))
 
-    for key_function, name, top_count in iterations:
+    for stage_key_function, name, top_count, kind, read_size in iterations:
+        if kind == algorithm and compare:
+            stage = get_stage(stages, "Compare")
+            started = time.perf_counter()
+            files, compared = compare_small_groups(groups, compare, cache, executor, algorithm, block_size, stage,
+                                                   progress)
+            stage.seconds += time.perf_counter() - started
+        stage = get_stage(stages, name, read_size)
+        key_function = partial(stage_key_function, stage=stage)
+        started = time.perf_counter()
         duplicates.clear()
         count = 0
         duplicate_count = 0
         i = 0
-        for i, file_path in enumerate(files, start=1):
-            key = key_function(file_path)
-            duplicates.setdefault(key, []).append(file_path)
-            if len(duplicates[key]) > 1:
-                count += 1
-                if len(duplicates[key]) == 2:
+        links = {}
+        positions = None
+        if kind:
+            if hasattr(executor, "order"):
+                positions = {id(record): i for i, record in enumerate(files)}
+            files, links = collapse_hard_links(files)
+            if positions is not None:
+                files = executor.order(files)
+        keys = iter_keys(key_function, kind, files, cache, executor if kind else None, on_read=stage.read)
+        for i, (record, key) in enumerate(keys, start=1):
+            for link in links.get(record.file_id, (record,)):
+                if kind == algorithm:
+                    link.digest = key
+                stage.checked(link)
+                duplicates.setdefault(key, []).append(link)
+                if len(duplicates[key]) > 1:
                     count += 1
-                    duplicate_count += 1
+                    if len(duplicates[key]) == 2:
+                        count += 1
+                        duplicate_count += 1
 
-            update("\r(%s) %d Files checked, %d duplicates found (%d files)" % (name, i, duplicate_count, count))
-        else:
-            update("\r(%s) %d Files checked, %d duplicates found (%d files)" % (name, i, duplicate_count, count),
-                   force=True)
-        print("")
+            if progress is not None:
+                progress(name, i, duplicate_count, count)
+        if progress is not None:
+            progress(name, i, duplicate_count, count, done=True)
+        if positions is not None:  # back to the order of the files
+            for records in duplicates.values():
+                records.sort(key=lambda record: positions[id(record)])
+            duplicates = dict(sorted(duplicates.items(), key=lambda item: positions[id(item[1][0])]))
         sorted_files = sorted(iter(duplicates.values()), key=len, reverse=True)
-        files = [file_path for file_paths in sorted_files[:top_count] if len(file_paths) > 1 for file_path in
-                 file_paths]
-
-    return [file_list for file_list in duplicates.values() if len(file_list) > 1]
-
-
-def get_files(directory, include_hidden, include_empty):
-    """Returns all FILES in the directory which apply to the filter rules."""
-    return (os.path.join(dir_path, filename)
-            for dir_path, _, file_names in os.walk(directory)
-            for filename in file_names
-            if not os.path.islink(os.path.join(dir_path, filename))
-            and (include_hidden or
-                 reduce(lambda r, d: r and not d.startswith("."),
-                        os.path.abspath(os.path.join(dir_path, filename)).split(os.sep), True))
-            and (include_empty or os.path.getsize(os.path.join(dir_path, filename)) > 0))
+        groups = [records for records in sorted_files[:top_count] if len(records) > 1]
+        files = [record for records in groups for record in records]
+        stage.passed(files)
+        stage.seconds += time.perf_counter() - started
+
+    return [file_list for file_list in duplicates.values() if len(file_list) > 1] + compared
+
+
+def get_files(directory, include_hidden, include_empty, walk=None):
+    """Returns all FILES (FileRecord's) in the directory which apply to the filter rules.
+    The directory tree is walked with os.scandir, every file is stat'ed once, symlinks and special files skipped.
+    The time spent on every directory is added to `walk` (WalkStats) if it is given."""
+    if not include_hidden and any(d.startswith(".") for d in os.path.abspath(directory).split(os.sep)):
+        return
+    stack = [directory]
+    while stack:
+        dir_path = stack.pop()
+        seconds = 0.0
+        files = 0
+        started = time.perf_counter()
+        try:
+            entries = os.scandir(dir_path)
+        except OSError:
+            continue
+        sub_dirs = []
+        with entries:
+            for entry in entries:
+                if not include_hidden and entry.name.startswith("."):
+                    continue
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        sub_dirs.append(entry.path)
+                    elif entry.is_file(follow_symlinks=False):
+                        record = FileRecord.from_stat(entry.path, entry.stat(follow_symlinks=False))
+                        if include_empty or record.size > 0:
+                            files += 1
+                            seconds += time.perf_counter() - started
+                            yield record
+                            started = time.perf_counter()
+                except OSError:
+                    continue
+        if walk is not None:
+            walk.walked(dir_path, files, seconds + time.perf_counter() - started)
+        stack.extend(reversed(sub_dirs))  # depth first, in the listing order (as os.walk)
+
+
+def get_files_of_roots(roots, include_hidden, include_empty, walk=None, walker=get_files, parallel=True):
+    """Returns all FILES (FileRecord's) in the roots, see get_files. The roots are walked by the `walker` function.
+    If `parallel`, the roots on different devices are walked at the same time (a thread per device), the roots of
+    the same device one after another; the files of a device are returned in the walk order."""
+    devices = {}
+    for root in roots:
+        try:
+            device = os.stat(root).st_dev
+        except OSError:
+            device = None
+        devices.setdefault(device, []).append(root)
+    if not parallel or len(devices) < 2:
+        for root in roots:
+            yield from walker(root, include_hidden, include_empty, walk=walk)
+        return
+
+    results = queue.Queue(maxsize=64)
+    stop = threading.Event()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                results.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def walk_device(device_roots):
+        try:
+            batch = []
+            for root in device_roots:
+                for record in walker(root, include_hidden, include_empty, walk=walk):
+                    batch.append(record)
+                    if len(batch) >= 1024:
+                        put(batch)
+                        batch = []
+            put(batch)
+        except Exception as e:
+            put(e)
+        finally:
+            put(None)
+
+    threads = [threading.Thread(target=walk_device, args=(device_roots,), daemon=True)
+               for device_roots in devices.values()]
+    for thread in threads:
+        thread.start()
+    try:
+        running = len(threads)
+        while running:
+            item = results.get()
+            if item is None:
+                running -= 1
+            elif isinstance(item, Exception):
+                raise item
+            else:
+                yield from item
+    finally:
+        stop.set()
@@ -5,19 +5,26 @@ Created on Feb 3, 2018
 @email alexeymavrin@gmail.com
 """
 
-import argparse
-import humanize
+import json
 import logging
 import os
 import sys
+from contextlib import ExitStack, redirect_stdout
 from datetime import datetime
-from itertools import chain
-from time import ctime
-from traceback import print_exc
-
-from duplicates.duplicatefilefinder import get_files, filter_duplicate_files
-
-logging.basicConfig()
+from itertools import chain, groupby
+from operator import attrgetter
+
+from duplicates.api import find_duplicates, walk_roots, is_under, get_walk_roots
+from duplicates.asyncwalk import CONCURRENCY
+from duplicates.checkpoint import CHECKPOINT_SECONDS
+from duplicates.chunking import CHUNK_SIZE, find_near_duplicates
+from duplicates.duplicatefilefinder import ConsoleProgress, HASH_ALGORITHMS, BLOCK_SIZE, WalkStats
+from duplicates.output import ACTIONS, FORMATS, TextWriter, get_writer, naturalsize
+from duplicates.purge import Action, Purger, PlanWriter, read_plan, remove_empty_dirs
+from duplicates.throttle import set_throttle
+
+# The modules slow to import (argparse, asyncio, humanize, sqlite3) are imported on the code paths needing them only,
+# short scheduled runs do not pay for them
 logger = logging.getLogger("duplicates")
 
 
@@ -31,50 +38,387 @@ class Stats(object):
 
     def __init__(self):
         self.total_files = 0
+        self.groups = 0
         self.keep_files = 0
         self.skipped_files = 0
         self.to_delete_files = 0
         self.deleted_files = 0
+        self.hard_links = 0  # files to delete that are just hard links to a kept file (no space reclaimed)
+        self.reclaimable_bytes = 0
+        self.linked_files = 0
+        self.near_pairs = 0  # pairs of the files sharing a large part of their data (near duplicates mode)
+        self.stages = []  # duplicatefilefinder.StageStats of the search stages
+        self.walk = WalkStats()  # time spent walking the directories, the slowest ones
+        self.io = None  # throttle.Throttle the files were read through (throughput achieved vs. the limits)
+        self.summary = None  # reported instead of the duplicates totals (the commands that search no duplicates)
 
     def __repr__(self):
-        return "Total duplicates: %i, keep: %i, skipped (in golden): %i, deleted: %i/%i" % (
-            self.keep_files + self.skipped_files + self.to_delete_files,
-            self.keep_files,
-            self.skipped_files,
-            self.deleted_files,
-            self.to_delete_files)
+        if self.summary is not None:
+            summary = self.summary
+        else:
+            summary = "Total duplicates: %i, keep: %i, skipped (in golden): %i, deleted: %i/%i, hard linked: %i, " \
+                      "reclaimable: %s (%i hard links)" % (
+                          self.keep_files + self.skipped_files + self.to_delete_files,
+                          self.keep_files,
+                          self.skipped_files,
+                          self.deleted_files,
+                          self.to_delete_files,
+                          self.linked_files,
+                          naturalsize(self.reclaimable_bytes),
+                          self.hard_links) + (", near duplicate pairs: %i" % self.near_pairs if self.near_pairs else "")
+        return summary + ("\n" + self.io_report() if self.io is not None else "")
+
+    def io_report(self):
+        """ Returns the throughput of the reads vs. the limits of the throttle as text """
+        io = self.io.as_dict()
+        return "I/O: %s in %i reads, %s/s (limit: %s), %.1f reads/s (limit: %s), waited %.2f sec.%s%s" % (
+            naturalsize(io["bytes_read"]), io["reads"], naturalsize(io["bandwidth"] or 0),
+            naturalsize(io["bandwidth_limit"]) + "/s" if io["bandwidth_limit"] else "none", io["iops"] or 0,
+            "%i/s" % io["iops_limit"] if io["iops_limit"] else "none", io["waited_seconds"],
+            ", %i back-offs (latency limit: %i ms, bandwidth limit at the end: %s)" % (
+                io["backoffs"], io["latency_limit"] * 1000,
+                naturalsize(io["final_bandwidth_limit"]) + "/s" if io["final_bandwidth_limit"] else "none")
+            if io["latency_limit"] else "",
+            ", page cache dropped" if io["nocache"] else "")
+
+    def profile(self):
+        """ Returns the walk and the search stages statistics as text, a line per stage """
+        return "\n".join([repr(self.walk)] + ["   %8.2f sec. %s (%i files)" % (seconds, path, files)
+                                               for seconds, files, path in sorted(self.walk.slowest, reverse=True)]
+                         + [repr(stage) for stage in self.stages])
+
+    def as_dict(self):
+        """ Returns the statistics as a dictionary (JSON serializable) """
+        return {"total_files": self.total_files, "groups": self.groups, "keep_files": self.keep_files,
+                "skipped_files": self.skipped_files, "to_delete_files": self.to_delete_files,
+                "deleted_files": self.deleted_files, "hard_links": self.hard_links,
+                "reclaimable_bytes": self.reclaimable_bytes, "linked_files": self.linked_files,
+                "near_pairs": self.near_pairs, "io": self.io.as_dict() if self.io is not None else None,
+                "walk": self.walk.as_dict(), "stages": [stage.as_dict() for stage in self.stages]}
+
+
+def add_io_arguments(parser):
+    """ Adds the options of the I/O throttle (see get_throttle_of) """
+    parser.add_argument('--io-bandwidth',
+                        help='(optional) limit of the reads, MiB per second, shared by all the jobs',
+                        type=float, required=False)
+    parser.add_argument('--io-iops',
+                        help='(optional) limit of the reads (calls) per second, shared by all the jobs',
+                        type=int, required=False)
+    parser.add_argument('--io-latency',
+                        help='(optional) adaptive throttle: the bandwidth is halved while the average read latency '
+                             'is above IO_LATENCY milliseconds, raised back while it is below half of it',
+                        type=float, required=False)
+    parser.add_argument('--io-nocache',
+                        help='drop the data read from the page cache (posix_fadvise), the caches of the other '
+                             'services are not evicted',
+                        action='store_true')
+
+
+def check_io_arguments(args):
+    if any(value is not None and value <= 0 for value in (args.io_bandwidth, args.io_iops, args.io_latency)):
+        raise ArgumentCheck("--io-bandwidth, --io-iops and --io-latency must be positive")
+
+
+def get_throttle_of(args):
+    """ Returns throttle.Throttle of the --io-* options, None if there are none """
+    if args.io_bandwidth is None and args.io_iops is None and args.io_latency is None and not args.io_nocache:
+        return None
+    from duplicates.throttle import Throttle
+    return Throttle(args.io_bandwidth * 1024 * 1024 if args.io_bandwidth else None, args.io_iops,
+                    args.io_latency / 1000 if args.io_latency else None, args.io_nocache)
+
+
+def get_io_options(args, shards=1):
+    """ Returns the --io-* options of the processes sharing the limits (split between them) """
+    options = []
+    if args.io_bandwidth:
+        options += ["--io-bandwidth", repr(args.io_bandwidth / shards)]
+    if args.io_iops:
+        options += ["--io-iops", str(max(1, args.io_iops // shards))]
+    if args.io_latency:
+        options += ["--io-latency", repr(args.io_latency)]
+    if args.io_nocache:
+        options.append("--io-nocache")
+    return options
 
 
 def parse_arguments():
     """ Parses the arguments """
+    import argparse
     description = ("Finds duplicates in both `work` and `golden` folders. \n"
                    "If --purge flag set,\n"
                    "Only the duplicates that are in `work` folder are removed.\n" 
-                   "Keeps an oldest file.")
+                   "Keeps an oldest file.\n"
+                   "Both --work and --golden can be repeated, all the folders are searched at once. The file kept is\n"
+                   "the one in the first folder given (golden ones first), the oldest one within the folder.")
     parser = argparse.ArgumentParser(formatter_class=argparse.RawDescriptionHelpFormatter, description=description)
     parser.add_argument('-v', '--verbose', help='display debug info', action='store_true')
     parser.add_argument('-g', '--golden',
                         help='(optional) path to the folder where duplicates will be searched though this folder will '
-                             'be unchanged',
-                        required=False)
+                             'be unchanged, can be repeated',
+                        action='append', required=False)
     parser.add_argument('-w', '--work',
-                        help='work folder that will be stripped from the duplicates found in both itself and `golden`',
-                        required=True)
+                        help='work folder that will be stripped from the duplicates found in both itself and `golden`, '
+                             'can be repeated',
+                        action='append', required=False)
+    parser.add_argument('--golden-catalog',
+                        help='(optional) catalog of golden folders written by `duplicates catalog build`, its files '
+                             'are golden ones though they are not walked or read (the folders need not be mounted). '
+                             'Work files are read only if their size is in the catalog or in work',
+                        required=False)
     parser.add_argument('-p', '--purge',
                         help='purge/ delete extra files from `work` folder. '
                              'If all copies are under work, single (with oldest '
                              'modification time) file will be preserved. All duplicates in golden also '
                              'preserved/skipped.',
                         action='store_true')
+    parser.add_argument('-l', '--hardlink',
+                        help='replace the duplicates in `work` folder with hard links to the kept file instead of '
+                             'deleting them (the files share the data afterwards)',
+                        action='store_true')
+    parser.add_argument('--plan',
+                        help='(optional) file the deletions (--purge) or hard links (--hardlink) are written to '
+                             'instead of applying them, nothing is changed. Review it and apply with --apply-plan',
+                        required=False)
+    parser.add_argument('--apply-plan',
+                        help='apply the plan file written with --plan without searching again (no other options '
+                             'needed). Files changed since the plan (or which kept copy changed) are skipped',
+                        required=False)
+    parser.add_argument('-c', '--cache',
+                        help='(optional) path to the file where the file keys (crc, hash) are cached between the runs. '
+                             'Unchanged files (same device, inode, size and modification time) are not read again',
+                        required=False)
+    parser.add_argument('-j', '--jobs',
+                        help='number of files read and hashed in parallel (default: number of CPUs)',
+                        type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--rotational-jobs',
+                        help='number of files read in parallel from a rotational disk (default: 1). Every device is '
+                             'read by its own threads, rotational disks in the order of the data on the disk',
+                        type=int, default=1)
+    parser.add_argument('--device-jobs',
+                        help='number of files read in parallel from the device of the PATH, overrides the detection '
+                             '(e.g. for network file systems), can be repeated',
+                        metavar='PATH=JOBS', action='append', default=[])
+    parser.add_argument('--compare',
+                        help='groups of up to COMPARE files are verified by comparing the files directly instead of '
+                             'hashing them, 0 - always hash (default: 2)',
+                        type=int, default=2)
+    parser.add_argument('--samples',
+                        help='number of blocks evenly spaced between the head and the tail compared before hashing '
+                             'the whole files (the ones at least 16 times larger than the blocks sampled), 0 - no '
+                             'sampling (default: 4)',
+                        type=int, default=4)
+    parser.add_argument('--hash',
+                        help='hash algorithm (default: sha256). The hash cache keeps the hashes of each algorithm '
+                             'separately',
+                        choices=sorted(HASH_ALGORITHMS), default="sha256")
+    parser.add_argument('--block-size',
+                        help='size of the blocks the files are read by, in bytes (default: %d)' % BLOCK_SIZE,
+                        type=int, default=BLOCK_SIZE)
+    parser.add_argument('--walker',
+                        help='directory walker: scandir - one call at a time, async - many directory listings and '
+                             'stat calls in flight at once, for network file systems (NFS, SMB) (default: scandir)',
+                        choices=("scandir", "async"), default="scandir")
+    parser.add_argument('--walk-concurrency',
+                        help='number of calls the async walker keeps in flight (default: %d)' % CONCURRENCY,
+                        type=int, default=CONCURRENCY)
+    parser.add_argument('--stream',
+                        help='bounded memory mode for huge trees: the files are kept in a compact index and checked '
+                             'and printed size by size (largest first), only one size is expanded in memory at a time',
+                        action='store_true')
+    parser.add_argument('--near',
+                        help='report the pairs of the files sharing at least NEAR (0-1] fraction of the smaller file '
+                             'instead of the exact duplicates (truncated or appended copies, re-tagged media files). '
+                             'The files are split into content-defined chunks, slow: every byte is rolled in Python',
+                        type=float, required=False)
+    parser.add_argument('--chunk-size',
+                        help='average size of the chunks of --near, a power of two (default: %d)' % CHUNK_SIZE,
+                        type=int, default=CHUNK_SIZE)
+    parser.add_argument('--watch',
+                        help='keep running after the search: watch the folders (inotify, polling if it is not '
+                             'available) and report (purge with --purge/--hardlink) the duplicates of the files '
+                             'created or modified, only they are read (always hashed, --compare is ignored). Stop '
+                             'with Ctrl+C',
+                        action='store_true')
+    parser.add_argument('--watch-interval',
+                        help='seconds between the polls of --watch, the longest wait for the changes (default: 2)',
+                        type=float, default=2.0)
+    parser.add_argument('--watch-poll',
+                        help='--watch polls the folders instead of inotify (network file systems)',
+                        action='store_true')
+    parser.add_argument('-f', '--format',
+                        help='output format of the duplicates found (default: text). If the output is not text and '
+                             'written to stdout, the progress and the statistics are printed to stderr',
+                        choices=FORMATS, default="text")
+    parser.add_argument('-o', '--output',
+                        help='(optional) file the duplicates are written to (default: stdout)',
+                        required=False)
+    parser.add_argument('-i', '--incremental',
+                        help='(optional) path to the snapshot file of the previous run. Only the directories modified '
+                             'since then are listed again and only the sizes of the files added, changed or removed '
+                             'searched again, the duplicates of the other sizes are reused (after checking the files '
+                             'are unchanged). Files modified in place are noticed only if they were duplicates',
+                        required=False)
+    parser.add_argument('--checkpoint',
+                        help='(optional) state directory the run is checkpointed to: the files found, the keys of the '
+                             'stages (every %i sec.) and, with --stream, the sizes processed. Removed when the run is '
+                             'complete' % CHECKPOINT_SECONDS,
+                        required=False)
+    parser.add_argument('--resume',
+                        help='continue the interrupted run (the same folders and options) from --checkpoint: the '
+                             'files are not listed again and the keys of the unchanged files (size, modification '
+                             'time) are not calculated again',
+                        action='store_true')
+    add_io_arguments(parser)
+    parser.add_argument('--profile',
+                        help='print the time spent walking (and the slowest directories) and per search stage: files '
+                             'in and out, bytes read, wall time, time blocked on reading vs. hashing',
+                        action='store_true')
+    parser.add_argument('--stats-json',
+                        help='(optional) file the statistics (including the profile) are written to as JSON',
+                        required=False)
 
     args, unparsed = parser.parse_known_args()
     if unparsed:
         raise Exception("Unknown arguments: %s" % unparsed)
+    if not args.work and not args.apply_plan:
+        raise ArgumentCheck("-w/--work is required")
+    if args.purge and args.hardlink:
+        raise ArgumentCheck("--purge and --hardlink are mutually exclusive")
+    if args.plan and not (args.purge or args.hardlink):
+        raise ArgumentCheck("--plan needs --purge or --hardlink")
+    if args.block_size <= 0:
+        raise ArgumentCheck("--block-size must be positive")
+    if args.samples < 0 or args.compare < 0:
+        raise ArgumentCheck("--samples and --compare must not be negative")
+    if args.jobs < 1 or args.rotational_jobs < 1:
+        raise ArgumentCheck("--jobs and --rotational-jobs must be positive")
+    device_jobs = {}
+    for value in args.device_jobs:
+        path, _, jobs = value.rpartition("=")
+        if not path or not jobs.isdigit() or int(jobs) < 1:
+            raise ArgumentCheck("--device-jobs must be PATH=JOBS, got '%s'" % value)
+        device_jobs[path] = int(jobs)
+    args.device_jobs = device_jobs
+    if args.walk_concurrency < 1:
+        raise ArgumentCheck("--walk-concurrency must be positive")
+    if args.incremental and args.walker != "scandir":
+        raise ArgumentCheck("--incremental works with the scandir walker only")
+    if args.incremental and args.stream:
+        raise ArgumentCheck("--incremental and --stream are mutually exclusive")
+    if args.golden_catalog and (args.hardlink or args.incremental or args.near is not None):
+        raise ArgumentCheck("--golden-catalog can not be used with --hardlink, --incremental or --near")
+    if args.near is not None:
+        if not 0 < args.near <= 1:
+            raise ArgumentCheck("--near must be in (0, 1]")
+        if args.purge or args.hardlink or args.apply_plan or args.stream or args.incremental:
+            raise ArgumentCheck("--near only reports, it can not be used with --purge, --hardlink, --apply-plan, "
+                                "--stream or --incremental")
+        if args.format == "csv":
+            raise ArgumentCheck("--near can not be written as csv")
+    if args.chunk_size < 256 or args.chunk_size & (args.chunk_size - 1):
+        raise ArgumentCheck("--chunk-size must be a power of two, at least 256")
+    check_io_arguments(args)
+    if args.resume and not args.checkpoint:
+        raise ArgumentCheck("--resume needs --checkpoint")
+    if args.checkpoint and (args.incremental or args.watch or args.near is not None or args.apply_plan):
+        raise ArgumentCheck("--checkpoint can not be used with --incremental, --watch, --near or --apply-plan")
+    if args.watch:
+        if args.stream or args.incremental or args.near is not None or args.plan or args.golden_catalog or \
+                args.apply_plan:
+            raise ArgumentCheck("--watch can not be used with --stream, --incremental, --near, --plan, "
+                                "--golden-catalog or --apply-plan")
+        if args.watch_interval <= 0:
+            raise ArgumentCheck("--watch-interval must be positive")
 
     parse_arguments.ARGS = args
     return parse_arguments.ARGS
 
 
+def parse_catalog_arguments(argv):
+    """ Parses the arguments of `duplicates catalog build` """
+    import argparse
+    parser = argparse.ArgumentParser(prog="duplicates catalog build",
+                                     description="Writes the catalog of the golden folders (sizes, crc, samples and "
+                                                 "hashes of the files) used by --golden-catalog instead of walking and "
+                                                 "reading the folders.")
+    parser.add_argument('command', choices=("build",))
+    parser.add_argument('-v', '--verbose', help='display debug info', action='store_true')
+    parser.add_argument('-g', '--golden', help='golden folder, can be repeated', action='append', required=True)
+    parser.add_argument('-o', '--output', help='catalog file (replaced when the catalog is complete)', required=True)
+    parser.add_argument('-c', '--cache', help='(optional) path to the hash cache file', required=False)
+    parser.add_argument('-j', '--jobs', help='number of files read and hashed in parallel (default: number of CPUs)',
+                        type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--samples', help='number of blocks sampled (default: 4), used by the searches with the '
+                                          'catalog', type=int, default=4)
+    parser.add_argument('--hash', help='hash algorithm (default: sha256), the searches with the catalog must use it',
+                        choices=sorted(HASH_ALGORITHMS), default="sha256")
+    parser.add_argument('--block-size', help='size of the blocks the files are read by, in bytes (default: %d)' %
+                                             BLOCK_SIZE, type=int, default=BLOCK_SIZE)
+    parser.add_argument('--profile', help='print the time spent walking and per stage', action='store_true')
+    parser.add_argument('--stats-json', help='(optional) file the statistics are written to as JSON', required=False)
+    add_io_arguments(parser)
+    args = parser.parse_args(argv)
+    if args.samples < 0 or args.block_size <= 0 or args.jobs < 1:
+        raise ArgumentCheck("--samples must not be negative, --block-size and --jobs must be positive")
+    check_io_arguments(args)
+    args.format = "text"
+    return args
+
+
+def parse_shard_arguments(argv):
+    """ Parses the arguments of `duplicates shard scan|merge|run` """
+    import argparse
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('-v', '--verbose', help='display debug info', action='store_true')
+    common.add_argument('-c', '--cache', help='(optional) path to the hash cache file', required=False)
+    common.add_argument('-j', '--jobs', help='number of files read and hashed in parallel (default: number of CPUs)',
+                        type=int, default=os.cpu_count() or 1)
+    common.add_argument('--compare', help='groups of up to COMPARE files are compared directly instead of hashing '
+                                          '(default: 2)', type=int, default=2)
+    common.add_argument('--block-size', help='size of the blocks the files are read by, in bytes (default: %d)' %
+                                             BLOCK_SIZE, type=int, default=BLOCK_SIZE)
+    common.add_argument('--profile', help='print the time spent walking and per stage', action='store_true')
+    common.add_argument('--stats-json', help='(optional) file the statistics are written to as JSON', required=False)
+    add_io_arguments(common)
+    scan_options = argparse.ArgumentParser(add_help=False)
+    scan_options.add_argument('-w', '--work', help='folder scanned, can be repeated', action='append', required=True)
+    scan_options.add_argument('--samples', help='number of blocks sampled before hashing (default: 4)', type=int,
+                              default=4)
+    scan_options.add_argument('--hash', help='hash algorithm (default: sha256)', choices=sorted(HASH_ALGORITHMS),
+                              default="sha256")
+    output_options = argparse.ArgumentParser(add_help=False)
+    output_options.add_argument('-f', '--format', help='output format of the duplicates found (default: text)',
+                                choices=FORMATS, default="text")
+    output_options.add_argument('-o', '--output', help='(optional) file the duplicates are written to', required=False)
+
+    parser = argparse.ArgumentParser(prog="duplicates shard",
+                                     description="Sharded search: the workers scan subsets of the folders into shard "
+                                                 "files, the merge combines them and reads only the files of the sizes "
+                                                 "found in more than one shard.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser('scan', parents=[common, scan_options], help='scan the folders into a shard file') \
+        .add_argument('-o', '--output', help='shard file', required=True)
+    commands.add_parser('merge', parents=[common, output_options], help='merge the shard files and write the '
+                                                                        'duplicates') \
+        .add_argument('files', metavar='shard', help='shard file', nargs='+')
+    commands.add_parser('run', parents=[common, scan_options, output_options], help='scan by local processes (the '
+                                                                                    'folders split between them) '
+                                                                                    'and merge') \
+        .add_argument('--shards', help='number of the processes, at most one per work folder (a folder is not split, '
+                                       'give the sub folders of a large one with -w)', type=int, required=True)
+    args = parser.parse_args(argv)
+    if args.jobs < 1 or args.block_size <= 0 or args.compare < 0 or getattr(args, "samples", 0) < 0 or \
+            getattr(args, "shards", 1) < 1:
+        raise ArgumentCheck("--jobs, --block-size and --shards must be positive, --compare and --samples must not be "
+                            "negative")
+    check_io_arguments(args)
+    if args.command == "scan":
+        args.format = "text"
+    return args
+
+
 def get_all_files(path, ignore=None):
     """get all files including hidden"""
     all_files = []
@@ -87,40 +431,75 @@ def get_all_files(path, ignore=None):
     return all_files
 
 
-def print_and_process_duplicates(files, golden, purge=False):
-    """ Prints a list of duplicates.
-    Pretty much the same as duplicate file finder however modified not to sort duplicated files"""
+def get_rank(path, golden, work):
+    """ Returns the priority of the file (lower is kept first): the index of the first root containing it, golden
+    roots first """
+    for i, root in enumerate(chain(golden, work)):
+        if is_under(path, root):
+            return i
+    return len(golden) + len(work)
+
+
+def get_reclaimable(tags, records):
+    """ Returns file_id's of the files which space is freed when all "*D" files are deleted -
+    all the hard links of the file are in the list and tagged for deletion """
+    links = {}
+    for tag, record in zip(tags, records):
+        links.setdefault(record.file_id, []).append((tag, record))
+    return set(file_id for file_id, same in links.items()
+               if all(tag == "*D" for tag, _ in same) and same[0][1].nlink <= len(same))
+
+
+def print_and_process_duplicates(files, golden, purge=False, hardlink=False, stats=None, writer=None, work=None,
+                                 purger=None, plan=None):
+    """ Prints a list of duplicates (lists of FileRecord's).
+    Pretty much the same as duplicate file finder however modified not to sort duplicated files
+    `golden` is a path or a list of paths, the files there are never changed; `work` is the list of the work paths.
+    The file kept is the one in the first golden (then work) path of the lists, the oldest one within the path.
+    The statistics are added to `stats` if given (the numbering continues after its groups)
+    The deletions (hard links) are planned for all the groups first, then written to the `plan` (PlanWriter) if given
+    or applied by the `purger` (Purger, one thread by default) in batches.
+    The groups are written by the `writer` (text to stdout by default) with the results of the actions"""
+    if isinstance(golden, str):
+        golden = [golden]
+    golden = golden or []
+    work = work or []
     # Sort high level; by their size and then by number of duplicated files
-    sorted_files = sorted(files, key=lambda x: (os.path.getsize(x[0]), len(x)), reverse=True)
-    # Now sort duplicate lists for each duplicate according 1. if it is in golden and modification date
+    sorted_files = sorted(files, key=lambda x: (x[0].size, len(x)), reverse=True)
+    # Now sort duplicate lists for each duplicate according 1. the priority of its root and modification date
     sorted_files = [
-        sorted(paths, key=lambda x: (not (x + os.sep).startswith(golden + os.sep), os.path.getmtime(x)), reverse=False)
-        for paths in sorted_files]
+        sorted(records, key=lambda x: (get_rank(x.path, golden, work), x.mtime_ns), reverse=False)
+        for records in sorted_files]
 
     # Statistics
-    stats = Stats()
-
-    for pos, paths in enumerate(sorted_files, start=1):
-        prefix = os.path.dirname(os.path.commonprefix(paths))
-        if len(prefix) == 1:
-            prefix = ""
-
-        try:
-            size_ = humanize.naturalsize(os.path.getsize(paths[0]), gnu=True)
-        except OSError as e:
-            size_ = e
-        print("\n(%d) Found %d duplicate files (size: %s) in '%s/':" % (pos, len(paths), size_, prefix))
+    if stats is None:
+        stats = Stats()
+    if writer is None:
+        writer = TextWriter(sys.stdout)
+
+    # 1. Plan
+    planned = []  # (position, records, tags, reclaimable, indexes of the actions of the files)
+    actions = []
+    for pos, records in enumerate(sorted_files, start=stats.groups + 1):
+        stats.groups += 1
+        paths = [record.path for record in records]
 
         # Fill the tags
         tags = ["NA"] * len(paths)  # Mark with NA
         tags[0] = " K"  # Keep the first one in our sorted list
         for i, t in enumerate(paths[1:], start=1):
-            tags[i] = " S" if (t + os.sep).startswith(golden + os.sep) else "*D"
+            tags[i] = " S" if any(is_under(t, root) for root in golden) else "*D"
 
         stats.keep_files += tags.count(" K")
         stats.skipped_files += tags.count(" S")
         stats.to_delete_files += tags.count("*D")
 
+        # Hard links - no space is reclaimed unless all the links of the file are deleted
+        reclaimable = get_reclaimable(tags, records)
+        stats.reclaimable_bytes += records[0].size * len(reclaimable)
+        stats.hard_links += sum(1 for tag, record in zip(tags, records)
+                                if tag == "*D" and record.file_id not in reclaimable)
+
         # Redundant checks - just to be super cautious
         if len(tags) != len(paths):
             raise Exception("something wrong - should never trigger - tags mismatch")
@@ -129,119 +508,480 @@ def print_and_process_duplicates(files, golden, purge=False):
         if len(tags) <= 1:
             raise Exception("something wrong - should never trigger - tags min. len. mismatch")
 
-        for i, (tag, path) in enumerate(zip(tags, paths), start=1):
-            try:
-                file_time = ctime(os.path.getmtime(os.path.join(prefix, path)))
-            except OSError as e:
-                file_time = e
-
-            print("%2d: %2s '%s' [%s]" % (i, tag, path[len(prefix) + 1:].strip(), file_time), end='')
-            if purge and tag == "*D":
-                try:
-                    os.unlink(os.path.join(prefix, path))
-                    stats.deleted_files += 1
-                    print(" - DELETED")
-                except OSError as e:
-                    print("ERROR: ", e)
-            else:
-                print()
+        indexes = []
+        for tag, record in zip(tags, records):
+            index = None
+            if (purge or hardlink) and tag == "*D":
+                index = len(actions)
+                actions.append(Action("delete" if purge else "link", record, records[0]))
+            indexes.append(index)
+        planned.append((pos, records, tags, reclaimable, indexes))
+
+    # 2. Apply (or write the plan)
+    if plan is not None:
+        plan.write(actions)
+        results = [None] * len(actions)
+    else:
+        results = (purger or Purger()).apply(actions)
+    stats.deleted_files += results.count("deleted")
+    stats.linked_files += results.count("hard linked")
+
+    # 3. Print
+    for pos, records, tags, reclaimable, indexes in planned:
+        writer.write_group(pos, records, tags, reclaimable,
+                           [None if index is None else results[index] for index in indexes])
+    writer.flush()
 
     return stats
 
 
-def duplicates(work, golden=None, purge=False):
+def open_cache(path):
+    """ Opens the hash cache file (sqlite3 is imported only if the cache is used) """
+    from duplicates.hashcache import HashCache
+    return HashCache(path)
+
+
+def duplicates(work, golden=None, purge=False, cache=None, jobs=None, hardlink=False, compare=2, algorithm="sha256",
+               block_size=BLOCK_SIZE, samples=4, stream=False, output_format="text", output=None, incremental=None,
+               rotational_jobs=1, device_jobs=None, walker="scandir", walk_concurrency=CONCURRENCY, plan=None,
+               golden_catalog=None, checkpoint=None, resume=False):
     """ Finds duplicates and purges them based on the flags
-    @param work: work path where duplicates will be searched and purged if purge flag is set
-    @param golden: path where duplicates will be searched, however never deleted
+    @param work: work path (or list of paths) where duplicates will be searched and purged if purge flag is set
+    @param golden: path (or list of paths) where duplicates will be searched, however never deleted. The file kept
+    is the one in the first golden (then work) path given, the oldest one within the path
     @param purge: delete duplicates, keep single copy only (files in golden preserved)
+    @param cache: path to the hash cache file (optional)
+    @param jobs: number of files read in parallel (default: number of CPUs)
+    @param hardlink: replace duplicates with hard links to the kept file instead of deleting them
+    @param compare: groups of up to `compare` files are compared directly instead of hashing (0 - always hash)
+    @param algorithm: hash algorithm, one of HASH_ALGORITHMS
+    @param block_size: size of the blocks the files are read by
+    @param samples: number of blocks compared between the head and the tail before hashing (0 - no sampling)
+    @param stream: bounded memory mode - check, print and purge duplicates size by size
+    @param output_format: format the duplicates are written in (text, jsonl or csv)
+    @param output: file the duplicates are written to (default: stdout)
+    @param incremental: path to the snapshot of the previous run, only the changes since then are searched (optional)
+    @param rotational_jobs: number of files read in parallel from a rotational disk
+    @param device_jobs: path -> number of files read in parallel from the device of the path (overrides the detection)
+    @param walker: directory walker, scandir or async (many calls in flight, for network file systems)
+    @param walk_concurrency: number of calls the async walker keeps in flight
+    @param plan: file the deletions (hard links) are written to instead of applying them (see apply_plan)
+    @param golden_catalog: path to the catalog of golden files (see catalog_build), its files are golden ones but
+    they are not walked or read - their keys are taken from the catalog
+    @param checkpoint: state directory the run is checkpointed to (the walk, the keys of the stages and, in the stream
+    mode, the sizes processed), removed when the run is complete
+    @param resume: continue the run from the checkpoint (the same folders and options)
     @return: statistics object
     """
 
-    # 1. Optimization checks
-    if golden:
-        golden = os.path.abspath(golden)
-        print("files unchanged (golden) in:", golden)
-    else:
-        golden = "\x00"  # If golden is not set, make it non path string
-    work = os.path.abspath(work)
-    print("searching and removing duplicates in:", work)
+    with ExitStack() as stack:
+        # The duplicates are written by the writer, everything else goes to the console
+        writer = stack.enter_context(get_writer(output_format, output, algorithm))
+        stack.enter_context(redirect_stdout(sys.stderr if output_format != "text" and not output else sys.stdout))
+
+        # 1. Optimization checks
+        golden = [os.path.abspath(path) for path in ([golden] if isinstance(golden, str) else golden or [])]
+        for path in golden:
+            print("files unchanged (golden) in:", path)
+        work = [os.path.abspath(path) for path in ([work] if isinstance(work, str) else work)]
+        for path in work:
+            print("searching and removing duplicates in:", path)
+        roots = work + golden  # walked
+        catalog = None
+        if golden_catalog:
+            if incremental or hardlink:
+                raise ArgumentCheck("golden catalog can not be used in incremental or hardlink mode")
+            from duplicates.catalog import Catalog
+            catalog = stack.enter_context(Catalog(golden_catalog))
+            if catalog.algorithm != algorithm:
+                raise ArgumentCheck("golden catalog keeps %s hashes, use --hash %s" % (catalog.algorithm,
+                                                                                       catalog.algorithm))
+            for path in catalog.roots:
+                print("files unchanged (golden catalog) in:", path)
+            golden = golden + catalog.roots
+
+        if any(is_under(path, root) for path in work for root in golden):
+            raise ArgumentCheck("work path is under golden")
+
+        # 2. Find duplicates - every root walked once (nested ones are walked with their parents)
+        stats = Stats()
+        snapshot = None
+        if incremental:
+            if stream or walker != "scandir":
+                raise ArgumentCheck("incremental mode works with the scandir walker and without stream mode only")
+            from duplicates.snapshot import Snapshot
+            snapshot = stack.enter_context(Snapshot(incremental, roots, algorithm))
+        state = None
+        if checkpoint:
+            if incremental:
+                raise ArgumentCheck("checkpoints can not be used in incremental mode")
+            from duplicates.checkpoint import Checkpoint
+            state = stack.enter_context(Checkpoint(checkpoint, {
+                "work": work, "golden": golden, "golden_catalog": golden_catalog, "algorithm": algorithm,
+                "samples": samples, "stream": stream, "purge": purge, "hardlink": hardlink}, resume))
+            if resume:
+                print("resuming:", state)
+        elif resume:
+            raise ArgumentCheck("resume needs the checkpoint")
+        jobs = jobs or os.cpu_count() or 1
+        purger = Purger(jobs)
+        if plan:
+            if not (purge or hardlink):
+                raise ArgumentCheck("plan needs purge or hardlink")
+            plan = stack.enter_context(PlanWriter(plan, work, golden))
+        device_jobs = {os.stat(path).st_dev: count for path, count in (device_jobs or {}).items()}
+        hash_cache = stack.enter_context(open_cache(cache)) if cache else None
+        groups = find_duplicates(roots, cache=hash_cache, jobs=jobs, compare=compare, algorithm=algorithm,
+                                 block_size=block_size, samples=samples, stream=stream, snapshot=snapshot,
+                                 walker=walker, walk_concurrency=walk_concurrency, rotational_jobs=rotational_jobs,
+                                 device_jobs=device_jobs, progress=ConsoleProgress(), stages=stats.stages,
+                                 walk=stats.walk, catalog=catalog, checkpoint=state)
+        found = 0
+        if stream:
+            # 3. Print the results and purge duplicates - size by size
+            for size, same_size in groupby(groups, key=attrgetter("size")):
+                duplicate_lists = [group.files for group in same_size]
+                print_and_process_duplicates(duplicate_lists, golden, purge, hardlink, stats, writer, work, purger,
+                                             plan)
+                found += sum([len(x) for x in duplicate_lists])
+                if state is not None:
+                    state.processed(size)
+        else:
+            duplicate_lists = [group.files for group in groups]
+            # 3. Print the results and purge duplicates if needed
+            print_and_process_duplicates(duplicate_lists, golden, purge, hardlink, stats, writer, work, purger,
+                                         plan)
+            found = sum([len(x) for x in duplicate_lists])
+            if snapshot is not None:
+                if purge or hardlink:
+                    snapshot.invalidate(duplicate_lists)
+                logger.debug(snapshot)
+        if hash_cache is not None:
+            logger.debug("%s, %i stale entries pruned", hash_cache, hash_cache.prune())
+        stats.total_files = stats.walk.files
+        logger.debug(stats.walk)
+        for stage in stats.stages:
+            logger.debug(stage)
+
+        # 4. Another redundant check
+        if found != stats.keep_files + stats.skipped_files + stats.to_delete_files:
+            raise Exception("Hmm should never get here, data verification failed")
+
+        # 5. Remove empty dirs in work (the ones that lost files)
+        if purge and plan is None:
+            print("Deleting empty dir's in work ('%s')" % "', '".join(work))
+            remove_empty_dirs(purger.directories, work)
+        if plan is not None:
+            print("%i actions written to the plan" % plan.actions)
+
+    return stats
+
+
+def near_duplicates(work, golden=None, threshold=0.5, chunk_size=CHUNK_SIZE, cache=None, jobs=None,
+                    algorithm="sha256", block_size=BLOCK_SIZE, output_format="text", output=None, rotational_jobs=1,
+                    device_jobs=None, walker="scandir", walk_concurrency=CONCURRENCY):
+    """ Finds the pairs of the files sharing a large part of their data (content-defined chunks), nothing is changed
+    @param work: work path (or list of paths) searched
+    @param golden: path (or list of paths) searched as well
+    @param threshold: fraction of the smaller file of the pair the files must share
+    @param chunk_size: average chunk size, a power of two
+    @param cache: path to the hash cache file (optional), the chunks of the unchanged files are not read again
+    @param output_format: format the pairs are written in (text or jsonl)
+    @return: statistics object (reclaimable_bytes - the bytes of the chunks found more than once)
+    See duplicates for the other parameters.
+    """
+    with ExitStack() as stack:
+        writer = stack.enter_context(get_writer(output_format, output, algorithm))
+        stack.enter_context(redirect_stdout(sys.stderr if output_format != "text" and not output else sys.stdout))
+        golden = [os.path.abspath(path) for path in ([golden] if isinstance(golden, str) else golden or [])]
+        work = [os.path.abspath(path) for path in ([work] if isinstance(work, str) else work)]
+        for path in golden + work:
+            print("searching near duplicates in:", path)
+
+        stats = Stats()
+        all_files = walk_roots(work + golden, stats.walk, walker, walk_concurrency)
+        device_jobs = {os.stat(path).st_dev: count for path, count in (device_jobs or {}).items()}
+        hash_cache = stack.enter_context(open_cache(cache)) if cache else None
+        pairs, stats.reclaimable_bytes = find_near_duplicates(
+            all_files, threshold, chunk_size, hash_cache, jobs or os.cpu_count() or 1, algorithm, block_size,
+            stats.stages, rotational_jobs, device_jobs)
+        for pos, (first, second, shared) in enumerate(pairs, start=1):
+            writer.write_pair(pos, first, second, shared)
+        stats.near_pairs = len(pairs)
+        stats.total_files = stats.walk.files
+        for stage in stats.stages:
+            logger.debug(stage)
+    return stats
+
+
+def watch(work, golden=None, purge=False, cache=None, jobs=None, hardlink=False, algorithm="sha256",
+          block_size=BLOCK_SIZE, samples=4, output_format="text", output=None, rotational_jobs=1, device_jobs=None,
+          interval=2.0, poll=False, until=None):
+    """ Finds duplicates as `duplicates` does, then watches the folders: the duplicates of the files created or
+    modified are reported (and purged based on the flags) as they appear, until interrupted (Ctrl+C).
+    The files are always hashed (their keys are kept, the unchanged files are not read again).
+    The empty directories are not removed (files may be written to them).
+    @param interval: seconds between the polls, the longest wait for the changes
+    @param poll: poll the folders instead of inotify
+    @param until: called after every wait for the changes, the watch stops when it returns True (optional)
+    See `duplicates` for the other parameters.
+    @return: statistics object
+    """
+    from duplicates.watch import LiveIndex, get_watcher
+    with ExitStack() as stack:
+        writer = stack.enter_context(get_writer(output_format, output, algorithm))
+        stack.enter_context(redirect_stdout(sys.stderr if output_format != "text" and not output else sys.stdout))
+
+        golden = [os.path.abspath(path) for path in ([golden] if isinstance(golden, str) else golden or [])]
+        for path in golden:
+            print("files unchanged (golden) in:", path)
+        work = [os.path.abspath(path) for path in ([work] if isinstance(work, str) else work)]
+        for path in work:
+            print("searching and removing duplicates in:", path)
+        if any(is_under(path, root) for path in work for root in golden):
+            raise ArgumentCheck("work path is under golden")
+        roots = get_walk_roots(work + golden)
+
+        stats = Stats()
+        jobs = jobs or os.cpu_count() or 1
+        purger = Purger(jobs)
+        device_jobs = {os.stat(path).st_dev: count for path, count in (device_jobs or {}).items()}
+        hash_cache = stack.enter_context(open_cache(cache)) if cache else None
+        # watched before the walk, the files changed meanwhile are not missed
+        watcher = stack.enter_context(get_watcher(roots, poll))
+        index = LiveIndex(hash_cache, jobs, algorithm, block_size, samples, stats.stages, rotational_jobs, device_jobs)
+        for record in walk_roots(roots, stats.walk):
+            index.add(record)
+        print_and_process_duplicates(index.search(progress=ConsoleProgress()), golden, purge, hardlink, stats,
+                                     writer, work, purger)
+        print("watching for changes (%r)" % watcher)
+        try:
+            while until is None or not until():
+                changed = watcher.changes(interval)
+                if changed is None:
+                    logger.warning("changes lost, walking all the folders again")
+                    changed = roots
+                if not changed:
+                    continue
+                groups = index.update(changed)
+                logger.debug("%i paths changed, %r", len(changed), index)
+                if groups:
+                    print_and_process_duplicates(groups, golden, purge, hardlink, stats, writer, work, purger)
+        except KeyboardInterrupt:
+            print("watching stopped")
+        stats.total_files = len(index)
+    return stats
+
 
-    if (work + os.sep).startswith(golden + os.sep):
-        raise ArgumentCheck("work path is under golden")
+def catalog_build(golden, path, algorithm="sha256", samples=4, cache=None, jobs=None, block_size=BLOCK_SIZE):
+    """ Writes the catalog of the golden folders used by duplicates(golden_catalog=...)
+    @param golden: path (or list of paths) catalogued
+    @param path: catalog file
+    @param cache: path to the hash cache file (optional)
+    @return: statistics object (total_files - files in the catalog), its summary is printed by main
+    """
+    from duplicates.catalog import build_catalog
+    golden = [os.path.abspath(path) for path in ([golden] if isinstance(golden, str) else golden)]
+    for root in golden:
+        print("cataloguing:", root)
+    stats = Stats()
+    with ExitStack() as stack:
+        hash_cache = stack.enter_context(open_cache(cache)) if cache else None
+        stats.total_files = build_catalog(path, walk_roots(golden, stats.walk), algorithm, samples, hash_cache,
+                                          jobs or os.cpu_count() or 1, block_size, get_walk_roots(golden),
+                                          stats.stages, ConsoleProgress())
+    stats.summary = "%i files written to the catalog '%s'" % (stats.total_files, path)
+    return stats
 
-    # 2. Find duplicates
-    all_files = get_files(directory=work, include_hidden=True, include_empty=True)
-    if golden != "\x00":  # add golden generator
-        all_files = chain(all_files, get_files(directory=golden, include_hidden=True,
-                                               include_empty=True))
-    duplicate_lists = filter_duplicate_files(all_files, None)
 
-    # 3. Print the results and purge duplicates if needed
-    stats = print_and_process_duplicates(duplicate_lists, golden, purge)
+def shard_scan(work, path, cache=None, jobs=None, compare=2, algorithm="sha256", block_size=BLOCK_SIZE, samples=4):
+    """ Scans the work folders into the shard file (see shard_merge)
+    @return: statistics object, its summary is printed by main
+    """
+    from duplicates.shard import scan_shard
+    work = [os.path.abspath(path) for path in ([work] if isinstance(work, str) else work)]
+    for root in work:
+        print("scanning:", root)
+    stats = Stats()
+    with ExitStack() as stack:
+        hash_cache = stack.enter_context(open_cache(cache)) if cache else None
+        stats.total_files, groups = scan_shard(path, walk_roots(work, stats.walk), get_walk_roots(work), hash_cache,
+                                               jobs or os.cpu_count() or 1, compare, algorithm, block_size, samples,
+                                               stats.stages, ConsoleProgress())
+    stats.summary = "%i files (%i groups of duplicates) written to the shard '%s'" % (stats.total_files, groups, path)
+    return stats
 
-    # 4. Another redundant check
-    if sum([len(x) for x in duplicate_lists]) != stats.keep_files + stats.skipped_files + stats.to_delete_files:
-        raise Exception("Hmm should never get here, data verification failed")
 
-    # 5. Remove empty dirs in work
-    if purge:
-        print("Deleting empty dir's in work ('%s')" % work)
-        delete_empty_dirs(work)
+def shard_merge(shards, cache=None, jobs=None, compare=2, block_size=BLOCK_SIZE, output_format="text", output=None):
+    """ Merges the shard files written by shard_scan and writes the duplicates, nothing is changed
+    @param shards: list of the shard files
+    @return: statistics object
+    """
+    from duplicates.shard import merge_shards
+    console = sys.stderr if output_format != "text" and not output else sys.stdout
+    with ExitStack() as stack:
+        with redirect_stdout(console):
+            print("merging %i shards" % len(shards))
+            stats = Stats()
+            hash_cache = stack.enter_context(open_cache(cache)) if cache else None
+            duplicate_lists, roots, algorithm = merge_shards(shards, hash_cache, jobs or os.cpu_count() or 1, compare,
+                                                             block_size, stats.stages, ConsoleProgress())
+        # the algorithm is known from the shards, the writer is opened after the merge
+        writer = stack.enter_context(get_writer(output_format, output, algorithm))
+        stack.enter_context(redirect_stdout(console))
+        print_and_process_duplicates(duplicate_lists, [], stats=stats, writer=writer, work=roots)
+    return stats
 
+
+def shard_run(work, shards, cache=None, jobs=None, compare=2, algorithm="sha256", block_size=BLOCK_SIZE, samples=4,
+              output_format="text", output=None, options=()):
+    """ Scans the work folders by `shards` local processes (shard_scan) and merges the shards (shard_merge)
+    @param options: more command line options of the scans
+    @return: statistics object
+    """
+    import shutil
+    import tempfile
+    from duplicates.shard import run_local_shards
+    work = [os.path.abspath(path) for path in ([work] if isinstance(work, str) else work)]
+    directory = tempfile.mkdtemp(prefix="duplicates-shards-")
+    try:
+        scan_options = ["--compare", str(compare), "--hash", algorithm, "--block-size", str(block_size), "--samples",
+                        str(samples), "-j", str(max(1, (jobs or os.cpu_count() or 1) // shards))] + list(options)
+        if cache:
+            scan_options += ["-c", cache]
+        roots = get_walk_roots(work)
+        if shards > len(roots):
+            logger.warning("%i shards requested, %i work folders: a folder is scanned by one process, give the sub "
+                           "folders with -w to use more", shards, len(roots))
+        paths = run_local_shards(roots, shards, directory, scan_options)
+        return shard_merge(paths, cache, jobs, compare, block_size, output_format, output)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def apply_plan(path, jobs=None):
+    """ Applies the plan written by duplicates(plan=...): deletes the files (or replaces them with hard links) unless
+    they or the files kept changed since the plan, then removes the directories left empty
+    @param path: path to the plan file
+    @param jobs: number of threads applying the plan (default: number of CPUs)
+    @return: statistics object, its summary is printed by main
+    """
+    header, actions = read_plan(path)
+    print("applying %i actions of the plan '%s'" % (len(actions), path))
+    stats = Stats()
+    purger = Purger(jobs or os.cpu_count() or 1)
+    results = purger.apply(actions)
+    for action, result in zip(actions, results):
+        if isinstance(result, OSError):
+            print("ERROR:  %s" % result)
+        elif result is not None:
+            print("'%s'%s" % (action.record.path, ACTIONS[result]))
+    stats.to_delete_files = len(actions)
+    stats.deleted_files = results.count("deleted")
+    stats.linked_files = results.count("hard linked")
+    stats.summary = "Plan applied: %i actions, deleted: %i, hard linked: %i, skipped (changed since the plan or " \
+                    "failed): %i" % (len(actions), stats.deleted_files, stats.linked_files,
+                                     sum(isinstance(result, OSError) for result in results))
+    print("Deleting empty dir's in work ('%s')" % "', '".join(header["work"]))
+    remove_empty_dirs(purger.directories, header["work"])
     return stats
 
 
 def main():
     """ The main function"""
 
+    args = None
     try:
         # *** Execution time ***
         started = datetime.now()
 
         # 0. Get arguments
-        args = parse_arguments()
+        if sys.argv[1:2] == ["catalog"]:
+            args = parse_catalog_arguments(sys.argv[2:])
+        elif sys.argv[1:2] == ["shard"]:
+            args = parse_shard_arguments(sys.argv[2:])
+        else:
+            args = parse_arguments()
 
         # 1. Prepare
+        logging.basicConfig()
         logger.setLevel(logging.DEBUG if args.verbose else logging.INFO)
 
-        # 2. Duplicates
-        stats = duplicates(args.work, args.golden, args.purge)
-        print(stats)
+        # 2. Duplicates - the files are read through the I/O throttle if it is set
+        throttle = get_throttle_of(args)
+        previous = set_throttle(throttle)
+        try:
+            if sys.argv[1:2] == ["catalog"]:
+                stats = catalog_build(args.golden, args.output, algorithm=args.hash, samples=args.samples,
+                                      cache=args.cache, jobs=args.jobs, block_size=args.block_size)
+            elif sys.argv[1:2] == ["shard"]:
+                if args.command == "scan":
+                    stats = shard_scan(args.work, args.output, cache=args.cache, jobs=args.jobs, compare=args.compare,
+                                       algorithm=args.hash, block_size=args.block_size, samples=args.samples)
+                elif args.command == "merge":
+                    stats = shard_merge(args.files, cache=args.cache, jobs=args.jobs, compare=args.compare,
+                                        block_size=args.block_size, output_format=args.format, output=args.output)
+                else:
+                    stats = shard_run(args.work, args.shards, cache=args.cache, jobs=args.jobs, compare=args.compare,
+                                      algorithm=args.hash, block_size=args.block_size, samples=args.samples,
+                                      output_format=args.format, output=args.output,
+                                      options=get_io_options(args, args.shards))
+            elif args.apply_plan:
+                stats = apply_plan(args.apply_plan, jobs=args.jobs)
+            elif args.watch:
+                stats = watch(args.work, args.golden, purge=args.purge, cache=args.cache, jobs=args.jobs,
+                              hardlink=args.hardlink, algorithm=args.hash, block_size=args.block_size,
+                              samples=args.samples, output_format=args.format, output=args.output,
+                              rotational_jobs=args.rotational_jobs, device_jobs=args.device_jobs,
+                              interval=args.watch_interval, poll=args.watch_poll)
+            elif args.near is not None:
+                stats = near_duplicates(args.work, args.golden, threshold=args.near, chunk_size=args.chunk_size,
+                                        cache=args.cache, jobs=args.jobs, algorithm=args.hash,
+                                        block_size=args.block_size, output_format=args.format, output=args.output,
+                                        rotational_jobs=args.rotational_jobs, device_jobs=args.device_jobs,
+                                        walker=args.walker, walk_concurrency=args.walk_concurrency)
+            else:
+                stats = duplicates(args.work, args.golden, purge=args.purge, cache=args.cache, jobs=args.jobs,
+                                   hardlink=args.hardlink, compare=args.compare, algorithm=args.hash,
+                                   block_size=args.block_size, samples=args.samples, stream=args.stream,
+                                   output_format=args.format, output=args.output, incremental=args.incremental,
+                                   rotational_jobs=args.rotational_jobs, device_jobs=args.device_jobs,
+                                   walker=args.walker, walk_concurrency=args.walk_concurrency, plan=args.plan,
+                                   golden_catalog=args.golden_catalog, checkpoint=args.checkpoint,
+                                   resume=args.resume)
+        finally:
+            set_throttle(previous)
+        stats.io = throttle
+        console = sys.stderr if args.format != "text" and not args.output else sys.stdout
+        print(stats, file=console)
+        if args.profile:
+            print(stats.profile(), file=console)
+        if args.stats_json:
+            with open(args.stats_json, "w") as f:
+                json.dump(stats.as_dict(), f, indent=2)
 
         # *** EXECUTION TIME ***
         ended = datetime.now()
-        print('Complete in %i minutes (%i sec.).' % ((ended - started).seconds / 60, (ended - started).seconds))
+        print('Complete in %i minutes (%i sec.).' % ((ended - started).seconds / 60, (ended - started).seconds),
+              file=console)
         return 0
 
     except KeyboardInterrupt:
-        logger.error("terminated by user")
+        logger.error("terminated by user" + (", continue with --resume" if getattr(args, "checkpoint", None) else ""))
         sys.exit(1)
 
     except Exception as e:
         if logger.level == logging.DEBUG:
+            from traceback import print_exc
             print_exc(file=sys.stderr)
         logger.error(e)
         sys.exit(2)
 
 
 def delete_empty_dirs(path):
-    """ Recursively remove empty directories """
-    for root, dirs, files in os.walk(str(path)):
-        # Remover osX hidden files
-        if len(files) == 1:
-            try:
-                os.unlink(os.path.join(root, ".DS_Store"))
-            except OSError:
-                pass
-
-        # Recursion
-        for dir_ in dirs:
-            delete_empty_dirs(os.path.join(root, dir_))
-            try:
-                os.rmdir(os.path.join(root, dir_))  # deletes only empty dirs
-                print("   empty directory removed: ", os.path.join(root, dir_).encode('utf-8'))
-            except OSError:
-                pass
+    """ Removes all the empty directories under the path (the path itself is kept), see purge.remove_empty_dirs """
+    path = str(path)
+    return remove_empty_dirs([root for root, _, _ in os.walk(path)], [path])
 
 
 if __name__ == '__main__':
@@ -0,0 +1,107 @@
+"""
+Created on Oct 18, 2026
+
+@author: "Alexey Mavrin"
+@email alexeymavrin@gmail.com
+
+Compact in-memory index of the files found by the walk.
+"""
+
+import heapq
+import os
+from array import array
+from itertools import compress
+
+from duplicates.duplicatefilefinder import CatalogRecord, FileRecord
+
+SORT_CHUNK = 64 * 1024  # rows sorted at a time, the temporary lists of the sort are that long at most
+
+
+class FileIndex(object):
+    """ Index of the files: parent directories are interned in a table, the stat fields kept in arrays (columns).
+    A file (row) costs a few dozen bytes plus its name instead of a FileRecord with a full path.
+    The files are grouped by sorting the rows by the size column (by chunks merged lazily, no list of all the rows)
+    and splitting it where the size changes. """
+
+    def __init__(self):
+        self.directories = []  # directory id -> path
+        self.__directory_ids = {}
+        self.names = []
+        self.directory = array('L')
+        self.size = array('q')
+        self.mtime_ns = array('q')
+        self.inode = array('Q')
+        self.device = array('Q')
+        self.nlink = array('L')
+        self.catalog = array('B')  # 1 for the entries of the golden catalog (see CatalogRecord)
+
+    def __len__(self):
+        return len(self.names)
+
+    def add(self, record):
+        """ Adds the file (FileRecord) to the index """
+        dir_path, name = os.path.split(record.path)
+        directory_id = self.__directory_ids.get(dir_path)
+        if directory_id is None:
+            directory_id = self.__directory_ids[dir_path] = len(self.directories)
+            self.directories.append(dir_path)
+        self.directory.append(directory_id)
+        self.names.append(name)
+        self.size.append(record.size)
+        self.mtime_ns.append(record.mtime_ns)
+        self.inode.append(record.inode)
+        self.device.append(record.device)
+        self.nlink.append(record.nlink)
+        self.catalog.append(record.catalog)
+
+    def record(self, row):
+        """ Returns FileRecord (CatalogRecord) of the row """
+        return (CatalogRecord if self.catalog[row] else FileRecord)(
+            os.path.join(self.directories[self.directory[row]], self.names[row]), self.size[row], self.mtime_ns[row],
+            self.inode[row], self.device[row], self.nlink[row])
+
+    def records(self, rows=None):
+        """ Returns the list of FileRecord's of the rows (all the rows by default) """
+        return [self.record(row) for row in (range(len(self)) if rows is None else rows)]
+
+    def size_groups(self, min_count=2):
+        """ Returns the arrays of the rows of the same size (at least `min_count` of them), largest size first,
+        the rows of a size in the order they were added. Sort-and-split over the size column: the chunks of SORT_CHUNK
+        rows are sorted into arrays and merged. """
+        size = self.size
+        chunks = [array('L', sorted(range(start, min(start + SORT_CHUNK, len(size))), key=size.__getitem__,
+                                    reverse=True))  # stable, the merge keeps the order of the chunks too
+                  for start in range(0, len(size), SORT_CHUNK)]
+        groups = []
+        rows = array('L')
+        for row in heapq.merge(*chunks, key=size.__getitem__, reverse=True):
+            if rows and size[row] != size[rows[0]]:
+                if len(rows) >= min_count:
+                    groups.append(rows)
+                rows = array('L')
+            rows.append(row)
+        if len(rows) >= min_count:
+            groups.append(rows)
+        return groups
+
+    def drop_unique_sizes(self):
+        """ Removes the files which size is unique - they can not have duplicates.
+        Returns the number of the files removed and their total size. """
+        keep = bytearray(len(self))  # a byte per row
+        for rows in self.size_groups():
+            for row in rows:
+                keep[row] = 1
+        removed = len(self) - sum(keep)
+        removed_bytes = sum(self.size) - sum(compress(self.size, keep))
+        if removed:
+            self.names = list(compress(self.names, keep))
+            for column in ("directory", "size", "mtime_ns", "inode", "device", "nlink", "catalog"):
+                values = getattr(self, column)
+                setattr(self, column, array(values.typecode, compress(values, keep)))
+        return removed, removed_bytes
+
+    def buckets(self):
+        """ Yields the lists of the files (FileRecord's) of the same size, largest size first.
+        Sizes with a single file are skipped. Only one bucket is materialized at a time. """
+        for rows in self.size_groups():
+            yield self.records(rows)
@@ -0,0 +1,119 @@
+"""
+Created on Oct 18, 2026
+
+@author: "Alexey Mavrin"
+@email alexeymavrin@gmail.com
+
+Persistent on-disk cache of the file keys (crc, hash) computed by the duplicate file finder.
+"""
+
+import os
+import sqlite3
+import time
+
+
+class HashCache(object):
+    """ Cache of the file keys stored in a SQLite file.
+
+    Entries are keyed by (device, inode) and remembered together with the file size and modification time (ns).
+    An entry is trusted only while the size and mtime are unchanged, otherwise it is dropped on the next lookup.
+    Files with unknown inode (zero) are never cached.
+    The changes are saved when the cache is closed, and every `commit_seconds` if it is set (checkpoints).
+    """
+
+    def __init__(self, path, commit_seconds=None):
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self.commit_seconds = commit_seconds
+        self.__committed = time.monotonic()
+        self.__seen = set()  # (device, inode) of the files looked up during this run
+        self.__connection = sqlite3.connect(path)
+        self.__connection.executescript("""
+            CREATE TABLE IF NOT EXISTS files (
+                device INTEGER, inode INTEGER, size INTEGER, mtime_ns INTEGER, path TEXT,
+                PRIMARY KEY (device, inode));
+            CREATE TABLE IF NOT EXISTS keys (
+                device INTEGER, inode INTEGER, kind TEXT, value,
+                PRIMARY KEY (device, inode, kind));
+            """)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __repr__(self):
+        return "Hash cache '%s': %i hits, %i misses" % (self.path, self.hits, self.misses)
+
+    def __check(self, record):
+        """ Makes sure the cached entry of the file (FileRecord) is still valid, returns (device, inode) """
+        file_id = (record.device, record.inode)
+        if file_id not in self.__seen:
+            self.__seen.add(file_id)
+            row = self.__connection.execute("SELECT size, mtime_ns, path FROM files WHERE device=? AND inode=?",
+                                            file_id).fetchone()
+            if row is None or row[:2] != (record.size, record.mtime_ns):
+                # new or modified file - forget whatever we knew about this inode
+                self.__connection.execute("DELETE FROM keys WHERE device=? AND inode=?", file_id)
+                self.__connection.execute("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?)",
+                                          file_id + (record.size, record.mtime_ns, record.path))
+            elif row[2] != record.path:
+                self.__connection.execute("UPDATE files SET path=? WHERE device=? AND inode=?",
+                                          (record.path,) + file_id)
+        return file_id
+
+    def lookup(self, record, kind):
+        """ Returns the cached key of the given kind for the file (FileRecord) or None """
+        if not record.inode:
+            self.misses += 1
+            return None
+        row = self.__connection.execute("SELECT value FROM keys WHERE device=? AND inode=? AND kind=?",
+                                        self.__check(record) + (kind,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return row[0]
+
+    def contains(self, record, kind):
+        """ Checks if the key of the given kind for the file (FileRecord) is cached, not counted as a hit or miss """
+        if not record.inode:
+            return False
+        return self.__connection.execute("SELECT 1 FROM keys WHERE device=? AND inode=? AND kind=?",
+                                         self.__check(record) + (kind,)).fetchone() is not None
+
+    def store(self, record, kind, value):
+        """ Remembers the key of the given kind for the file (FileRecord) """
+        if not record.inode:
+            return
+        self.__connection.execute("INSERT OR REPLACE INTO keys VALUES (?, ?, ?, ?)",
+                                  self.__check(record) + (kind, value))
+        if self.commit_seconds is not None and time.monotonic() - self.__committed >= self.commit_seconds:
+            self.__connection.commit()
+            self.__committed = time.monotonic()
+
+    def prune(self):
+        """ Removes entries of the files that no longer exist or were modified since they have been cached """
+        stale = []
+        for device, inode, size, mtime_ns, path in self.__connection.execute("SELECT * FROM files"):
+            if (device, inode) in self.__seen:
+                continue
+            try:
+                st = os.stat(path)
+                if (st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns) == (device, inode, size, mtime_ns):
+                    continue
+            except OSError:
+                pass
+            stale.append((device, inode))
+        self.__connection.executemany("DELETE FROM keys WHERE device=? AND inode=?", stale)
+        self.__connection.executemany("DELETE FROM files WHERE device=? AND inode=?", stale)
+        return len(stale)
+
+    def close(self):
+        """ Saves the changes and closes the cache file """
+        if self.__connection is not None:
+            self.__connection.commit()
+            self.__connection.close()
+            self.__connection = None
@@ -0,0 +1,142 @@
+"""
+Created on Oct 18, 2026
+
+@author: "Alexey Mavrin"
+@email alexeymavrin@gmail.com
+
+Writers of the duplicates found: human readable text, JSON Lines and CSV.
+"""
+
+import json
+import os
+import sys
+from datetime import datetime
+from time import ctime
+
+FORMATS = ("text", "jsonl", "csv")
+TAGS = {" K": "K", " S": "S", "*D": "D"}
+ACTIONS = {"deleted": " - DELETED", "hard linked": " - HARD LINKED"}
+
+
+def naturalsize(size):
+    """ Returns the size in human readable form (humanize is imported on the first use, it is slow to import) """
+    import humanize
+    return humanize.naturalsize(size, gnu=True)
+
+
+class TextWriter(object):
+    """ Prints the duplicates as text (one group is written at once) """
+
+    def __init__(self, stream, algorithm=None, close_stream=False):
+        self.stream = stream
+        self.algorithm = algorithm
+        self.close_stream = close_stream
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def write_group(self, pos, records, tags, reclaimable, actions):
+        """ Writes the group of duplicates (FileRecord's) with their tags ( K, S, *D) and actions taken
+        (None, "deleted", "hard linked" or OSError) """
+        paths = [record.path for record in records]
+        prefix = os.path.dirname(os.path.commonprefix(paths))
+        if len(prefix) == 1:
+            prefix = ""
+
+        size_ = naturalsize(records[0].size)
+        lines = ["\n(%d) Found %d duplicate files (size: %s) in '%s/':\n" % (pos, len(paths), size_, prefix)]
+        for i, (tag, record, action) in enumerate(zip(tags, records, actions), start=1):
+            link = " (hard link)" if tag == "*D" and record.file_id not in reclaimable else ""
+            if isinstance(action, OSError):
+                action = "ERROR:  %s" % action
+            else:
+                action = ACTIONS.get(action, "")
+            lines.append("%2d: %2s '%s' [%s]%s%s\n" % (i, tag, record.path[len(prefix) + 1:].strip(),
+                                                       ctime(record.mtime), link, action))
+        self.stream.write("".join(lines))
+
+    def write_pair(self, pos, first, second, shared):
+        """ Writes the pair of near duplicates (FileRecord's) and the bytes they share """
+        lines = ["\n(%d) Near duplicates sharing %s (%d%% of the smaller file):\n" % (
+            pos, naturalsize(shared), 100 * shared // min(first.size, second.size))]
+        for i, record in enumerate((first, second), start=1):
+            lines.append("%2d: '%s' (size: %s) [%s]\n" % (i, record.path, naturalsize(record.size),
+                                                          ctime(record.mtime)))
+        self.stream.write("".join(lines))
+
+    def flush(self):
+        self.stream.flush()
+
+    def close(self):
+        self.flush()
+        if self.close_stream:
+            self.stream.close()
+
+
+class JsonLinesWriter(TextWriter):
+    """ Writes a JSON object per group of duplicates """
+
+    def write_group(self, pos, records, tags, reclaimable, actions):
+        self.stream.write(json.dumps({
+            "group": pos,
+            "size": records[0].size,
+            "algorithm": self.algorithm,
+            "files": [get_fields(record, tag, reclaimable, action)
+                      for tag, record, action in zip(tags, records, actions)],
+        }, ensure_ascii=False) + "\n")
+
+    def write_pair(self, pos, first, second, shared):
+        self.stream.write(json.dumps({
+            "pair": pos,
+            "shared": shared,
+            "fraction": shared / min(first.size, second.size),
+            "files": [{"path": record.path, "size": record.size,
+                       "mtime": datetime.fromtimestamp(record.mtime).isoformat(), "device": record.device,
+                       "inode": record.inode} for record in (first, second)],
+        }, ensure_ascii=False) + "\n")
+
+
+class CsvWriter(TextWriter):
+    """ Writes a CSV row per file """
+    FIELDS = ("group", "tag", "path", "size", "mtime", "device", "inode", "digest", "algorithm", "hard_link",
+              "action", "error")
+
+    def __init__(self, stream, algorithm=None, close_stream=False):
+        super(CsvWriter, self).__init__(stream, algorithm, close_stream)
+        import csv
+        self.writer = csv.DictWriter(stream, self.FIELDS)
+        self.writer.writeheader()
+
+    def write_group(self, pos, records, tags, reclaimable, actions):
+        self.writer.writerows(dict(get_fields(record, tag, reclaimable, action), group=pos, algorithm=self.algorithm)
+                              for tag, record, action in zip(tags, records, actions))
+
+    def write_pair(self, pos, first, second, shared):
+        raise ValueError("near duplicates can not be written as CSV")
+
+
+def get_fields(record, tag, reclaimable, action):
+    """ Returns the dictionary of the fields of the file (FileRecord) written by the machine readable writers """
+    return {
+        "tag": TAGS[tag],
+        "path": record.path,
+        "size": record.size,
+        "mtime": datetime.fromtimestamp(record.mtime).isoformat(),
+        "device": record.device,
+        "inode": record.inode,
+        "digest": record.digest.hex() if record.digest else None,
+        "hard_link": tag == "*D" and record.file_id not in reclaimable,
+        "action": "error" if isinstance(action, OSError) else action,
+        "error": str(action) if isinstance(action, OSError) else None,
+    }
+
+
+def get_writer(output_format="text", output=None, algorithm=None):
+    """ Returns the writer of the format to the output file (stdout if not given) """
+    writers = {"text": TextWriter, "jsonl": JsonLinesWriter, "csv": CsvWriter}
+    if output:
+        return writers[output_format](open(output, "w", encoding="utf-8", newline=""), algorithm, close_stream=True)
+    return writers[output_format](sys.stdout, algorithm)
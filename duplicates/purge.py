@@ -0,0 +1,182 @@
+"""
+Created on Oct 18, 2026
+
+@author: "Alexey Mavrin"
+@email alexeymavrin@gmail.com
+
+Purge of the duplicates in two phases: the plan (files to delete or replace with hard links) and its execution in
+parallel batches, then the removal of the directories left empty.
+"""
+
+import heapq
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from duplicates.duplicatefilefinder import CatalogRecord, FileRecord
+
+PLAN_VERSION = 3
+BATCH_SIZE = 256
+ACTIONS = {"delete": "deleted", "link": "hard linked"}  # action -> result reported when done
+
+
+class PlanChanged(OSError):
+    """ The file or the file kept changed since the plan was made """
+
+
+class Action(object):
+    """ Deletion of the duplicate (FileRecord) or its replacement with a hard link to the file kept """
+    __slots__ = ("kind", "record", "kept")
+
+    def __init__(self, kind, record, kept):
+        self.kind = kind  # "delete" or "link"
+        self.record = record
+        self.kept = kept
+
+    def __repr__(self):
+        return "Action(%r, %r, kept=%r)" % (self.kind, self.record.path, self.kept.path)
+
+    def as_dict(self):
+        return {"action": self.kind, "path": self.record.path, "size": self.record.size,
+                "mtime_ns": self.record.mtime_ns, "inode": self.record.inode, "device": self.record.device,
+                "kept": self.kept.path, "kept_mtime_ns": self.kept.mtime_ns, "kept_inode": self.kept.inode,
+                "kept_device": self.kept.device, "kept_catalog": self.kept.catalog}
+
+    @classmethod
+    def from_dict(cls, values):
+        record = FileRecord(values["path"], values["size"], values["mtime_ns"], values["inode"], values["device"])
+        kept = (CatalogRecord if values["kept_catalog"] else FileRecord)(
+            values["kept"], values["size"], values["kept_mtime_ns"], values["kept_inode"], values["kept_device"])
+        return cls(values["action"], record, kept)
+
+    def verify(self):
+        """ Makes sure the file and the file kept are the ones planned (not modified, replaced or removed since).
+        The file kept from the golden catalog (may be not even mounted) is not checked. """
+        st = os.stat(self.record.path, follow_symlinks=False)
+        if (st.st_size, st.st_mtime_ns, st.st_ino, st.st_dev) != (self.record.size, self.record.mtime_ns,
+                                                                  self.record.inode, self.record.device):
+            raise PlanChanged("file changed since the plan: '%s'" % self.record.path)
+        if self.kept.catalog and self.kind == "delete":
+            return
+        st = os.stat(self.kept.path, follow_symlinks=False)
+        if (st.st_size, st.st_mtime_ns, st.st_ino, st.st_dev) != (self.kept.size, self.kept.mtime_ns, self.kept.inode,
+                                                                  self.kept.device):
+            raise PlanChanged("file kept changed since the plan: '%s'" % self.kept.path)
+
+    def apply(self):
+        """ Applies the action, returns the result ("deleted", "hard linked") or None if nothing was done (already a
+        hard link to the file kept) """
+        self.verify()
+        if self.kind == "delete":
+            os.unlink(self.record.path)
+        elif not replace_with_hard_link(self.kept, self.record):
+            return None
+        return ACTIONS[self.kind]
+
+
+def replace_with_hard_link(kept, record):
+    """ Replaces the file with a hard link to the kept one, returns False if it is a hard link already """
+    if kept.file_id == record.file_id:
+        return False
+    temp_path = record.path + ".duplicates-link"
+    os.link(kept.path, temp_path)
+    try:
+        os.replace(temp_path, record.path)
+    except OSError:
+        os.unlink(temp_path)
+        raise
+    return True
+
+
+def _apply_batch(actions):
+    results = []
+    for action in actions:
+        try:
+            results.append(action.apply())
+        except OSError as e:
+            results.append(e)
+    return results
+
+
+class Purger(object):
+    """ Applies the actions in batches of `batch_size` by `jobs` threads; remembers the directories that lost files """
+
+    def __init__(self, jobs=1, batch_size=BATCH_SIZE):
+        self.jobs = jobs
+        self.batch_size = batch_size
+        self.directories = set()
+
+    def apply(self, actions):
+        """ Applies the actions, returns the list of their results: "deleted", "hard linked", None (nothing done) or
+        OSError """
+        batches = [actions[i:i + self.batch_size] for i in range(0, len(actions), self.batch_size)]
+        if self.jobs > 1 and len(batches) > 1:
+            with ThreadPoolExecutor(max_workers=self.jobs) as executor:
+                results = [result for batch in executor.map(_apply_batch, batches) for result in batch]
+        else:
+            results = [result for batch in batches for result in _apply_batch(batch)]
+        self.directories.update(os.path.dirname(action.record.path) for action, result in zip(actions, results)
+                                if result == "deleted")
+        return results
+
+
+class PlanWriter(object):
+    """ Writes the plan file: a JSON object per line, the header (version, work and golden roots) then the actions """
+
+    def __init__(self, path, work, golden):
+        self.stream = open(path, "w", encoding="utf-8")
+        self.stream.write(json.dumps({"version": PLAN_VERSION, "work": work, "golden": golden}) + "\n")
+        self.actions = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def write(self, actions):
+        for action in actions:
+            self.stream.write(json.dumps(action.as_dict(), ensure_ascii=False) + "\n")
+        self.actions += len(actions)
+
+    def close(self):
+        self.stream.close()
+
+
+def read_plan(path):
+    """ Reads the plan file, returns the header (dictionary) and the list of the actions """
+    with open(path, encoding="utf-8") as f:
+        header = json.loads(f.readline())
+        if header.get("version") != PLAN_VERSION:
+            raise ValueError("unsupported plan file '%s'" % path)
+        return header, [Action.from_dict(json.loads(line)) for line in f if line.strip()]
+
+
+def remove_empty_dirs(directories, roots):
+    """ Removes the directories that are empty (or have .DS_Store only) and then their parents that became empty,
+    deepest first, up to the roots (the roots are kept). Every directory is checked once, nothing else is walked.
+    Returns the list of the directories removed. """
+    heap = [(-path.count(os.sep), path) for path in set(directories)]
+    heapq.heapify(heap)
+    seen = set(directories)
+    removed = []
+    while heap:
+        _, path = heapq.heappop(heap)
+        if not any((path + os.sep).startswith(root + os.sep) and path != root for root in roots):
+            continue
+        try:
+            names = os.listdir(path)
+            if names == [".DS_Store"]:  # osX hidden file
+                os.unlink(os.path.join(path, ".DS_Store"))
+            elif names:
+                continue
+            os.rmdir(path)
+        except OSError:
+            continue
+        removed.append(path)
+        print("   empty directory removed: ", path.encode('utf-8'))
+        parent = os.path.dirname(path)
+        if parent not in seen:
+            seen.add(parent)
+            heapq.heappush(heap, (-parent.count(os.sep), parent))
+    return removed
@@ -0,0 +1,131 @@
+"""
+Created on Oct 18, 2026
+
+@author: "Alexey Mavrin"
+@email alexeymavrin@gmail.com
+
+Device aware scheduling of the file reads: a thread pool per device, rotational disks read by one thread in the
+order of the data on the disk, solid state ones by many.
+"""
+
+import os
+import struct
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain, zip_longest
+
+try:
+    import fcntl
+except ImportError:  # windows
+    fcntl = None
+
+FS_IOC_FIEMAP = 0xC020660B
+FIEMAP_HEADER = struct.Struct("=QQLLLL")  # start, length, flags, mapped extents, extent count, reserved
+FIEMAP_EXTENT = struct.Struct("=QQQQQLLLL")  # logical, physical, length, reserved x2, flags, reserved x3
+
+
+def is_rotational(device):
+    """ Checks if the device (st_dev) is a rotational disk, None if unknown (not Linux, network or virtual file
+    system). Partitions and device mapper volumes report the disk they are on. """
+    path = "/sys/dev/block/%d:%d" % (os.major(device), os.minor(device))
+    for queue in (os.path.join(path, "queue", "rotational"), os.path.join(path, "..", "queue", "rotational")):
+        try:
+            with open(queue) as f:
+                return f.read().strip() == "1"
+        except (OSError, ValueError):
+            continue
+    return None
+
+
+def get_physical_offset(path):
+    """ Returns the physical offset of the first extent of the file on the disk (FIEMAP), None if unknown """
+    if fcntl is None:
+        return None
+    request = bytearray(FIEMAP_HEADER.size + FIEMAP_EXTENT.size)
+    FIEMAP_HEADER.pack_into(request, 0, 0, 0xFFFFFFFFFFFFFFFF, 0, 0, 1, 0)
+    try:
+        with open(path, "rb") as f:
+            fcntl.ioctl(f.fileno(), FS_IOC_FIEMAP, request)
+    except (OSError, ValueError):
+        return None
+    if not FIEMAP_HEADER.unpack_from(request)[3]:
+        return None  # no extents (empty or inline data)
+    return FIEMAP_EXTENT.unpack_from(request, FIEMAP_HEADER.size)[1]
+
+
+def get_device(item):
+    """ Returns the device of the work item - a FileRecord or a (records, links) group of the compare stage """
+    while not hasattr(item, "device"):
+        item = item[0]
+    return item.device
+
+
+class DeviceScheduler(object):
+    """ Executor running the reads of every device in a thread pool of its own: `rotational_jobs` threads for
+    rotational disks, `jobs` for the others. `device_jobs` (device -> threads) overrides the detection.
+    Used in place of ThreadPoolExecutor by the duplicate file finder; `order` arranges the files so every device
+    gets its share of the work and is read in its best order. """
+
+    def __init__(self, jobs, rotational_jobs=1, device_jobs=None):
+        self.jobs = jobs
+        self.rotational_jobs = rotational_jobs
+        self.device_jobs = dict(device_jobs or {})
+        self.__rotational = {}
+        self.__offsets = {}  # file_id -> physical offset of the files ordered last (the next stage reads a subset)
+        self.__pools = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.shutdown()
+
+    def __repr__(self):
+        return "Device scheduler: %s" % ", ".join(
+            "%d:%d %s (%d threads)" % (os.major(device), os.minor(device),
+                                       "rotational" if self.is_rotational(device) else "solid state",
+                                       self.get_jobs(device)) for device in self.__pools)
+
+    def is_rotational(self, device):
+        if device not in self.__rotational:
+            self.__rotational[device] = is_rotational(device)
+        return self.__rotational[device]
+
+    def get_jobs(self, device):
+        """ Returns the number of the threads reading the device """
+        if device in self.device_jobs:
+            return self.device_jobs[device]
+        return self.rotational_jobs if self.is_rotational(device) else self.jobs
+
+    def submit(self, fn, item):
+        """ Schedules fn(item) in the pool of the device of the item (see get_device) """
+        device = get_device(item)
+        pool = self.__pools.get(device)
+        if pool is None:
+            pool = self.__pools[device] = ThreadPoolExecutor(max_workers=max(1, self.get_jobs(device)))
+        return pool.submit(fn, item)
+
+    def order(self, files):
+        """ Returns the files (FileRecord's) in the order they are best read in: the files of a device sorted by the
+        physical offset (rotational disks, if known) or the inode, the devices interleaved """
+        devices = {}
+        for record in files:
+            devices.setdefault(record.device, []).append(record)
+        offsets = {}
+        for device, records in devices.items():
+            if self.is_rotational(device):
+                for record in records:
+                    offset = self.__offsets.get(record.file_id)
+                    offsets[record.file_id] = get_physical_offset(record.path) if offset is None else offset
+                records.sort(key=lambda record: (offsets[record.file_id] is None, offsets[record.file_id] or
+                                                 record.inode))
+            else:
+                records.sort(key=lambda record: record.inode)
+        self.__offsets = offsets
+        if len(devices) == 1:
+            return next(iter(devices.values()))
+        return [record for record in chain.from_iterable(zip_longest(*devices.values())) if record is not None]
+
+    def shutdown(self, wait=True):
+        for pool in self.__pools.values():
+            pool.shutdown(wait)
+        self.__pools.clear()
@@ -0,0 +1,151 @@
+"""
+Created on Oct 18, 2026
+
+@author: "Alexey Mavrin"
+@email alexeymavrin@gmail.com
+
+Sharded search: every worker (process or host) scans a subset of the roots and writes a shard file - all its files
+with the keys calculated and the duplicates found within the shard. The merge step combines the shards by size and
+searches again only the sizes found in more than one shard, the keys known from the shards are not calculated again.
+The shard file (JSON Lines) is the only coupling between the workers.
+"""
+
+import json
+import os
+import socket
+import subprocess
+import sys
+import zlib
+
+from duplicates.duplicatefilefinder import FileRecord, BLOCK_SIZE, KeyStore, filter_duplicate_files
+
+SHARD_VERSION = 1
+
+
+def encode_key(key):
+    """ Returns the key (int or bytes) as a JSON value: bytes as a hex string """
+    return key.hex() if isinstance(key, bytes) else key
+
+
+def decode_key(value):
+    return bytes.fromhex(value) if isinstance(value, str) else value
+
+
+def scan_shard(path, files, roots=(), cache=None, jobs=1, compare=2, algorithm="sha256", block_size=BLOCK_SIZE,
+               samples=4, stages=None, progress=None):
+    """ Searches the duplicates among the files (FileRecord's) of the shard and writes the shard file: the header
+    (version, host, roots, algorithm) then a line per file with its keys and the group of the duplicates it is in.
+    See filter_duplicate_files for the parameters. Returns the number of the files and of the groups. """
+    files = list(files)
+    keys = KeyStore(cache)
+    groups = filter_duplicate_files(files, None, keys, jobs, compare, algorithm, block_size, samples, stages,
+                                    progress=progress)
+    group_of = {id(record): i for i, records in enumerate(groups) for record in records}
+    known = {}  # file_id -> keys, the hard links of a file are read once
+    for record in files:
+        if record in keys.keys:
+            known.setdefault(record.file_id, {}).update(keys.keys[record])
+    temp_path = path + ".tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        f.write(json.dumps({"version": SHARD_VERSION, "host": socket.gethostname(), "roots": list(roots),
+                            "algorithm": algorithm, "samples": samples}) + "\n")
+        for record in files:
+            f.write(json.dumps({
+                "path": record.path, "size": record.size, "mtime_ns": record.mtime_ns, "inode": record.inode,
+                "device": record.device, "nlink": record.nlink, "group": group_of.get(id(record)),
+                "keys": {kind: encode_key(key) for kind, key in known.get(record.file_id, {}).items()},
+            }, ensure_ascii=False) + "\n")
+    os.replace(temp_path, path)
+    return len(files), len(groups)
+
+
+def read_shard(path):
+    """ Yields the lines of the shard file (dictionaries): the header first, then the files """
+    with open(path, encoding="utf-8") as f:
+        header = json.loads(f.readline())
+        if header.get("version") != SHARD_VERSION:
+            raise ValueError("unsupported shard file '%s'" % path)
+        yield header
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def read_shard_header(path):
+    lines = read_shard(path)
+    try:
+        return next(lines)
+    finally:
+        lines.close()
+
+
+def get_record(values, host, algorithm):
+    """ Returns FileRecord of the line of the shard file, with the digest if the file was hashed. The devices of the
+    other hosts are made unique (the same device and inode numbers are different files there). """
+    device = values["device"]
+    if host != socket.gethostname():
+        device = (zlib.crc32(host.encode("utf-8")) << 32) | (device & 0xFFFFFFFF)
+    digest = values["keys"].get(algorithm)
+    return FileRecord(values["path"], values["size"], values["mtime_ns"], values["inode"], device, values["nlink"],
+                      decode_key(digest) if digest is not None else None)
+
+
+def merge_shards(paths, cache=None, jobs=1, compare=2, block_size=BLOCK_SIZE, stages=None, progress=None):
+    """ Merges the shard files, returns the list of the duplicates (lists of FileRecord's), the list of the roots and
+    the hash algorithm of the shards (they must be searched with the same one).
+    The shard files are read twice: the sizes first, then only the files of the sizes found in more than one shard
+    (searched again, with the keys known from the shards) and the duplicates found within a shard are loaded.
+    The files of the other hosts must be reachable by the same paths if they are to be read. """
+    headers = [read_shard_header(path) for path in paths]
+    algorithms = set((header["algorithm"], header["samples"]) for header in headers)
+    if len(algorithms) > 1:
+        raise ValueError("the shards are searched with different hash algorithms or samples")
+    algorithm, samples = algorithms.pop() if algorithms else ("sha256", 0)
+
+    shards_of_size = {}
+    for i, path in enumerate(paths):
+        lines = read_shard(path)
+        next(lines)
+        for values in lines:
+            shards_of_size.setdefault(values["size"], set()).add(i)
+
+    candidates = []
+    keys = KeyStore(cache)
+    groups = {}
+    for i, path in enumerate(paths):
+        lines = read_shard(path)
+        header = next(lines)
+        for values in lines:
+            if len(shards_of_size[values["size"]]) > 1:
+                record = get_record(values, header["host"], algorithm)
+                keys.keys[record] = {kind: decode_key(key) for kind, key in values["keys"].items()}
+                candidates.append(record)
+            elif values["group"] is not None:
+                groups.setdefault((i, values["group"]), []).append(get_record(values, header["host"], algorithm))
+    duplicates = list(groups.values())
+    if candidates:
+        duplicates += filter_duplicate_files(candidates, None, keys, jobs, compare, algorithm, block_size, samples,
+                                             stages, progress=progress)
+    return duplicates, [root for header in headers for root in header["roots"]], algorithm
+
+
+def run_local_shards(roots, shards, directory, options=()):
+    """ Scans the roots by `shards` local processes (`duplicates shard scan`), the roots are split between them
+    round-robin (a root is not split: at most a process per root). Returns the list of the shard files written to the
+    directory. """
+    commands = []
+    paths = []
+    for i in range(min(shards, len(roots))):
+        paths.append(os.path.join(directory, "shard-%d.jsonl" % i))
+        command = [sys.executable, "-m", "duplicates.duplicates", "shard", "scan", "-o", paths[-1]] + list(options)
+        for root in roots[i::shards]:
+            command += ["-w", root]
+        commands.append(command)
+    env = dict(os.environ)  # the package is importable by the workers even if it is not installed
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, (os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                                      env.get("PYTHONPATH"))))
+    processes = [subprocess.Popen(command, stdout=subprocess.DEVNULL, env=env) for command in commands]
+    failed = [command for command, process in zip(commands, processes) if process.wait() != 0]
+    if failed:
+        raise RuntimeError("shard scan failed: %s" % " ".join(failed[0]))
+    return paths
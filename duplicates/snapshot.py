@@ -0,0 +1,244 @@
+"""
+Created on Oct 18, 2026
+
+@author: "Alexey Mavrin"
+@email alexeymavrin@gmail.com
+
+Snapshot of the previous run (directories, files and duplicates found) for the incremental rescan.
+"""
+
+import json
+import os
+import sqlite3
+import stat
+import time
+
+from duplicates.duplicatefilefinder import FileRecord
+
+RACY_SECONDS = 2  # directories modified that recently are listed again next time (mtime granularity)
+
+
+class Snapshot(object):
+    """ Snapshot of the walk and the duplicates found stored in a SQLite file.
+
+    A directory is listed again only if its modification time changed since the previous run, otherwise its files
+    and sub directories are taken from the snapshot. The sizes of the files added, removed or changed in the
+    directories listed are collected in `changed_sizes`; the duplicates of the other sizes are taken from the snapshot
+    once the files are verified to be unchanged (stat'ed again).
+    Files modified in place (the directory mtime does not change) are noticed only if they were duplicates or their
+    size is searched again (the files of the sizes searched are stat'ed again).
+    The snapshot is trusted only if the previous run with the same roots completed. The digests of the duplicates
+    reused are dropped if they were computed with another `algorithm`.
+    """
+
+    def __init__(self, path, roots, algorithm="sha256"):
+        self.path = path
+        self.roots = json.dumps(sorted(roots))
+        self.algorithm = algorithm
+        self.changed_sizes = set()
+        self.listed = 0  # directories listed
+        self.reused = 0  # directories taken from the snapshot
+        self.reused_sizes = 0
+        self.__visited = set()
+        self.__started = time.time()
+        self.__connection = sqlite3.connect(path)
+        self.__connection.executescript("""
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value);
+            CREATE TABLE IF NOT EXISTS directories (path TEXT PRIMARY KEY, mtime_ns INTEGER, sub_dirs TEXT);
+            CREATE TABLE IF NOT EXISTS files (
+                directory TEXT, name TEXT, size INTEGER, mtime_ns INTEGER, inode INTEGER, device INTEGER,
+                nlink INTEGER, PRIMARY KEY (directory, name));
+            CREATE TABLE IF NOT EXISTS groups (size INTEGER, grp INTEGER, path TEXT, digest);
+            """)
+        meta = dict(self.__connection.execute("SELECT key, value FROM meta"))
+        self.valid = meta.get("roots") == self.roots and meta.get("complete") == 1
+        self.__same_algorithm = meta.get("algorithm") == algorithm
+        if not self.valid:
+            self.__connection.executescript("DELETE FROM directories; DELETE FROM files; DELETE FROM groups;")
+        # until the run completes the snapshot is not trusted
+        self.__connection.execute("INSERT OR REPLACE INTO meta VALUES ('complete', 0)")
+        self.__connection.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *args):
+        self.close(complete=exc_type is None)
+
+    def __repr__(self):
+        return "Snapshot '%s': %i directories listed, %i reused, %i sizes changed, %i reused" % (
+            self.path, self.listed, self.reused, len(self.changed_sizes), self.reused_sizes)
+
+    def get_files(self, directory, include_hidden, include_empty, walk=None):
+        """ Returns all FILES (FileRecord's) in the directory as duplicatefilefinder.get_files does, the directories
+        not modified since the previous run are not listed (only stat'ed). The filter rules must not change between
+        the runs. The time spent on every directory is added to `walk` (WalkStats) if it is given. """
+        if not include_hidden and any(d.startswith(".") for d in os.path.abspath(directory).split(os.sep)):
+            return
+        stack = [directory]
+        while stack:
+            dir_path = stack.pop()
+            started = time.perf_counter()
+            try:
+                mtime_ns = os.stat(dir_path).st_mtime_ns
+            except OSError:
+                continue
+            self.__visited.add(dir_path)
+            row = self.__connection.execute("SELECT mtime_ns, sub_dirs FROM directories WHERE path=?",
+                                            (dir_path,)).fetchone()
+            if row is not None and row[0] == mtime_ns:
+                records = [FileRecord(os.path.join(dir_path, name), *values) for name, *values in
+                           self.__connection.execute("SELECT name, size, mtime_ns, inode, device, nlink FROM files "
+                                                     "WHERE directory=?", (dir_path,))]
+                sub_dirs = json.loads(row[1])
+                self.reused += 1
+            else:
+                records, sub_dirs = self.__list(dir_path, mtime_ns, include_hidden, include_empty)
+                self.listed += 1
+            if walk is not None:
+                walk.walked(dir_path, len(records), time.perf_counter() - started)
+            yield from records
+            stack.extend(reversed(sub_dirs))  # depth first, in the listing order (as os.walk)
+
+    def __list(self, dir_path, mtime_ns, include_hidden, include_empty):
+        """ Lists the directory, updates its entries and collects the sizes of the files changed """
+        records = []
+        sub_dirs = []
+        try:
+            with os.scandir(dir_path) as entries:
+                for entry in entries:
+                    if not include_hidden and entry.name.startswith("."):
+                        continue
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            sub_dirs.append(entry.path)
+                        elif entry.is_file(follow_symlinks=False):
+                            record = FileRecord.from_stat(entry.path, entry.stat(follow_symlinks=False))
+                            if include_empty or record.size > 0:
+                                records.append(record)
+                    except OSError:
+                        continue
+        except OSError:
+            mtime_ns = -1  # list it again next time
+
+        old = {name: values for name, *values in self.__connection.execute(
+            "SELECT name, size, mtime_ns, inode, device FROM files WHERE directory=?", (dir_path,))}
+        for record in records:
+            name = os.path.basename(record.path)
+            values = old.pop(name, None)
+            if values != [record.size, record.mtime_ns, record.inode, record.device]:
+                self.changed_sizes.add(record.size)
+                if values is not None:
+                    self.changed_sizes.add(values[0])
+        self.changed_sizes.update(values[0] for values in old.values())  # removed
+
+        if mtime_ns > (self.__started - RACY_SECONDS) * 1e9:
+            mtime_ns = -1  # may be modified again within the same mtime tick
+        self.__connection.execute("DELETE FROM files WHERE directory=?", (dir_path,))
+        self.__connection.executemany("INSERT INTO files VALUES (?, ?, ?, ?, ?, ?, ?)", (
+            (dir_path, os.path.basename(r.path), r.size, r.mtime_ns, r.inode, r.device, r.nlink) for r in records))
+        self.__connection.execute("INSERT OR REPLACE INTO directories VALUES (?, ?, ?)",
+                                  (dir_path, mtime_ns, json.dumps(sub_dirs)))
+        return records, sub_dirs
+
+    def removed(self):
+        """ Forgets the directories not found by the walk (must be called after all the roots are walked),
+        the sizes of their files are added to the changed ones. Returns the number of directories removed. """
+        removed = [(path,) for path, in self.__connection.execute("SELECT path FROM directories")
+                   if path not in self.__visited]
+        for path in removed:
+            self.changed_sizes.update(size for size, in self.__connection.execute(
+                "SELECT size FROM files WHERE directory=?", path))
+        self.__connection.executemany("DELETE FROM files WHERE directory=?", removed)
+        self.__connection.executemany("DELETE FROM directories WHERE path=?", removed)
+        return len(removed)
+
+    def reuse_groups(self, files):
+        """ Splits the files (FileRecord's) into the duplicates known from the previous run and the files to search.
+        The sizes with no files changed are reused if all the files of their duplicates are unchanged on the disk.
+        Returns the list of the duplicates (lists of FileRecord's) and the list of the files to search. """
+        if not self.valid:
+            return [], files
+        buckets = {}
+        for record in files:
+            buckets.setdefault(record.size, []).append(record)
+        known = {}
+        for size, group, path, digest in self.__connection.execute("SELECT * FROM groups ORDER BY size, grp"):
+            known.setdefault(size, {}).setdefault(group, []).append((path, digest))
+
+        reused = []
+        search = []
+        for size, records in buckets.items():
+            if len(records) < 2:
+                continue
+            groups = self.__verify(records, known.get(size, {}).values()) if size not in self.changed_sizes else None
+            if groups is None:
+                search.extend(self.__restat(records))
+            else:
+                reused.extend(groups)
+                self.reused_sizes += 1
+        return reused, search
+
+    def __restat(self, records):
+        """ Returns the records of the files stat'ed again (the ones of the directories not listed are taken from the
+        snapshot, the files may be modified in place since), the files removed are dropped. The entries of the files
+        modified are updated. """
+        result = []
+        for record in records:
+            try:
+                st = os.lstat(record.path)
+            except OSError:
+                continue
+            if not stat.S_ISREG(st.st_mode):
+                continue
+            fresh = FileRecord.from_stat(record.path, st)
+            if (fresh.size, fresh.mtime_ns, fresh.inode, fresh.device) != (record.size, record.mtime_ns, record.inode,
+                                                                          record.device):
+                self.__connection.execute(
+                    "UPDATE files SET size=?, mtime_ns=?, inode=?, device=?, nlink=? WHERE directory=? AND name=?",
+                    (fresh.size, fresh.mtime_ns, fresh.inode, fresh.device, fresh.nlink,
+                     os.path.dirname(fresh.path), os.path.basename(fresh.path)))
+            result.append(fresh)
+        return result
+
+    def __verify(self, records, groups):
+        """ Returns the duplicates (lists of FileRecord's) of the bucket if all their files are unchanged """
+        by_path = {record.path: record for record in records}
+        result = []
+        for group in groups:
+            same = []
+            for path, digest in group:
+                record = by_path.get(path)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    return None
+                if record is None or (st.st_size, st.st_mtime_ns, st.st_ino) != (record.size, record.mtime_ns,
+                                                                                  record.inode):
+                    return None
+                record.digest = digest if self.__same_algorithm else None
+                same.append(record)
+            result.append(same)
+        return result
+
+    def store_groups(self, groups):
+        """ Remembers the duplicates (lists of FileRecord's) found by this run """
+        self.__connection.execute("DELETE FROM groups")
+        self.__connection.executemany("INSERT INTO groups VALUES (?, ?, ?, ?)", (
+            (records[0].size, i, record.path, record.digest) for i, records in enumerate(groups)
+            for record in records))
+
+    def invalidate(self, groups):
+        """ Makes the directories of the duplicates (deleted or linked) listed again next time """
+        self.__connection.executemany("UPDATE directories SET mtime_ns=-1 WHERE path=?", set(
+            (os.path.dirname(record.path),) for records in groups for record in records))
+
+    def close(self, complete=True):
+        """ Saves the changes and closes the snapshot file; it is trusted next time only if the run is complete """
+        if self.__connection is not None:
+            self.__connection.execute("INSERT OR REPLACE INTO meta VALUES ('roots', ?)", (self.roots,))
+            self.__connection.execute("INSERT OR REPLACE INTO meta VALUES ('algorithm', ?)", (self.algorithm,))
+            self.__connection.execute("INSERT OR REPLACE INTO meta VALUES ('complete', ?)", (1 if complete else 0,))
+            self.__connection.commit()
+            self.__connection.close()
+            self.__connection = None
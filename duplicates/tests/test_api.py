@@ -0,0 +1,70 @@
+"""
+Created on Oct 18, 2026
+
+@author: alexeymavrin@gmail.com
+
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from io import StringIO
+
+from duplicates import api
+
+
+class ApiValidation(unittest.TestCase):
+
+    def setUp(self):
+        self.stdout_orig = sys.stdout
+        sys.stdout = StringIO()
+        self.tmp = tempfile.mkdtemp()
+        self.root = os.path.join(self.tmp, "sample")
+        shutil.copytree(os.path.join(os.path.dirname(os.path.realpath(__file__)), "sample"), self.root)
+
+    def tearDown(self):
+        output = sys.stdout.getvalue()
+        sys.stdout = self.stdout_orig
+        shutil.rmtree(self.tmp)
+        self.assertEqual("", output, "nothing printed")
+
+    def test_find_duplicates(self):
+        """Groups are yielded lazily, the progress goes to the callback"""
+        calls = []
+        groups = api.find_duplicates(self.root, jobs=1, progress=lambda *args, **kwargs: calls.append(args))
+        self.assertEqual([], calls, "nothing done before the first group is asked for")
+        groups = list(groups)
+
+        self.assertTrue(groups)
+        for group in groups:
+            self.assertIsInstance(group, api.DuplicateGroup)
+            self.assertGreater(len(group), 1)
+            self.assertEqual({group.size}, {record.size for record in group})
+            self.assertTrue(all(record.path.startswith(self.root + os.sep) for record in group))
+            self.assertGreaterEqual(group.reclaimable, 0)
+        self.assertFalse(hasattr(groups[0], "__dict__"))
+        self.assertIn("Index", [name for name, *_ in calls])
+        self.assertIn("By Hash", [name for name, *_ in calls])
+
+    def test_stream(self):
+        """Stream mode finds the same groups, largest size first"""
+        groups = list(api.find_duplicates([self.root], compare=0))
+        streamed = list(api.find_duplicates([self.root], stream=True, compare=0))
+        self.assertEqual(sorted(sorted(r.path for r in g) for g in groups),
+                         sorted(sorted(r.path for r in g) for g in streamed))
+        self.assertEqual(sorted((g.size for g in streamed), reverse=True), [g.size for g in streamed])
+        self.assertTrue(all(g.digest for g in streamed))
+
+    def test_walk_roots(self):
+        """Nested roots are walked once"""
+        self.assertEqual(["/a", "/b"], api.get_walk_roots(["/a", "/a/c", "/b", "/a"]))
+        self.assertEqual(["/a/c", "/b/a"], api.get_walk_roots(["/a/c", "/b/a"]))
+        self.assertEqual(["/a"], api.get_walk_roots(["/a/c", "/a"]))
+        self.assertEqual(sorted(r.path for r in api.walk_roots([self.root, os.path.join(self.root, "work")])),
+                         sorted(r.path for r in api.walk_roots([self.root])))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,71 @@
+"""
+Created on Oct 18, 2026
+
+@author: alexeymavrin@gmail.com
+
+"""
+
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from duplicates import duplicatefilefinder
+from duplicates.asyncwalk import get_files_async
+
+
+class AsyncWalkValidation(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        for d in range(4):
+            for f in range(10):
+                path = os.path.join(self.tmp, "d%d" % d, "s" if f % 2 else "", ".f%d" % f if f == 3 else "f%d" % f)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(path, "wb") as fh:
+                    fh.write(b"x" * f)
+        os.symlink(os.path.join(self.tmp, "d0", "f2"), os.path.join(self.tmp, "link"))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_same_files(self):
+        """Same files in the same order as the scandir walker"""
+        for include_hidden in (True, False):
+            for include_empty in (True, False):
+                expected = [r.path for r in duplicatefilefinder.get_files(self.tmp, include_hidden, include_empty)]
+                found = [r.path for r in get_files_async(self.tmp, include_hidden, include_empty, concurrency=4)]
+                self.assertEqual(expected, found)
+
+    def test_latency(self):
+        """Listings and stat calls of a high latency file system are overlapped"""
+        latency = 0.02
+        walk = duplicatefilefinder.WalkStats()
+        started = time.perf_counter()
+        records = list(get_files_async(self.tmp, True, True, walk, concurrency=32, latency=latency))
+        elapsed = time.perf_counter() - started
+        sequential = (len(records) + walk.directories) * latency
+        self.assertEqual(40, len(records))
+        self.assertEqual(9, walk.directories)
+        self.assertLess(elapsed, sequential / 3)
+
+    def test_bounded(self):
+        """Only a few directories are listed ahead of the consumer"""
+        walk = duplicatefilefinder.WalkStats()
+        files = get_files_async(self.tmp, True, True, walk, concurrency=2)
+        next(files)
+        time.sleep(0.1)
+        self.assertLessEqual(walk.directories, 4, "root, d0 and at most two directories ahead")
+        self.assertEqual(39, len(list(files)))
+        self.assertEqual(9, walk.directories)
+
+    def test_stop(self):
+        """Walk is stopped if the files are not needed"""
+        files = get_files_async(self.tmp, True, True, latency=0.01)
+        next(files)
+        files.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,51 @@
+"""
+Created on Oct 18, 2026
+
+@author: alexeymavrin@gmail.com
+
+"""
+
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from io import StringIO
+
+from duplicates import bench
+
+
+class BenchValidation(unittest.TestCase):
+
+    def setUp(self):
+        self.stdout_orig = sys.stdout
+        sys.stdout = StringIO()
+        self.tmp = tempfile.mkdtemp()
+
+    def tearDown(self):
+        sys.stdout = self.stdout_orig
+        shutil.rmtree(self.tmp)
+
+    def test_generate_tree(self):
+        """Tree is reproducible with the same seed"""
+        first = bench.generate_tree(os.path.join(self.tmp, "a"), files=50, max_size=4096, directories=5, seed=1)
+        second = bench.generate_tree(os.path.join(self.tmp, "b"), files=50, max_size=4096, directories=5, seed=1)
+        self.assertEqual(first, second)
+        self.assertEqual(50, sum(len(names) for _, _, names in os.walk(os.path.join(self.tmp, "a"))))
+
+    def test_main(self):
+        """Results are written as JSON"""
+        output = os.path.join(self.tmp, "bench.json")
+        self.assertEqual(0, bench.main(["--files", "50", "--max-size", "4096", "--dir", self.tmp, "-o", output]))
+        with open(output) as f:
+            result = json.load(f)
+        self.assertEqual(50, result["walk"]["files"])
+        self.assertEqual(["By Size", "By CRC", "By Sample", "Compare", "By Hash"],
+                         [stage["name"] for stage in result["stages"]])
+        self.assertEqual(50, result["syscalls"]["stat"])
+        self.assertEqual(["bench.json"], os.listdir(self.tmp))  # the tree is removed
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+"""
+Created on Oct 18, 2026
+
+@author: alexeymavrin@gmail.com
+
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from duplicates import api
+from duplicates.catalog import Catalog, build_catalog
+
+
+class CatalogValidation(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.golden = os.path.join(self.tmp, "golden")
+        self.work = os.path.join(self.tmp, "work")
+        self.catalog_path = os.path.join(self.tmp, "catalog.db")
+        for root, files in ((self.golden, {"a": b"same" * 100000, "b": b"golden only", "c": b"x" * 10,
+                                           "h": b"h" * 20}),
+                            (self.work, {"a": b"same" * 100000, "d": b"work only", "e": b"y" * 10,
+                                         "f": b"y" * 10, "g": b"g" * 20})):
+            os.mkdir(root)
+            for name, data in files.items():
+                with open(os.path.join(root, name), "wb") as f:
+                    f.write(data)
+        os.link(os.path.join(self.golden, "a"), os.path.join(self.golden, "a link"))
+        os.link(os.path.join(self.golden, "h"), os.path.join(self.golden, "h link"))
+        build_catalog(self.catalog_path, api.walk_roots([self.golden]), samples=2, jobs=2, roots=[self.golden])
+        shutil.rmtree(self.golden)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_catalog(self):
+        with Catalog(self.catalog_path) as catalog:
+            self.assertEqual(6, len(catalog))
+            self.assertEqual([self.golden], catalog.roots)
+            self.assertEqual(("sha256", 2), (catalog.algorithm, catalog.samples))
+            records = list(catalog.records([10, 400000, 1]))
+            self.assertEqual([os.path.join(self.golden, "c"), os.path.join(self.golden, "a"),
+                              os.path.join(self.golden, "a link")], [record.path for record in records])
+            self.assertEqual(records[1].file_id, records[2].file_id, "hard links")
+            self.assertNotEqual(records[0].file_id, records[1].file_id)
+            cache = catalog.get_cache()
+            self.assertEqual(cache.lookup(records[1], "sha256"), cache.lookup(records[2], "sha256"))
+            self.assertTrue(cache.contains(records[0], "sha256"))
+            self.assertFalse(cache.contains(records[0], "blake2b"), "only the keys kept in the catalog")
+
+    def test_find_duplicates(self):
+        """The catalog entries are matched by their keys, the work files of the other sizes are not read.
+        The hard links within the catalog are the links of one file as in the golden folder."""
+        stages = []
+        with Catalog(self.catalog_path) as catalog:
+            groups = list(api.find_duplicates([self.work], jobs=1, catalog=catalog, stages=stages))
+        found = sorted(sorted(os.path.relpath(record.path, self.tmp) for record in group) for group in groups)
+        self.assertEqual([[os.path.join("golden", "a"), os.path.join("golden", "a link"), os.path.join("work", "a")],
+                          [os.path.join("golden", "h"), os.path.join("golden", "h link")],
+                          [os.path.join("work", "e"), os.path.join("work", "f")]], found)
+        self.assertEqual({400000: 400000, 20: 0, 10: 10}, {group.size: group.reclaimable for group in groups})
+        by_crc = next(stage for stage in stages if stage.name == "By CRC")
+        self.assertEqual(9, by_crc.files_in, "golden a, a link, c, h and h link are taken from the catalog, work d is "
+                                             "dropped")
+        self.assertEqual(1024 + 10 + 10 + 20, by_crc.bytes_read, "the work files are read only")
+
+    def test_algorithm(self):
+        with Catalog(self.catalog_path) as catalog:
+            with self.assertRaises(ValueError):
+                list(api.find_duplicates([self.work], algorithm="blake2b", catalog=catalog))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,82 @@
+"""
+Created on Oct 18, 2026
+
+@author: alexeymavrin@gmail.com
+
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from io import StringIO
+from unittest import mock
+
+from duplicates import api, duplicates
+from duplicates.checkpoint import Checkpoint
+
+
+class CheckpointValidation(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.root = os.path.join(self.tmp, "root")
+        self.state = os.path.join(self.tmp, "state")
+        os.mkdir(self.root)
+        for i in range(1, 4):  # 3 sizes with 2 copies each
+            for name in ("a%d" % i, "b%d" % i):
+                with open(os.path.join(self.root, name), "wb") as f:
+                    f.write(b"%d" % i * 1000 * i)
+        self.run = {"roots": [self.root]}
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_walk(self):
+        """The saved walk is used when resumed, the files removed since are dropped"""
+        with self.assertRaises(KeyboardInterrupt), Checkpoint(self.state, self.run) as checkpoint:
+            self.assertEqual(6, len(list(checkpoint.walk(api.walk_roots([self.root])))))
+            raise KeyboardInterrupt
+        os.unlink(os.path.join(self.root, "a1"))
+        with open(os.path.join(self.root, "new"), "wb") as f:
+            f.write(b"new")
+        with Checkpoint(self.state, self.run, resume=True) as checkpoint:
+            files = list(checkpoint.walk(iter(())))
+        self.assertEqual(["a2", "a3", "b1", "b2", "b3"], sorted(os.path.basename(record.path) for record in files))
+        self.assertFalse(os.path.exists(self.state), "removed when the run is complete")
+
+    def test_another_run(self):
+        with self.assertRaises(ValueError):
+            Checkpoint(self.state, self.run, resume=True)
+        Checkpoint(self.state, self.run).close()
+        with self.assertRaises(ValueError):
+            Checkpoint(self.state, {"roots": [self.tmp]}, resume=True)
+
+    def test_resume(self):
+        """The run interrupted after the largest size is resumed: the size is skipped, the keys are reused"""
+        process = duplicates.print_and_process_duplicates
+        calls = []
+
+        def interrupted(*args, **kwargs):
+            calls.append(args[0][0][0].size)
+            if len(calls) == 2:
+                raise KeyboardInterrupt
+            return process(*args, **kwargs)
+
+        with redirect_stdout(StringIO()), mock.patch.object(duplicates, "print_and_process_duplicates", interrupted):
+            with self.assertRaises(KeyboardInterrupt):
+                duplicates.duplicates(self.root, jobs=1, compare=0, stream=True, checkpoint=self.state)
+            self.assertTrue(os.path.exists(self.state))
+            stats = duplicates.duplicates(self.root, jobs=1, compare=0, stream=True, checkpoint=self.state,
+                                          resume=True)
+        self.assertEqual([3000, 2000, 2000, 1000], calls)
+        self.assertEqual(2, stats.groups, "the largest size was processed before the interruption")
+        by_hash = next(stage for stage in stats.stages if stage.name == "By Hash")
+        self.assertEqual(0, by_hash.bytes_read, "the sizes 2000 and 1000 were hashed before the interruption")
+        self.assertEqual(6, stats.total_files, "the saved walk")
+        self.assertFalse(os.path.exists(self.state))
+
+
+if __name__ == "__main__":
+    unittest.main()
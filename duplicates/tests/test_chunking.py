@@ -0,0 +1,85 @@
+"""
+Created on Oct 18, 2026
+
+@author: alexeymavrin@gmail.com
+
+"""
+
+import os
+import random
+import shutil
+import tempfile
+import unittest
+
+from duplicates import chunking
+from duplicates.duplicatefilefinder import FileRecord
+from duplicates.hashcache import HashCache
+
+
+class ChunkingValidation(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.data = random.Random(1).randbytes(256 * 1024)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def write(self, name, data):
+        path = os.path.join(self.tmp, name)
+        with open(path, "wb") as f:
+            f.write(data)
+        return FileRecord.from_stat(path, os.stat(path))
+
+    def test_chunks(self):
+        """The chunks cover the file, their sizes are bounded and do not depend on the block size"""
+        record = self.write("a", self.data)
+        chunks = list(chunking.get_chunks(record.path, chunk_size=4096))
+        self.assertEqual(len(self.data), sum(length for length, _ in chunks))
+        self.assertTrue(all(length <= 8 * 4096 for length, _ in chunks))
+        self.assertTrue(all(length >= 4096 // 4 for length, _ in chunks[:-1]))
+        self.assertEqual(chunks, list(chunking.get_chunks(record.path, chunk_size=4096, block_size=1000)))
+
+    def test_shifted(self):
+        """Bytes inserted at the head change the first chunks only"""
+        first = set(chunking.get_chunks(self.write("a", self.data).path, chunk_size=4096))
+        second = set(chunking.get_chunks(self.write("b", b"ID3 tag" * 100 + self.data).path, chunk_size=4096))
+        shared = sum(length for length, _ in first & second)
+        self.assertGreater(shared, 0.9 * len(self.data))
+
+    def test_find_near_duplicates(self):
+        """Truncated and appended copies are found, unrelated files are not"""
+        original = self.write("original", self.data)
+        truncated = self.write("truncated", self.data[:len(self.data) // 2])
+        appended = self.write("appended", self.data + b"log line\n" * 1000)
+        self.write("other", random.Random(2).randbytes(len(self.data)))
+        self.write("empty", b"")
+
+        with HashCache(os.path.join(self.tmp, "cache.db")) as cache:
+            for _ in range(2):  # the second time the chunks are taken from the cache
+                stages = []
+                pairs, reclaimable = chunking.find_near_duplicates(
+                    [FileRecord.from_stat(record.path, os.stat(record.path)) for record in
+                     (original, truncated, appended)] + [self.write("other", random.Random(2).randbytes(1000))],
+                    0.8, chunk_size=4096, cache=cache, jobs=2, stages=stages)
+                found = {frozenset((os.path.basename(first.path), os.path.basename(second.path)))
+                         for first, second, _ in pairs}
+                self.assertEqual({frozenset(("original", "truncated")), frozenset(("original", "appended")),
+                                  frozenset(("truncated", "appended"))}, found)
+                self.assertEqual("original", os.path.basename(max(pairs, key=lambda pair: pair[2])[0].path))
+                self.assertGreater(reclaimable, len(self.data))
+                self.assertEqual(4, stages[0].files_in)
+            self.assertEqual(3, stages[0].files_out)
+
+    def test_common_chunks(self):
+        """Chunks found in too many files are not counted"""
+        index = chunking.ChunkIndex(max_chunk_files=2)
+        key = chunking.CHUNK.pack(100, b"x" * chunking.DIGEST_SIZE)
+        for i in range(3):
+            index.add(FileRecord("/%d" % i, 100, 0, i, 1), key)
+        self.assertEqual([], index.pairs(0.5))
+        self.assertEqual(0, index.reclaimable())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,70 @@
+"""
+Created on Oct 18, 2026
+
+@author: alexeymavrin@gmail.com
+
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from io import StringIO
+
+from duplicates import duplicatefilefinder
+
+
+class DuplicateFileFinderValidation(unittest.TestCase):
+
+    def setUp(self):
+        self.stdout_orig = sys.stdout
+        sys.stdout = StringIO()
+        self.tmp = tempfile.mkdtemp()
+
+    def tearDown(self):
+        sys.stdout = self.stdout_orig
+        shutil.rmtree(self.tmp)
+
+    def write(self, name, data):
+        path = os.path.join(self.tmp, name)
+        with open(path, "wb") as f:
+            f.write(data)
+        return duplicatefilefinder.FileRecord.from_stat(path)
+
+    def test_samples(self):
+        """Files with the same head but different tail are not hashed"""
+        head = os.urandom(4 * 1024 * 1024)  # 16 times the samples read
+        files = [self.write("a", head + b"a"), self.write("b", head + b"b")]
+
+        stages = []
+        result = duplicatefilefinder.filter_duplicate_files(files, compare=0, samples=2, stages=stages)
+        self.assertEqual([], result)
+        self.assertEqual(["By Size", "By CRC", "By Sample", "By Hash"], [stage.name for stage in stages])
+        crc, sample, hash_ = stages[1:]
+        self.assertEqual((2, 2, 2048), (crc.files_in, crc.files_out, crc.bytes_read))
+        self.assertEqual((2, 0, 2 * len(head) + 2), (sample.files_in, sample.files_out, sample.bytes_eliminated))
+        self.assertEqual(2 * 4 * duplicatefilefinder.SAMPLE_BLOCK_SIZE, sample.bytes_read)
+        self.assertEqual((0, 0), (hash_.files_in, hash_.bytes_read))
+
+    def test_samples_small(self):
+        """Files less than 16 times larger than the samples are not sampled"""
+        head = os.urandom(4 * 1024 * 1024 - 2)
+        files = [self.write("a", head + b"a"), self.write("b", head + b"b")]
+
+        stages = []
+        duplicatefilefinder.filter_duplicate_files(files, compare=0, samples=2, stages=stages)
+        sample = stages[2]
+        self.assertEqual((2, 2, 0), (sample.files_in, sample.files_out, sample.bytes_read))
+
+    def test_samples_same(self):
+        """Same files pass the sample stage"""
+        data = os.urandom(4 * 1024 * 1024)
+        files = [self.write("a", data), self.write("b", data), self.write("c", data[:-1] + bytes([data[-1] ^ 1]))]
+
+        result = duplicatefilefinder.filter_duplicate_files(files, compare=0, samples=2)
+        self.assertEqual([["a", "b"]], [[os.path.basename(r.path) for r in records] for records in result])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -5,13 +5,17 @@ Created on Jan 23, 2018
 
 """
 
+import csv
+import json
 import os
 import shutil
 import sys
 import unittest
 from io import StringIO
 
+from duplicates import duplicatefilefinder
 from duplicates import duplicates
+from duplicates import throttle
 
 
 class DuplicatesE2EValidation(unittest.TestCase):
@@ -242,6 +246,247 @@ class DuplicatesE2EValidation(unittest.TestCase):
         all_files = duplicates.get_all_files("tst copy")
         self.assertEqual(16, len(all_files), "total files")
 
+    def test_jobs(self):
+        """Parallel hashing gives the same result as the sequential one"""
+
+        def find(jobs):
+            files = duplicatefilefinder.get_files("tst", include_hidden=True, include_empty=True)
+            files = sorted(files, key=lambda record: record.path)
+            return [[record.path for record in records]
+                    for records in duplicatefilefinder.filter_duplicate_files(files, None, jobs=jobs)]
+
+        self.assertEqual(find(1), find(4))
+
+    def test_compare(self):
+        """Comparing the files directly gives the same result as hashing"""
+
+        def find(compare):
+            files = duplicatefilefinder.get_files("tst", include_hidden=True, include_empty=True)
+            return sorted(sorted(record.path for record in records)
+                          for records in duplicatefilefinder.filter_duplicate_files(files, None, compare=compare))
+
+        self.assertEqual(find(0), find(100))
+
+    def test_hard_links(self):
+        """Hard links to the kept file are reported, no space reclaimed by deleting them"""
+
+        os.utime(os.path.join('tst', 'work', 'duplicate.jpg'), (0, 0))
+        os.link(os.path.join('tst', 'work', 'duplicate.jpg'), os.path.join('tst', 'work', 'link.jpg'))
+
+        stats = duplicates.duplicates(os.path.join('tst', 'work'))
+        self.assertEqual(1, stats.hard_links)
+        self.assertEqual(759783 + 2 * 532293, stats.reclaimable_bytes)
+
+    def test_hardlink_action(self):
+        """Duplicates in work replaced with hard links to golden"""
+
+        sys.argv = ['-v', '-g', os.path.join('tst', 'golden'), '-w', os.path.join('tst', 'work'), '--hardlink']
+
+        duplicates.main()
+
+        all_files = duplicates.get_all_files("tst")
+        self.assertEqual(16, len(all_files), "total files")
+
+        work_file = os.path.join('tst', 'work', '1', 'duplicate 2.jpg')
+        self.assertTrue(any(os.path.samefile(work_file, os.path.join('tst', 'golden', golden_file))
+                            for golden_file in ('duplicate.jpg', 'duplicate copy.jpg')))
+
+    def test_stream(self):
+        """Bounded memory mode finds and purges the same duplicates"""
+
+        expected = repr(duplicates.duplicates(os.path.join('tst', ''), os.path.join('tst', 'golden')))
+        stats = duplicates.duplicates(os.path.join('tst', ''), os.path.join('tst', 'golden'), stream=True)
+        self.assertEqual(expected, repr(stats))
+        self.assertEqual(4, stats.groups)  # golden nested in work is walked once
+
+        sys.argv = ['-v', '-w', os.path.join('tst', ''), '-g', os.path.join('tst', 'golden'), '-p', '--stream']
+        duplicates.main()
+
+        all_files = duplicates.get_all_files("tst")
+        self.assertEqual(7, len(all_files), "total files after")
+
+    def test_output_formats(self):
+        """Duplicates written as JSON Lines and CSV"""
+
+        duplicates.duplicates(os.path.join('tst', 'work'), os.path.join('tst', 'golden'), output_format="jsonl",
+                              output=os.path.join('tst', 'out.jsonl'))
+        with open(os.path.join('tst', 'out.jsonl'), encoding="utf-8") as f:
+            groups = [json.loads(line) for line in f]
+        self.assertEqual([1, 2, 3, 4], [group["group"] for group in groups])
+        self.assertEqual(759783, groups[0]["size"])
+        self.assertEqual(["K", "D"], [f["tag"] for f in groups[0]["files"]])
+        self.assertEqual(["K", "S", "D", "D", "D"], [f["tag"] for f in groups[1]["files"]])
+        self.assertEqual(1, len(set(f["digest"] for f in groups[1]["files"])))
+
+        duplicates.duplicates(os.path.join('tst', 'work'), os.path.join('tst', 'golden'), output_format="csv",
+                              output=os.path.join('tst', 'out.csv'))
+        with open(os.path.join('tst', 'out.csv'), encoding="utf-8", newline="") as f:
+            rows = list(csv.DictReader(f))
+        self.assertEqual(sum(len(group["files"]) for group in groups), len(rows))
+        self.assertEqual(["K", "D"], [row["tag"] for row in rows if row["group"] == "1"])
+
+    def test_profile(self):
+        """Walk and stage statistics written as JSON"""
+
+        sys.argv = ['-v', '-w', os.path.join('tst', 'work'), '-g', os.path.join('tst', 'golden'), '--profile',
+                    '--stats-json', os.path.join('tst', 'stats.json')]
+        duplicates.main()
+
+        with open(os.path.join('tst', 'stats.json')) as f:
+            stats = json.load(f)
+        total = len(duplicates.get_all_files(os.path.join('tst', 'work')) +
+                    duplicates.get_all_files(os.path.join('tst', 'golden')))
+        self.assertEqual(total, stats["total_files"])
+        self.assertEqual(total, stats["walk"]["files"])
+        self.assertEqual(stats["walk"]["directories"], len(stats["walk"]["slowest"]))
+        self.assertEqual(["By Size", "By CRC", "By Sample", "Compare", "By Hash"],
+                         [stage["name"] for stage in stats["stages"]])
+        self.assertEqual(stats["stages"][1]["files_out"], stats["stages"][2]["files_in"])
+        self.assertTrue(all(stage["io_seconds"] >= 0 for stage in stats["stages"]))
+        self.assertIn("(By Hash) files:", self.stdout.getvalue())
+
+    def test_incremental(self):
+        """Incremental run finds and purges the same duplicates"""
+
+        snapshot = os.path.join('tst', 'snapshot.db')
+        expected = repr(duplicates.duplicates(os.path.join('tst', 'work'), os.path.join('tst', 'golden')))
+        for _ in range(2):
+            stats = duplicates.duplicates(os.path.join('tst', 'work'), os.path.join('tst', 'golden'),
+                                          incremental=snapshot)
+            self.assertEqual(expected, repr(stats))
+
+        sys.argv = ['-v', '-w', os.path.join('tst', 'work'), '-g', os.path.join('tst', 'golden'), '-p', '-i', snapshot]
+        duplicates.main()
+        expected = repr(duplicates.duplicates(os.path.join('tst', 'work'), os.path.join('tst', 'golden')))
+        stats = duplicates.duplicates(os.path.join('tst', 'work'), os.path.join('tst', 'golden'), incremental=snapshot)
+        self.assertEqual(expected, repr(stats))
+
+    def test_multiple_roots(self):
+        """Several work roots searched at once, the first one given has priority"""
+
+        shutil.copytree(os.path.join('tst', 'work', '1'), "tgt")
+        sys.argv = ['-v', '-w', os.path.join('tst', 'work', '1'), '-w', os.path.join('tst', 'work'), '-w', "tgt",
+                    '-p']
+        duplicates.main()
+
+        self.assertTrue(os.path.isfile(os.path.join('tst', 'work', '1', '.new.jpg')))
+        self.assertFalse(os.path.isfile(os.path.join('tst', 'work', 'newλ.jpg')))
+        self.assertFalse(os.path.isfile(os.path.join('tgt', '.new.jpg')))
+
+    def test_multiple_golden(self):
+        """Duplicates in any golden root are never deleted, the file in the first one is kept"""
+
+        shutil.copytree(os.path.join('tst', 'golden'), "tgt")
+        golden_files = len(duplicates.get_all_files("tgt"))
+        duplicates.duplicates(os.path.join('tst', 'work'), ["tgt", os.path.join('tst', 'golden')], purge=True,
+                              output_format="jsonl", output="out.jsonl")
+        with open("out.jsonl", encoding="utf-8") as f:
+            groups = [json.loads(line) for line in f]
+        os.unlink("out.jsonl")
+        tgt = os.path.abspath("tgt") + os.sep
+        self.assertTrue(all(group["files"][0]["path"].startswith(tgt) for group in groups
+                            if any(f["path"].startswith(tgt) for f in group["files"])))
+        self.assertEqual(golden_files, len(duplicates.get_all_files("tgt")))
+        self.assertEqual(golden_files, len(duplicates.get_all_files(os.path.join('tst', 'golden'))))
+
+    def test_async_walker(self):
+        """Async walker finds and purges the same duplicates"""
+
+        expected = repr(duplicates.duplicates(os.path.join('tst', 'work'), os.path.join('tst', 'golden')))
+        stats = duplicates.duplicates(os.path.join('tst', 'work'), os.path.join('tst', 'golden'), walker="async")
+        self.assertEqual(expected, repr(stats))
+
+        sys.argv = ['-v', '-w', os.path.join('tst', ''), '-g', os.path.join('tst', 'golden'), '-p', '--walker', 'async']
+        duplicates.main()
+
+        all_files = duplicates.get_all_files("tst")
+        self.assertEqual(7, len(all_files), "total files after")
+
+    def test_plan(self):
+        """Purge planned first, applied later; files changed since are skipped"""
+
+        sys.argv = ['-v', '-w', os.path.join('tst', ''), '-g', os.path.join('tst', 'golden'), '-p',
+                    '--plan', 'plan.jsonl']
+        duplicates.main()
+        self.assertEqual(16, len(duplicates.get_all_files("tst")), "nothing deleted")
+
+        with open('plan.jsonl', encoding="utf-8") as f:
+            changed = json.loads(f.readlines()[1])["path"]
+        os.utime(changed, (0, 0))
+        sys.argv = ['-v', '--apply-plan', 'plan.jsonl']
+        self.stdout.seek(0)
+        self.stdout.truncate()
+        duplicates.main()
+        os.unlink('plan.jsonl')
+        self.assertIn("Plan applied: 9 actions, deleted: 8, hard linked: 0, skipped (changed since the plan or "
+                      "failed): 1", self.stdout.getvalue())
+        self.assertNotIn("Total duplicates", self.stdout.getvalue())
+
+        self.assertTrue(os.path.isfile(changed))
+        self.assertEqual(8, len(duplicates.get_all_files("tst")), "total files after")
+
+    def test_near(self):
+        """Near duplicates: a truncated copy is reported, nothing is changed"""
+
+        with open(os.path.join('tst', 'work', 'log.txt'), 'w') as f:
+            f.write("".join("line %d of the log\n" % i for i in range(2000)))
+        with open(os.path.join('tst', 'work', 'log.txt')) as f:
+            head = f.read(30000)
+        with open(os.path.join('tst', 'golden', 'log.old.txt'), 'w') as f:
+            f.write(head)
+        sys.argv = ['-v', '-w', os.path.join('tst', 'work'), '-g', os.path.join('tst', 'golden'), '--near', '0.8',
+                    '--chunk-size', '1024', '-f', 'jsonl', '-o', 'near.jsonl']
+        duplicates.main()
+        with open('near.jsonl', encoding="utf-8") as f:
+            pairs = [json.loads(line) for line in f]
+        os.unlink('near.jsonl')
+
+        self.assertEqual(18, len(duplicates.get_all_files("tst")), "nothing deleted")
+        logs = [pair for pair in pairs if {os.path.basename(f["path"]) for f in pair["files"]} ==
+                {"log.txt", "log.old.txt"}]
+        self.assertEqual(1, len(logs))
+        self.assertGreaterEqual(logs[0]["fraction"], 0.8)
+        self.assertTrue(all(pair["fraction"] >= 0.8 for pair in pairs))
+
+    def test_golden_catalog(self):
+        """Golden catalog replaces the golden folder, it is not even there during the search"""
+
+        sys.argv = ['-v', 'catalog', 'build', '-g', os.path.join('tst', 'golden'), '-o', 'catalog.db']
+        duplicates.main()
+        self.assertIn("files written to the catalog 'catalog.db'", self.stdout.getvalue())
+        self.assertNotIn("Total duplicates", self.stdout.getvalue())
+        golden = os.path.abspath(os.path.join('tst', 'golden'))
+        shutil.move(golden, 'tgt')  # unmounted
+
+        sys.argv = ['-v', '-w', os.path.join('tst', 'work'), '--golden-catalog', 'catalog.db', '--purge', '-f',
+                    'jsonl', '-o', 'groups.jsonl']
+        duplicates.main()
+        with open('groups.jsonl', encoding="utf-8") as f:
+            groups = [json.loads(line) for line in f]
+        os.unlink('groups.jsonl')
+        os.unlink('catalog.db')
+
+        self.assertEqual(1, len(duplicates.get_all_files(os.path.join('tst', 'work'))), "same as with golden")
+        kept = [group["files"][0] for group in groups]
+        self.assertTrue(any(f["path"].startswith(golden + os.sep) for f in kept))
+        self.assertTrue(all(f["tag"] != "D" for group in groups for f in group["files"]
+                            if f["path"].startswith(golden + os.sep)))
+
+    def test_io_throttle(self):
+        """Throughput vs. the limits is reported, the throttle is removed after the run"""
+
+        sys.argv = ['-v', '-w', os.path.join('tst', 'work'), '-g', os.path.join('tst', 'golden'), '--io-bandwidth',
+                    '100', '--io-iops', '10000', '--io-latency', '1000', '--io-nocache', '--stats-json',
+                    os.path.join('tst', 'stats.json')]
+        duplicates.main()
+
+        with open(os.path.join('tst', 'stats.json')) as f:
+            io = json.load(f)["io"]
+        self.assertGreater(io["bytes_read"], 0)
+        self.assertEqual((100 * 1024 * 1024, 10000), (io["bandwidth_limit"], io["iops_limit"]))
+        self.assertIn("I/O: ", self.stdout.getvalue())
+        self.assertIsNone(throttle.get_throttle())
+
 
 def main():
     tests = unittest.TestLoader().discover('')
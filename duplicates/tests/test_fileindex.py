@@ -0,0 +1,49 @@
+"""
+Created on Oct 18, 2026
+
+@author: alexeymavrin@gmail.com
+
+"""
+
+import unittest
+from unittest import mock
+
+from duplicates import fileindex
+from duplicates.duplicatefilefinder import FileRecord
+from duplicates.fileindex import FileIndex
+
+
+class FileIndexValidation(unittest.TestCase):
+
+    def setUp(self):
+        self.index = FileIndex()
+        for i, (path, size) in enumerate((("/a/1", 10), ("/a/2", 5), ("/b/3", 10), ("/b/4", 7), ("/a/5", 5),
+                                          ("/c/6", 10))):
+            self.index.add(FileRecord(path, size, i, i + 100, 1))
+
+    def test_interned_directories(self):
+        self.assertEqual(self.index.directories, ["/a", "/b", "/c"])
+        self.assertEqual([r.path for r in self.index.records()], ["/a/1", "/a/2", "/b/3", "/b/4", "/a/5", "/c/6"])
+
+    def test_size_groups(self):
+        groups = [list(rows) for rows in self.index.size_groups()]
+        self.assertEqual(groups, [[0, 2, 5], [1, 4]])  # largest size first, rows in the order added
+        self.assertEqual([list(rows) for rows in self.index.size_groups(min_count=1)], [[0, 2, 5], [3], [1, 4]])
+
+    def test_size_groups_chunks(self):
+        """Chunks sorted apart are merged in the same order"""
+        with mock.patch.object(fileindex, "SORT_CHUNK", 2):
+            self.test_size_groups()
+
+    def test_drop_unique_sizes(self):
+        self.assertEqual(self.index.drop_unique_sizes(), (1, 7))
+        self.assertEqual([r.path for r in self.index.records()], ["/a/1", "/a/2", "/b/3", "/a/5", "/c/6"])
+        self.assertEqual(self.index.drop_unique_sizes(), (0, 0))
+
+    def test_buckets(self):
+        buckets = [[(r.path, r.inode) for r in bucket] for bucket in self.index.buckets()]
+        self.assertEqual(buckets, [[("/a/1", 100), ("/b/3", 102), ("/c/6", 105)], [("/a/2", 101), ("/a/5", 104)]])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,111 @@
+"""
+Created on Oct 18, 2026
+
+@author: alexeymavrin@gmail.com
+
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from io import StringIO
+
+from duplicates import duplicatefilefinder
+from duplicates.hashcache import HashCache
+
+
+class HashCacheValidation(unittest.TestCase):
+
+    def setUp(self):
+        self.stdout_orig = sys.stdout
+        sys.stdout = StringIO()
+        self.tmp = tempfile.mkdtemp()
+        self.cache_path = os.path.join(self.tmp, "cache.db")
+        self.files = []
+        for name, data in (("a", b"same"), ("b", b"same"), ("c", b"diff")):
+            path = os.path.join(self.tmp, name)
+            with open(path, "wb") as f:
+                f.write(data)
+            self.files.append(path)
+        self.paths = self.files
+        self.files = [duplicatefilefinder.FileRecord.from_stat(path) for path in self.paths]
+
+    def tearDown(self):
+        sys.stdout = self.stdout_orig
+        shutil.rmtree(self.tmp)
+
+    def test_commit_seconds(self):
+        """The keys are committed while the cache is open (checkpoints)"""
+        with HashCache(self.cache_path, commit_seconds=0) as cache:
+            cache.store(self.files[0], "crc", 1)
+            with HashCache(self.cache_path) as other:
+                self.assertEqual(1, other.lookup(self.files[0], "crc"))
+
+    def test_second_run_hits(self):
+        """Keys computed in the first run are reused in the second one"""
+        with HashCache(self.cache_path) as cache:
+            result = duplicatefilefinder.filter_duplicate_files(self.files, None, cache, compare=0, samples=0)
+            self.assertEqual([self.paths[:2]], [[r.path for r in records] for records in result])
+            self.assertEqual(0, cache.hits)
+
+        with HashCache(self.cache_path) as cache:
+            result = duplicatefilefinder.filter_duplicate_files(self.files, None, cache, compare=0, samples=0)
+            self.assertEqual([self.paths[:2]], [[r.path for r in records] for records in result])
+            self.assertEqual(0, cache.misses)
+            self.assertEqual(5, cache.hits)  # 3 crc + 2 hash
+
+    def test_modified_file(self):
+        """Modified file is read again"""
+        with HashCache(self.cache_path) as cache:
+            duplicatefilefinder.filter_duplicate_files(self.files, None, cache, compare=0, samples=0)
+
+        st = os.stat(self.paths[1])
+        with open(self.paths[1], "wb") as f:
+            f.write(b"sane")
+        os.utime(self.paths[1], ns=(st.st_atime_ns, st.st_mtime_ns + 1))
+        self.files[1] = duplicatefilefinder.FileRecord.from_stat(self.paths[1])
+
+        with HashCache(self.cache_path) as cache:
+            result = duplicatefilefinder.filter_duplicate_files(self.files, None, cache, compare=0, samples=0)
+            self.assertEqual([], result)
+            self.assertEqual(1, cache.misses)
+
+    def test_prune(self):
+        """Entries of the removed files are pruned"""
+        with HashCache(self.cache_path) as cache:
+            duplicatefilefinder.filter_duplicate_files(self.files, None, cache, compare=0, samples=0)
+            self.assertEqual(0, cache.prune())
+
+        os.unlink(self.paths[0])
+        with HashCache(self.cache_path) as cache:
+            self.assertEqual(1, cache.prune())
+            self.assertEqual(0, cache.prune())
+
+    def test_compare_cached(self):
+        """Files with a cached hash are not compared again"""
+        with HashCache(self.cache_path) as cache:
+            duplicatefilefinder.filter_duplicate_files(self.files, None, cache, compare=0, samples=0)
+
+        with HashCache(self.cache_path) as cache:
+            result = duplicatefilefinder.filter_duplicate_files(self.files, None, cache, compare=2, samples=0)
+            self.assertEqual([self.paths[:2]], [[r.path for r in records] for records in result])
+            self.assertEqual(5, cache.hits)
+
+    def test_algorithms(self):
+        """Hashes of different algorithms are never mixed"""
+        with HashCache(self.cache_path) as cache:
+            duplicatefilefinder.filter_duplicate_files(self.files, None, cache, compare=0, algorithm="sha256",
+                                                       samples=0)
+
+        with HashCache(self.cache_path) as cache:
+            result = duplicatefilefinder.filter_duplicate_files(self.files, None, cache, compare=0,
+                                                                algorithm="blake2b", block_size=3, samples=0)
+            self.assertEqual([self.paths[:2]], [[r.path for r in records] for records in result])
+            self.assertEqual(3, cache.hits)  # crc only
+            self.assertEqual(2, cache.misses)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,109 @@
+"""
+Created on Oct 18, 2026
+
+@author: alexeymavrin@gmail.com
+
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from io import StringIO
+
+from duplicates import purge
+from duplicates.duplicatefilefinder import CatalogRecord, FileRecord
+
+
+class PurgeValidation(unittest.TestCase):
+
+    def setUp(self):
+        self.stdout_orig = sys.stdout
+        sys.stdout = StringIO()
+        self.tmp = tempfile.mkdtemp()
+
+    def tearDown(self):
+        sys.stdout = self.stdout_orig
+        shutil.rmtree(self.tmp)
+
+    def write(self, name, data=b"data"):
+        path = os.path.join(self.tmp, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(data)
+        return FileRecord.from_stat(path)
+
+    def test_apply(self):
+        """Actions applied in parallel batches, changed files skipped"""
+        kept = self.write("kept")
+        records = [self.write(os.path.join("d%d" % (i % 3), "f%d" % i)) for i in range(10)]
+        with open(records[3].path, "ab") as f:
+            f.write(b"changed")
+        actions = [purge.Action("delete", record, kept) for record in records[:9]]
+        actions.append(purge.Action("link", records[9], kept))
+
+        purger = purge.Purger(jobs=4, batch_size=2)
+        results = purger.apply(actions)
+        self.assertEqual(["deleted"] * 3 + ["deleted"] * 5, results[:3] + results[4:9])
+        self.assertIsInstance(results[3], purge.PlanChanged)
+        self.assertEqual("hard linked", results[9])
+        self.assertTrue(os.path.samefile(kept.path, records[9].path))
+        self.assertEqual({os.path.join(self.tmp, "d%d" % i) for i in range(3)}, purger.directories)
+
+    def test_remove_empty_dirs(self):
+        """Only the directories that lost files (and their parents left empty) are removed, bottom-up"""
+        deleted = self.write(os.path.join("a", "b", "c", "f"))
+        self.write(os.path.join("a", "b", "c", ".DS_Store"))
+        self.write(os.path.join("a", "g"))
+        os.makedirs(os.path.join(self.tmp, "empty"))
+        os.unlink(deleted.path)
+
+        removed = purge.remove_empty_dirs([os.path.dirname(deleted.path)], [self.tmp])
+        self.assertEqual([os.path.join(self.tmp, "a", "b", "c"), os.path.join(self.tmp, "a", "b")], removed)
+        self.assertTrue(os.path.isdir(os.path.join(self.tmp, "empty")))
+        self.assertEqual([], purge.remove_empty_dirs([os.path.join(self.tmp, "empty")], [self.tmp, "/nowhere"])[1:])
+        self.assertEqual([], purge.remove_empty_dirs([self.tmp], [self.tmp]))
+
+    def test_plan(self):
+        """Plan written and read back"""
+        kept = self.write("kept")
+        record = self.write("dup")
+        plan = os.path.join(self.tmp, "plan.jsonl")
+        with purge.PlanWriter(plan, [self.tmp], []) as writer:
+            writer.write([purge.Action("delete", record, kept)])
+        header, actions = purge.read_plan(plan)
+        self.assertEqual([self.tmp], header["work"])
+        self.assertEqual([("delete", record.path, kept.path)], [(a.kind, a.record.path, a.kept.path) for a in actions])
+        self.assertEqual(["deleted"], purge.Purger().apply(actions))
+
+    def test_plan_kept_modified(self):
+        """Nothing is done if the file kept is modified in place (same size) since the plan"""
+        kept = self.write("kept")
+        record = self.write("dup")
+        plan = os.path.join(self.tmp, "plan.jsonl")
+        with purge.PlanWriter(plan, [self.tmp], []) as writer:
+            writer.write([purge.Action("delete", record, kept)])
+        with open(kept.path, "wb") as f:
+            f.write(b"edit")
+        os.utime(kept.path, ns=(0, kept.mtime_ns + 10 ** 9))
+        _, actions = purge.read_plan(plan)
+        self.assertIsInstance(purge.Purger().apply(actions)[0], purge.PlanChanged)
+        self.assertTrue(os.path.exists(record.path))
+
+    def test_plan_kept_catalog(self):
+        """The file kept from the golden catalog is not checked (the golden folder may be not mounted)"""
+        kept = self.write("kept")
+        record = self.write("dup")
+        os.unlink(kept.path)
+        plan = os.path.join(self.tmp, "plan.jsonl")
+        with purge.PlanWriter(plan, [self.tmp], []) as writer:
+            writer.write([purge.Action("delete", record, CatalogRecord(kept.path, kept.size, kept.mtime_ns,
+                                                                       kept.inode, kept.device))])
+        _, actions = purge.read_plan(plan)
+        self.assertTrue(actions[0].kept.catalog)
+        self.assertEqual(["deleted"], purge.Purger().apply(actions))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+"""
+Created on Oct 18, 2026
+
+@author: alexeymavrin@gmail.com
+
+"""
+
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from itertools import islice
+
+from duplicates import scheduler
+from duplicates.duplicatefilefinder import FileRecord, iter_keys
+
+
+class SchedulerValidation(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_order(self):
+        """Files of a device sorted by inode, the devices interleaved"""
+        records = [FileRecord("a%d" % i, 1, 0, 10 - i, 1) for i in range(3)] + [FileRecord("b", 1, 0, 5, 2)]
+        with scheduler.DeviceScheduler(4, device_jobs={1: 2, 2: 2}) as executor:
+            executor.is_rotational = lambda device: False
+            self.assertEqual(["a2", "b", "a1", "a0"], [record.path for record in executor.order(records)])
+
+    def test_submit(self):
+        """Work items are run by the pool of their device"""
+        records = [FileRecord("a", 1, 0, 1, 1), FileRecord("b", 1, 0, 2, 2)]
+        with scheduler.DeviceScheduler(4, device_jobs={1: 1, 2: 3}) as executor:
+            self.assertEqual("a", executor.submit(lambda record: record.path, records[0]).result())
+            self.assertEqual(["a", "b"], executor.submit(lambda item: [r.path for r in item[0]],
+                                                         (records, {})).result())
+            self.assertEqual(3, executor.get_jobs(2))
+
+    def test_devices_independent(self):
+        """A slow device does not hold back the keys of the others"""
+        slow = threading.Event()
+        records = [FileRecord("%s%d" % (name, i), 1, 0, i, device) for i in range(8)
+                   for name, device in (("slow", 1), ("fast", 2))]
+
+        def key_function(record):
+            if record.device == 1:
+                slow.wait(10)
+            return record.path
+
+        with scheduler.DeviceScheduler(2, device_jobs={1: 1, 2: 2}) as executor:
+            keys = iter_keys(key_function, None, records, executor=executor, window=2)
+            first = [key for _, key in islice(keys, 8)]
+            slow.set()
+            rest = [key for _, key in keys]
+        self.assertEqual(["fast%d" % i for i in range(8)], sorted(first))
+        self.assertEqual(["slow%d" % i for i in range(8)], rest, "a device is read in the order of its files")
+
+    def test_detection(self):
+        """Rotational disk and physical offset detection never fails"""
+        path = os.path.join(self.tmp, "a")
+        with open(path, "wb") as f:
+            f.write(os.urandom(65536))
+        self.assertIn(scheduler.is_rotational(os.stat(path).st_dev), (True, False, None))
+        offset = scheduler.get_physical_offset(path)
+        self.assertTrue(offset is None or offset >= 0)
+        self.assertIsNone(scheduler.get_physical_offset(os.path.join(self.tmp, "missing")))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+"""
+Created on Oct 18, 2026
+
+@author: alexeymavrin@gmail.com
+
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from io import StringIO
+
+from duplicates import api, duplicates
+from duplicates.shard import merge_shards, read_shard, run_local_shards, scan_shard
+
+
+class ShardValidation(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.first = os.path.join(self.tmp, "first")
+        self.second = os.path.join(self.tmp, "second")
+        for root, files in ((self.first, {"a": b"same" * 1000, "b": b"first only", "c": b"x" * 10, "d": b"x" * 10}),
+                            (self.second, {"a": b"same" * 1000, "e": b"second" * 1000, "f": b"z" * 7})):
+            os.mkdir(root)
+            for name, data in files.items():
+                with open(os.path.join(root, name), "wb") as f:
+                    f.write(data)
+        os.link(os.path.join(self.first, "a"), os.path.join(self.first, "a link"))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def scan(self, root, name):
+        path = os.path.join(self.tmp, name)
+        scan_shard(path, api.walk_roots([root]), [root], compare=0, samples=2)
+        return path
+
+    def found(self, groups):
+        return sorted(sorted(os.path.relpath(record.path, self.tmp) for record in group) for group in groups)
+
+    def test_scan(self):
+        path = self.scan(self.first, "first.jsonl")
+        header, *files = read_shard(path)
+        self.assertEqual(([self.first], "sha256", 2), (header["roots"], header["algorithm"], header["samples"]))
+        self.assertEqual(5, len(files))
+        by_name = {os.path.basename(values["path"]): values for values in files}
+        self.assertIsNotNone(by_name["c"]["group"])
+        self.assertEqual(by_name["c"]["group"], by_name["d"]["group"])
+        self.assertEqual(by_name["a"]["keys"], by_name["a link"]["keys"], "the keys are shared by the hard links")
+        self.assertIsNone(by_name["b"]["group"])
+
+    def test_merge(self):
+        """The merge finds the same duplicates as the search of all the roots at once"""
+        paths = [self.scan(self.first, "first.jsonl"), self.scan(self.second, "second.jsonl")]
+        stages = []
+        groups, roots, algorithm = merge_shards(paths, compare=0, stages=stages)
+        self.assertEqual(([self.first, self.second], "sha256"), (roots, algorithm))
+        self.assertEqual(self.found(api.find_duplicates([self.first, self.second], jobs=1)), self.found(groups))
+        by_size = next(stage for stage in stages if stage.name == "By Size")
+        self.assertEqual(3, by_size.files_in, "only a, a link and second a are of the size found in both shards")
+        by_hash = next(stage for stage in stages if stage.name == "By Hash")
+        self.assertEqual(4000, by_hash.bytes_read, "the hash of first a is taken from its shard")
+
+    def test_run_local_shards(self):
+        paths = run_local_shards([self.first, self.second], 2, self.tmp, ["--samples", "2"])
+        self.assertEqual(2, len(paths))
+        groups, _, _ = merge_shards(paths)
+        self.assertEqual(self.found(api.find_duplicates([self.first, self.second], jobs=1)), self.found(groups))
+
+    def test_run_more_shards_than_folders(self):
+        """A folder is not split: a process per folder, the user is warned"""
+        with self.assertLogs("duplicates", "WARNING"), redirect_stdout(StringIO()):
+            stats = duplicates.shard_run([self.first], 2, jobs=1)
+        self.assertEqual(2, stats.keep_files, "a (with its link) and c kept")
+
+    def test_merge_export(self):
+        """The groups found within a shard are exported with their digests and the algorithm of the shards"""
+        paths = [self.scan(self.first, "first.jsonl"), self.scan(self.second, "second.jsonl")]
+        output = os.path.join(self.tmp, "groups.jsonl")
+        sys.argv = ['-v', 'shard', 'merge'] + paths + ['-f', 'jsonl', '-o', output]
+        with redirect_stdout(StringIO()):
+            duplicates.main()
+        with open(output, encoding="utf-8") as f:
+            groups = {group["size"]: group for group in map(json.loads, f)}
+        self.assertEqual({"sha256"}, set(group["algorithm"] for group in groups.values()))
+        self.assertEqual([hashlib.sha256(b"x" * 10).hexdigest()] * 2, [f["digest"] for f in groups[10]["files"]])
+
+
+if __name__ == "__main__":
+    unittest.main()
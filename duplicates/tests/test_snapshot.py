@@ -0,0 +1,135 @@
+"""
+Created on Oct 18, 2026
+
+@author: alexeymavrin@gmail.com
+
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+import unittest
+from io import StringIO
+
+from duplicates import duplicatefilefinder
+from duplicates.hashcache import HashCache
+from duplicates.snapshot import Snapshot
+
+
+class SnapshotValidation(unittest.TestCase):
+
+    def setUp(self):
+        self.stdout_orig = sys.stdout
+        sys.stdout = StringIO()
+        self.tmp = tempfile.mkdtemp()
+        self.root = os.path.join(self.tmp, "root")
+        self.snapshot_path = os.path.join(self.tmp, "snapshot.db")
+        for name, data in (("a/x", b"same"), ("a/y", b"same"), ("b/z", b"diff")):
+            self.write(name, data)
+        self.age()
+
+    def tearDown(self):
+        sys.stdout = self.stdout_orig
+        shutil.rmtree(self.tmp)
+
+    def write(self, name, data):
+        path = os.path.join(self.root, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(data)
+
+    def age(self, *names):
+        """Moves the modification time of the directories to the past (recent ones are always listed again)"""
+        for name in names or ("", "a", "b"):
+            os.utime(os.path.join(self.root, name), (0, time.time() - 3600))
+
+    def run_search(self, cache=None, algorithm="sha256"):
+        with Snapshot(self.snapshot_path, [self.root], algorithm) as snapshot:
+            files = list(snapshot.get_files(self.root, include_hidden=True, include_empty=True))
+            snapshot.removed()
+            reused, files = snapshot.reuse_groups(files)
+            groups = duplicatefilefinder.filter_duplicate_files(files, None, cache) + reused
+            snapshot.store_groups(groups)
+        return snapshot, reused, sorted(sorted(os.path.basename(r.path) for r in records) for records in groups)
+
+    def test_unchanged(self):
+        """Nothing is listed or searched again if nothing changed"""
+        snapshot, reused, groups = self.run_search()
+        self.assertEqual((3, 0, []), (snapshot.listed, snapshot.reused, reused))
+        self.assertEqual([["x", "y"]], groups)
+
+        snapshot, reused, groups = self.run_search()
+        self.assertEqual((0, 3, 1), (snapshot.listed, snapshot.reused, len(reused)))
+        self.assertEqual([["x", "y"]], groups)
+
+    def test_added(self):
+        """Only the modified directory is listed again"""
+        self.run_search()
+        self.write("b/w", b"same")
+        self.age("b")
+
+        snapshot, reused, groups = self.run_search()
+        self.assertEqual((1, 2), (snapshot.listed, snapshot.reused))
+        self.assertEqual({4}, snapshot.changed_sizes)
+        self.assertEqual([["w", "x", "y"]], groups)
+
+    def test_removed(self):
+        """Files of the removed directories are forgotten"""
+        self.run_search()
+        shutil.rmtree(os.path.join(self.root, "a"))
+        self.age("")
+
+        snapshot, reused, groups = self.run_search()
+        self.assertEqual([], groups)
+
+    def test_modified_duplicate(self):
+        """Duplicate modified in place (the directory mtime unchanged) is noticed"""
+        self.run_search()
+        self.write("a/y", b"sane")
+
+        snapshot, reused, groups = self.run_search()
+        self.assertEqual((0, []), (snapshot.listed, reused))
+        self.assertEqual([], groups)
+
+    def test_modified_in_place_cached(self):
+        """The kept copy modified in place (the directory not listed) is stat'ed again, its cached keys are dropped"""
+        self.write("a/w", b"same")
+        self.age()
+        with HashCache(os.path.join(self.tmp, "cache.db")) as cache:
+            self.assertEqual([["w", "x", "y"]], self.run_search(cache)[2])
+        self.write("a/x", b"edit")
+        os.utime(os.path.join(self.root, "a", "x"), ns=(0, 10 ** 18))
+        with HashCache(os.path.join(self.tmp, "cache.db")) as cache:
+            snapshot, reused, groups = self.run_search(cache)
+        self.assertEqual(0, snapshot.listed)
+        self.assertEqual([["w", "y"]], groups)
+
+    def test_algorithm_changed(self):
+        """Digests of the duplicates reused are dropped when the algorithm changes"""
+        self.write("a/w", b"same")  # three files are hashed
+        self.age()
+        self.run_search()
+        snapshot, reused, groups = self.run_search()
+        self.assertIsNotNone(reused[0][0].digest)
+
+        snapshot, reused, groups = self.run_search(algorithm="blake2b")
+        self.assertEqual([["w", "x", "y"]], groups)
+        self.assertEqual([None] * 3, [record.digest for record in reused[0]])
+
+    def test_incomplete(self):
+        """Snapshot of an interrupted run or other roots is not trusted"""
+        self.run_search()
+        with self.assertRaises(KeyboardInterrupt):
+            with Snapshot(self.snapshot_path, [self.root]):
+                raise KeyboardInterrupt()
+        snapshot, reused, groups = self.run_search()
+        self.assertEqual((3, 0), (snapshot.listed, snapshot.reused))
+
+        with Snapshot(self.snapshot_path, [self.root, self.tmp]) as snapshot:
+            self.assertFalse(snapshot.valid)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,46 @@
+"""
+Created on Oct 18, 2026
+
+@author: alexeymavrin@gmail.com
+
+"""
+
+import json
+import os
+import subprocess
+import sys
+import unittest
+
+IMPORT_BUDGET = 0.25  # seconds, generous: the import takes a few dozen milliseconds
+SLOW_MODULES = ("argparse", "asyncio", "humanize", "sqlite3", "csv")
+
+PROBE = """
+import json, logging, sys, time
+started = time.perf_counter()
+import duplicates.duplicates
+print(json.dumps({"seconds": time.perf_counter() - started, "modules": sorted(sys.modules),
+                  "handlers": len(logging.getLogger().handlers)}))
+"""
+
+
+class StartupValidation(unittest.TestCase):
+
+    def probe(self):
+        root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+        output = subprocess.check_output([sys.executable, "-c", PROBE], cwd=root)
+        return json.loads(output)
+
+    def test_lazy_imports(self):
+        """The slow modules are not imported and logging is not configured by the import"""
+        result = self.probe()
+        self.assertEqual([], [name for name in SLOW_MODULES if name in result["modules"]])
+        self.assertEqual(0, result["handlers"])
+
+    def test_import_budget(self):
+        """The import of the CLI module fits the budget (the best of 3 runs)"""
+        seconds = min(self.probe()["seconds"] for _ in range(3))
+        self.assertLess(seconds, IMPORT_BUDGET)
+
+
+if __name__ == "__main__":
+    unittest.main()
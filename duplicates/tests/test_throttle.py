@@ -0,0 +1,69 @@
+"""
+Created on Oct 18, 2026
+
+@author: alexeymavrin@gmail.com
+
+"""
+
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from duplicates import duplicatefilefinder, throttle
+from duplicates.throttle import Throttle, set_throttle
+
+
+class ThrottleValidation(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp, "data")
+        with open(self.path, "wb") as f:
+            f.write(os.urandom(2 * 1024 * 1024))
+
+    def tearDown(self):
+        set_throttle(None)
+        shutil.rmtree(self.tmp)
+
+    def hash(self, io):
+        set_throttle(io)
+        started = time.perf_counter()
+        key = duplicatefilefinder.get_hash_key(self.path, block_size=256 * 1024)
+        return key, time.perf_counter() - started
+
+    def test_bandwidth(self):
+        expected, _ = self.hash(None)
+        io = Throttle(bandwidth=8 * 1024 * 1024, nocache=True)
+        key, seconds = self.hash(io)
+        self.assertEqual(expected, key)
+        self.assertGreater(seconds, 0.2, "2 MiB at 8 MiB/s")
+        self.assertEqual(2 * 1024 * 1024, io.bytes_read)
+        self.assertEqual(9, io.reads, "8 blocks and the end of the file")
+        self.assertLess(io.as_dict()["bandwidth"], 12 * 1024 * 1024)
+
+    def test_iops(self):
+        io = Throttle(iops=50)
+        _, seconds = self.hash(io)
+        self.assertGreater(seconds, 0.15, "9 reads at 50 per second")
+
+    @mock.patch.object(throttle, "ADJUST_SECONDS", 0)
+    def test_adaptive(self):
+        io = Throttle(bandwidth=64 * 1024 * 1024, latency=0.01)
+        io.acquire(1024)
+        io.done(1024, 1024, 0.05)
+        self.assertEqual((1, 32 * 1024 * 1024), (io.backoffs, io.rate), "halved when the latency is high")
+        for _ in range(10):
+            io.acquire(1024)
+            io.done(1024, 1024, 0.001)
+        self.assertEqual(64 * 1024 * 1024, io.rate, "raised back up to the limit")
+        for _ in range(20):
+            io.acquire(1024)
+            io.done(1024, 1024, 1)
+        self.assertEqual(throttle.MIN_BANDWIDTH, io.rate)
+
+
+if __name__ == "__main__":
+    unittest.main()
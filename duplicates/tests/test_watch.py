@@ -0,0 +1,149 @@
+"""
+Created on Oct 18, 2026
+
+@author: alexeymavrin@gmail.com
+
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from io import StringIO
+
+from duplicates import duplicates
+from duplicates.duplicatefilefinder import get_files
+from duplicates.watch import InotifyWatcher, LiveIndex, PollingWatcher, get_inotify
+
+
+class WatchValidation(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.work = os.path.join(self.tmp, "work")
+        self.golden = os.path.join(self.tmp, "golden")
+        os.mkdir(self.work)
+        os.mkdir(self.golden)
+        self.write(os.path.join(self.golden, "a"), b"same" * 1000)
+        self.write(os.path.join(self.work, "b"), b"other" * 1000)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    @staticmethod
+    def write(path, data):
+        with open(path, "wb") as f:
+            f.write(data)
+
+    def index(self, **kwargs):
+        index = LiveIndex(samples=0, **kwargs)
+        for root in (self.work, self.golden):
+            for record in get_files(root, True, True):
+                index.add(record)
+        return index
+
+    def test_live_index(self):
+        """Only the files changed are read, the groups with them are returned"""
+        index = self.index()
+        self.assertEqual([], index.search())
+        copy = os.path.join(self.work, "copy")
+        self.write(copy, b"same" * 1000)
+        groups = index.update([copy])
+        self.assertEqual([[os.path.join(self.golden, "a"), copy]], [sorted(r.path for r in g) for g in groups])
+        self.assertEqual([], index.update([copy]), "unchanged")
+        by_hash = next(stage for stage in index.stages if stage.name == "By Hash")
+        self.assertEqual(8000, by_hash.bytes_read)
+
+        self.write(os.path.join(self.work, "b"), b"same" * 1000)  # modified to a duplicate, copy's group again
+        self.assertEqual(1, len(index.update([os.path.join(self.work, "b")])))
+        self.assertEqual(8000 + 4000, by_hash.bytes_read, "only the modified file is read")
+        self.assertEqual(3, len(index.groups[4000][0]))
+
+        shutil.rmtree(self.work)  # the directory removed
+        self.assertEqual([], index.update([self.work]))
+        self.assertEqual(1, len(index))
+        self.assertEqual({}, index.groups)
+
+    def test_live_index_defaults(self):
+        """The duplicates of a size searched again are not read again (they are hashed, the keys are kept)"""
+        self.write(os.path.join(self.work, "copy"), b"same" * 1000)
+        index = LiveIndex()
+        for root in (self.work, self.golden):
+            for record in get_files(root, True, True):
+                index.add(record)
+        self.assertEqual(1, len(index.search()))
+        read = sum(stage.bytes_read for stage in index.stages)
+
+        other = os.path.join(self.work, "other")
+        self.write(other, b"diff" * 1000)
+        self.assertEqual([], index.update([other]))
+        self.assertEqual(1, len(index.groups[4000]))
+        self.assertLess(sum(stage.bytes_read for stage in index.stages) - read, 4000, "only the new file is read")
+
+    def test_files_under(self):
+        """The files under a directory are found from the index of the directories, the empty ones are forgotten"""
+        index = self.index()
+        nested = os.path.join(self.work, "x", "y")
+        os.makedirs(nested)
+        self.write(os.path.join(nested, "c"), b"c")
+        index.update([os.path.join(self.work, "x")])
+        self.assertEqual([os.path.join(nested, "c")], index.files_under(os.path.join(self.work, "x")))
+        self.assertEqual({os.path.join(self.work, "b"), os.path.join(nested, "c")}, set(index.files_under(self.work)))
+        self.assertEqual([os.path.join(self.golden, "a")], index.files_under(self.golden))
+
+        shutil.rmtree(os.path.join(self.work, "x"))
+        index.update([os.path.join(self.work, "x")])
+        self.assertEqual([], index.files_under(os.path.join(self.work, "x")))
+        self.assertNotIn(nested, index.directories)
+        self.assertNotIn(os.path.join(self.work, "x"), index.sub_dirs)
+        self.assertNotIn(os.path.join(self.work, "x"), index.sub_dirs.get(self.work, ()))
+
+    def test_polling(self):
+        """A file is reported once it is unchanged since the previous poll"""
+        watcher = PollingWatcher([self.work])
+        path = os.path.join(self.work, "c")
+        self.write(path, b"partial")
+        self.assertEqual(set(), watcher.changes(0), "written yet")
+        self.assertEqual({path}, watcher.changes(0))
+        self.assertEqual(set(), watcher.changes(0))
+        os.unlink(path)
+        self.assertEqual({path}, watcher.changes(0))
+
+    @unittest.skipIf(get_inotify() is None, "inotify is not available")
+    def test_inotify(self):
+        with InotifyWatcher([self.work]) as watcher:
+            path = os.path.join(self.work, "c")
+            self.write(path, b"data")
+            directory = os.path.join(self.work, "new")
+            os.mkdir(directory)
+            self.assertEqual({path, directory}, watcher.changes(1))
+            nested = os.path.join(directory, "d")
+            self.write(nested, b"data")
+            os.link(nested, os.path.join(self.work, "link"))
+            self.assertEqual({nested, os.path.join(self.work, "link")}, watcher.changes(1))
+            shutil.rmtree(directory)
+            self.assertIn(directory, watcher.changes(1))
+            self.assertEqual([self.work], list(watcher.directories.values()), "the removed directory is not watched")
+
+    def test_watch(self):
+        """The copies arriving in work are purged, the golden file is kept"""
+        copy = os.path.join(self.work, "copy")
+        calls = []
+
+        def until():
+            calls.append(None)
+            if len(calls) == 1:
+                self.write(copy, b"same" * 1000)
+            return len(calls) > 4
+
+        with redirect_stdout(StringIO()):
+            stats = duplicates.watch(self.work, self.golden, purge=True, jobs=1, interval=0.05, poll=True,
+                                     until=until)
+        self.assertFalse(os.path.exists(copy))
+        self.assertEqual((1, 1), (stats.deleted_files, stats.groups))
+        self.assertTrue(os.path.exists(os.path.join(self.golden, "a")))
+
+
+if __name__ == "__main__":
+    unittest.main()
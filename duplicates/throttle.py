@@ -0,0 +1,190 @@
+"""
+Created on Oct 18, 2026
+
+@author: "Alexey Mavrin"
+@email alexeymavrin@gmail.com
+
+I/O throttling for the shared hosts: the files are read through a token bucket shared by all the reading threads
+(bytes and reads per second), the bandwidth is lowered while the read latency is high (adaptive mode) and the data
+read can be dropped from the page cache, so the caches of the other services are not evicted.
+"""
+
+import os
+import threading
+import time
+
+BURST_SECONDS = 0.25  # tokens saved while idle, in seconds of the rate
+ADJUST_SECONDS = 0.5  # the adaptive rate is adjusted at most that often
+MIN_BANDWIDTH = 1024 * 1024  # the adaptive mode never goes below, bytes per second
+NOCACHE_WINDOW = 8 * 1024 * 1024  # the data read is dropped from the page cache by that many bytes
+
+_throttle = None  # Throttle the files are read through (see set_throttle)
+
+
+def set_throttle(throttle):
+    """ Sets the Throttle all the files are read through (None - no throttling), returns the previous one """
+    global _throttle
+    previous, _throttle = _throttle, throttle
+    return previous
+
+
+def get_throttle():
+    return _throttle
+
+
+class Throttle(object):
+    """ Token bucket shared by the reading threads: `bandwidth` bytes and `iops` reads per second (None - unlimited).
+    A read waits until its tokens are there (the threads wait in turn), the tokens of the idle time are saved for
+    BURST_SECONDS. If `latency` (seconds) is given, the bandwidth is halved whenever the average read latency goes
+    above it and raised back by a quarter while it is below half of it (adaptive mode). If `nocache`, the files are
+    read with the sequential hint and the data read is dropped from the page cache (posix_fadvise, where available).
+    """
+
+    def __init__(self, bandwidth=None, iops=None, latency=None, nocache=False):
+        self.bandwidth = bandwidth
+        self.iops = iops
+        self.latency = latency
+        self.nocache = nocache and hasattr(os, "posix_fadvise")
+        self.rate = bandwidth  # current bandwidth limit (lowered in the adaptive mode)
+        self.bytes_read = 0
+        self.reads = 0
+        self.waited = 0.0  # seconds the reads waited for the tokens, all the threads
+        self.backoffs = 0
+        self.started = None
+        self.ended = None
+        self.__lock = threading.Lock()
+        self.__bytes = 0.0  # tokens, negative when the reads in flight owe them
+        self.__ops = 0.0
+        self.__refilled = None
+        self.__window = [0.0, 0, 0, None]  # latency sum, reads, bytes, start of the adaptive window
+
+    def __repr__(self):
+        return "Throttle(bandwidth=%r, iops=%r, latency=%r, nocache=%r)" % (self.bandwidth, self.iops, self.latency,
+                                                                           self.nocache)
+
+    @property
+    def seconds(self):
+        """ Seconds from the first read to the last one """
+        return self.ended - self.started if self.started is not None else 0.0
+
+    def __refill(self, now):
+        if self.__refilled is not None:
+            elapsed = now - self.__refilled
+            if self.rate:
+                self.__bytes = min(self.__bytes + elapsed * self.rate, self.rate * BURST_SECONDS)
+            if self.iops:
+                self.__ops = min(self.__ops + elapsed * self.iops, self.iops * BURST_SECONDS)
+        self.__refilled = now
+
+    def acquire(self, size):
+        """ Waits until `size` bytes may be read """
+        with self.__lock:
+            now = time.perf_counter()
+            if self.started is None:
+                self.started = self.__window[3] = now
+            self.__refill(now)
+            wait = 0.0
+            if self.rate:
+                self.__bytes -= size
+                wait = max(wait, -self.__bytes / self.rate)
+            if self.iops:
+                self.__ops -= 1
+                wait = max(wait, -self.__ops / self.iops)
+            self.waited += wait
+        if wait > 0:
+            time.sleep(wait)
+
+    def done(self, requested, size, seconds):
+        """ Records the read of `size` bytes (of `requested`) which took `seconds`, adjusts the adaptive rate """
+        with self.__lock:
+            now = time.perf_counter()
+            self.ended = now
+            self.bytes_read += size
+            self.reads += 1
+            if self.rate:
+                self.__bytes += requested - size  # the end of the file
+            window = self.__window
+            window[0] += seconds
+            window[1] += 1
+            window[2] += size
+            if self.latency is None or now - window[3] < ADJUST_SECONDS:
+                return
+            average = window[0] / window[1]
+            achieved = window[2] / (now - window[3])
+            if average > self.latency:
+                self.rate = max(MIN_BANDWIDTH, (self.rate or achieved) / 2)
+                self.__bytes = min(self.__bytes, 0.0)
+                self.backoffs += 1
+            elif self.rate and average < self.latency / 2:
+                self.rate *= 1.25
+                if self.bandwidth:
+                    self.rate = min(self.rate, self.bandwidth)
+                elif self.rate > 4 * achieved:
+                    self.rate = None  # far above the reads made, no limit again
+            self.__window = [0.0, 0, 0, now]
+
+    def open(self, input_file):
+        """ Returns the file (opened for reading) read through the throttle """
+        return ThrottledFile(input_file, self)
+
+    def as_dict(self):
+        """ Returns the limits and the throughput achieved as a dictionary (JSON serializable) """
+        seconds = self.seconds
+        return {"bytes_read": self.bytes_read, "reads": self.reads, "seconds": seconds,
+                "bandwidth": self.bytes_read / seconds if seconds else None, "bandwidth_limit": self.bandwidth,
+                "iops": self.reads / seconds if seconds else None, "iops_limit": self.iops,
+                "latency_limit": self.latency, "final_bandwidth_limit": self.rate, "backoffs": self.backoffs,
+                "waited_seconds": self.waited, "nocache": self.nocache}
+
+
+class ThrottledFile(object):
+    """ File opened for reading (binary) read through the Throttle; with `nocache` the data read is dropped from the
+    page cache as the reading goes on and when the file is closed """
+
+    def __init__(self, input_file, throttle):
+        self.file = input_file
+        self.throttle = throttle
+        self.__dropped = 0  # the page cache is dropped up to that offset
+        self.__position = 0
+        if throttle.nocache:
+            self.__advise(0, 0, os.POSIX_FADV_SEQUENTIAL)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __advise(self, offset, length, advice):
+        try:
+            os.posix_fadvise(self.file.fileno(), offset, length, advice)
+        except OSError:
+            pass
+
+    def __read(self, size, read):
+        self.throttle.acquire(size)
+        started = time.perf_counter()
+        result = read()
+        length = result if isinstance(result, int) else len(result)
+        self.throttle.done(size, length, time.perf_counter() - started)
+        self.__position += length
+        if self.throttle.nocache and self.__position - self.__dropped >= NOCACHE_WINDOW:
+            self.__advise(self.__dropped, self.__position - self.__dropped, os.POSIX_FADV_DONTNEED)
+            self.__dropped = self.__position
+        return result
+
+    def read(self, size):
+        return self.__read(size, lambda: self.file.read(size))
+
+    def readinto(self, buffer):
+        return self.__read(len(buffer), lambda: self.file.readinto(buffer))
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        self.__position = self.file.seek(offset, whence)
+        self.__dropped = min(self.__dropped, self.__position)
+        return self.__position
+
+    def close(self):
+        if self.throttle.nocache and not self.file.closed:
+            self.__advise(0, 0, os.POSIX_FADV_DONTNEED)
+        self.file.close()
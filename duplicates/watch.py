@@ -0,0 +1,333 @@
+"""
+Created on Oct 18, 2026
+
+@author: "Alexey Mavrin"
+@email alexeymavrin@gmail.com
+
+Watch mode: after the first search the files under the roots are kept in a live index (by size) and the changes are
+taken from inotify (Linux, through ctypes) or from polling the roots. Only the sizes of the files created, modified or
+removed are searched again, the keys of the unchanged files are kept in memory and never read again.
+"""
+
+import ctypes
+import errno
+import os
+import select
+import stat
+import struct
+import time
+
+from duplicates.duplicatefilefinder import FileRecord, BLOCK_SIZE, KeyStore, filter_duplicate_files, get_files
+
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_ONLYDIR
+EVENT = struct.Struct("iIII")  # watch descriptor, mask, cookie, length of the name
+READ_SIZE = 64 * 1024
+
+
+def get_inotify():
+    """ Returns the C library if it has inotify (Linux), None otherwise """
+    try:
+        libc = ctypes.CDLL(None, use_errno=True)
+    except (OSError, TypeError):
+        return None
+    if not hasattr(libc, "inotify_init1"):
+        return None
+    libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+    libc.inotify_rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+    return libc
+
+
+class Watcher(object):
+    """ Source of the changes under the roots, see changes() """
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def changes(self, timeout):
+        """ Waits up to `timeout` seconds, returns the set of the paths changed (files or directories created, modified
+        or removed) or None if the changes were lost (everything is to be walked again) """
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class InotifyWatcher(Watcher):
+    """ Changes reported by inotify: every directory under the roots is watched, the new ones are added as they appear.
+    The files are reported when they are closed after writing or moved in, not while they are written. """
+
+    def __init__(self, roots, libc=None):
+        self.__libc = libc or get_inotify()
+        if self.__libc is None:
+            raise OSError(errno.ENOSYS, "inotify is not available")
+        self.fd = self.__libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.directories = {}  # watch descriptor -> directory
+        try:
+            for root in roots:
+                self.add_tree(root)
+        except OSError:
+            self.close()
+            raise
+
+    def __repr__(self):
+        return "inotify, %i directories" % len(self.directories)
+
+    def add_tree(self, path):
+        """ Watches the directory and all the directories under it """
+        for directory, _, _ in os.walk(path):
+            wd = self.__libc.inotify_add_watch(self.fd, os.fsencode(directory), WATCH_MASK)
+            if wd >= 0:
+                self.directories[wd] = directory
+            elif ctypes.get_errno() == errno.ENOSPC:
+                raise OSError(errno.ENOSPC, "inotify watch limit reached (fs.inotify.max_user_watches)")
+            # the others: the directory is removed meanwhile or not readable
+
+    def remove_tree(self, path):
+        """ Stops watching the directory and the directories under it (it is moved away or removed) """
+        for wd, directory in list(self.directories.items()):
+            if (directory + os.sep).startswith(path + os.sep):
+                self.__libc.inotify_rm_watch(self.fd, wd)
+                del self.directories[wd]
+
+    def changes(self, timeout):
+        changed = set()
+        overflow = False
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        while ready:
+            try:
+                data = os.read(self.fd, READ_SIZE)
+            except BlockingIOError:
+                break
+            position = 0
+            while position < len(data):
+                wd, mask, _, length = EVENT.unpack_from(data, position)
+                name = data[position + EVENT.size:position + EVENT.size + length].rstrip(b"\0")
+                position += EVENT.size + length
+                directory = self.directories.get(wd)
+                if mask & IN_Q_OVERFLOW:
+                    overflow = True
+                elif mask & IN_IGNORED:
+                    self.directories.pop(wd, None)
+                elif directory is not None:
+                    path = os.path.join(directory, os.fsdecode(name))
+                    if mask & IN_ISDIR:
+                        if mask & (IN_CREATE | IN_MOVED_TO):
+                            self.add_tree(path)
+                        else:
+                            self.remove_tree(path)
+                        changed.add(path)
+                    elif mask & IN_CREATE:
+                        # the files created are reported when they are closed, hard links are complete already
+                        try:
+                            if os.lstat(path).st_nlink > 1:
+                                changed.add(path)
+                        except OSError:
+                            pass
+                    else:
+                        changed.add(path)
+        return None if overflow else changed
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+
+class PollingWatcher(Watcher):
+    """ Changes found by walking the roots every `timeout` seconds and comparing the files (size, modification time,
+    inode) with the previous walk, for the file systems inotify does not see (network ones) and the other systems.
+    A file is reported when it is unchanged since the previous walk, not while it is written. """
+
+    def __init__(self, roots):
+        self.roots = roots
+        self.files = self.__walk()  # path -> (size, mtime_ns, inode) reported
+        self.previous = self.files  # the same of the last walk
+
+    def __repr__(self):
+        return "polling, %i files" % len(self.files)
+
+    def __walk(self):
+        return {record.path: (record.size, record.mtime_ns, record.inode)
+                for root in self.roots for record in get_files(root, True, True)}
+
+    def changes(self, timeout):
+        time.sleep(timeout)
+        current = self.__walk()
+        changed = set(self.files.keys() - current.keys())
+        for path in changed:
+            del self.files[path]
+        for path, state in current.items():
+            if state != self.files.get(path) and state == self.previous.get(path):
+                self.files[path] = state
+                changed.add(path)
+        self.previous = current
+        return changed
+
+
+def get_watcher(roots, poll=False):
+    """ Returns InotifyWatcher of the roots, PollingWatcher if `poll` or inotify is not available (or out of
+    watches) """
+    if not poll:
+        libc = get_inotify()
+        if libc is not None:
+            try:
+                return InotifyWatcher(roots, libc)
+            except OSError:
+                pass
+    return PollingWatcher(roots)
+
+
+class LiveIndex(object):
+    """ Files under the roots by size with the duplicates found among them, updated with the changes of a Watcher.
+    The keys of the files are kept (KeyStore) until the files change, so only the new and modified files are read;
+    the files are always hashed (the direct comparison leaves no keys to keep).
+    See filter_duplicate_files for the parameters. """
+
+    def __init__(self, cache=None, jobs=1, algorithm="sha256", block_size=BLOCK_SIZE, samples=4, stages=None,
+                 rotational_jobs=1, device_jobs=None):
+        self.files = {}  # path -> FileRecord
+        self.sizes = {}  # size -> {path: FileRecord}
+        self.directories = {}  # directory -> paths of its files
+        self.sub_dirs = {}  # directory -> its sub directories with files under them
+        self.groups = {}  # size -> duplicates (lists of FileRecord's)
+        self.keys = KeyStore(cache)
+        self.jobs = jobs
+        self.algorithm = algorithm
+        self.block_size = block_size
+        self.samples = samples
+        self.stages = stages if stages is not None else []
+        self.rotational_jobs = rotational_jobs
+        self.device_jobs = device_jobs
+
+    def __len__(self):
+        return len(self.files)
+
+    def __repr__(self):
+        return "LiveIndex: %i files, %i sizes, %i groups of duplicates" % (
+            len(self.files), len(self.sizes), sum(len(groups) for groups in self.groups.values()))
+
+    def add(self, record):
+        """ Adds the file (FileRecord) or replaces the one of the same path, returns False if it is unchanged """
+        old = self.files.get(record.path)
+        if old is not None:
+            if (old.size, old.mtime_ns, old.inode, old.device) == (record.size, record.mtime_ns, record.inode,
+                                                                  record.device):
+                return False
+            self.remove(old.path)
+        self.files[record.path] = record
+        self.sizes.setdefault(record.size, {})[record.path] = record
+        directory = os.path.dirname(record.path)
+        if directory not in self.directories and directory not in self.sub_dirs:
+            self.__link(directory)
+        self.directories.setdefault(directory, set()).add(record.path)
+        return True
+
+    def remove(self, path):
+        """ Removes the file, returns its FileRecord (None if it is not in the index) """
+        record = self.files.pop(path, None)
+        if record is not None:
+            same_size = self.sizes[record.size]
+            del same_size[path]
+            if not same_size:
+                del self.sizes[record.size]
+            self.keys.forget(record)
+            directory = os.path.dirname(path)
+            self.directories[directory].discard(path)
+            self.__prune(directory)
+        return record
+
+    def files_under(self, directory):
+        """ Returns the paths of the files under the directory (in it and in its sub directories) """
+        paths = []
+        stack = [directory]
+        while stack:
+            directory = stack.pop()
+            paths.extend(self.directories.get(directory, ()))
+            stack.extend(self.sub_dirs.get(directory, ()))
+        return paths
+
+    def __link(self, directory):
+        """ Adds the new directory to the sub directories of its parents, up to the first one known """
+        while True:
+            parent = os.path.dirname(directory)
+            if parent == directory:
+                return
+            known = parent in self.directories or parent in self.sub_dirs
+            self.sub_dirs.setdefault(parent, set()).add(directory)
+            if known:
+                return
+            directory = parent
+
+    def __prune(self, directory):
+        """ Forgets the directory and its parents left with no files under them """
+        while not self.directories.get(directory) and not self.sub_dirs.get(directory):
+            self.directories.pop(directory, None)
+            self.sub_dirs.pop(directory, None)
+            parent = os.path.dirname(directory)
+            if parent == directory or directory not in self.sub_dirs.get(parent, ()):
+                return
+            self.sub_dirs[parent].discard(directory)
+            directory = parent
+
+    def search(self, sizes=None, progress=None):
+        """ Searches the duplicates among the files of the sizes (all by default), returns the groups found """
+        sizes = set(self.sizes) if sizes is None else set(sizes)
+        for size in sizes:
+            self.groups.pop(size, None)
+        files = [record for size in sizes if len(self.sizes.get(size, ())) > 1 for record in self.sizes[size].values()]
+        if not files:
+            return []
+        found = filter_duplicate_files(files, None, self.keys, self.jobs, 0, self.algorithm,
+                                       self.block_size, self.samples, self.stages, self.rotational_jobs,
+                                       self.device_jobs, progress)
+        for records in found:
+            self.groups.setdefault(records[0].size, []).append(records)
+        return found
+
+    def update(self, paths):
+        """ Brings the files of the paths (files or directories, see Watcher.changes) up to date and searches their
+        sizes again. Returns the groups of the duplicates with the files added or modified. """
+        sizes = set()
+        added = set()
+        for path in paths:
+            try:
+                st = os.lstat(path)
+            except OSError:
+                st = None
+            if st is not None and stat.S_ISREG(st.st_mode):
+                found = [FileRecord.from_stat(path, st)]
+            elif st is not None and stat.S_ISDIR(st.st_mode):
+                found = list(get_files(path, True, True))
+            else:
+                found = []
+            if st is not None and stat.S_ISDIR(st.st_mode) or st is None and path not in self.files:
+                # a directory (or a removed one): the files known under it
+                known = self.files_under(path)
+            else:
+                known = [path] if path in self.files else []
+            for known_path in set(known) - set(record.path for record in found):
+                sizes.add(self.remove(known_path).size)
+            for record in found:
+                old = self.files.get(record.path)
+                if self.add(record):
+                    sizes.add(record.size)
+                    added.add(record.path)
+                    if old is not None:
+                        sizes.add(old.size)
+        if not sizes:
+            return []
+        return [records for records in self.search(sizes) if any(record.path in added for record in records)]
@@ -25,6 +25,7 @@ setuptools.setup(
     package_dir={'duplicates': 'duplicates'},  # where the package in source tree
     include_package_data=False,  # check MANIFEST.in for explicit rules
     install_requires=['humanize', ],
+    extras_require={'fast': ['xxhash', 'blake3']},  # additional --hash algorithms
     license='MIT License',
     entry_points={
         'console_scripts': [